@@ -1,23 +1,48 @@
+import hmac
 import json
 import os
+import shutil
+import tempfile
+import time
 from datetime import datetime, timedelta
 
 from flask import (
     Flask, render_template, redirect, url_for,
-    send_file, jsonify, abort, request, session
+    send_file, jsonify, abort, request, session, Response, g
 )
 
 from config import Config
-from models import db, Proposal
-from storage import proposal_pdf_path
-from cleanup import cleanup_expired, cleanup_tmp_contracts
-
-from proposal_service import gerar_proposta_pdf
+from sqlalchemy import and_, or_
+
+from models import db, Proposal, ensure_schema
+from cleanup import start_sweeper, last_sweep
+import batch
+import converter
+import converter_pool
+import downloads
+import idempotency
+import jobs
+import metrics
+import pdf_cache
+import profiling
+import search
+import storage
+import template_registry
+import warmup
+
+import contract_service
+import pacote_service
+import promissoria_service
+import proposal_service
+import termo_service
+from proposal_service import gerar_proposta_pdf, IMAGEM_LARGURA_MM
 from contract_service import gerar_contrato_pdf
-from promissoria_service import gerar_promissoria_pdf
+from promissoria_service import gerar_promissoria_pdf, IMAGEM_RG_LARGURA_MM
 from termo_service import gerar_termo_pdf
+from pacote_service import gerar_pacote, DOCUMENTOS as PACOTE_DOCUMENTOS
+from engine import engine
 
-from utils import data_curta_para_extenso
+from images import preparar_imagem
 
 
 def create_app():
@@ -34,14 +59,91 @@ def create_app():
 
     os.makedirs(app.config["STORAGE_DIR"], exist_ok=True)
 
+    converter.configure(
+        app.config["CONVERTER_BACKEND"],
+        timeout=app.config["CONVERTER_TIMEOUT"],
+        retries=app.config["CONVERTER_RETRIES"],
+        breaker_threshold=app.config["CONVERTER_BREAKER_THRESHOLD"],
+        breaker_cooldown=app.config["CONVERTER_BREAKER_COOLDOWN"],
+        max_concurrent=app.config["CONVERTER_MAX_CONCURRENT"],
+        queue_timeout=app.config["CONVERTER_QUEUE_TIMEOUT"],
+    )
+    converter_pool.configure(app.config["CONVERTER_POOL_SIZE"], app.config["CONVERTER_MAX_CONVERSIONS"])
+    jobs.init_jobs(app.config["STORAGE_DIR"], app.config["JOB_WORKERS"], app.config["JOB_QUEUE_MAX"])
+    pdf_cache.configure(
+        os.path.join(app.config["STORAGE_DIR"], "_cache"),
+        app.config["PDF_CACHE_MAX_MB"] * 1024 * 1024,
+    )
+
+    metrics.configure(os.path.join(app.config["STORAGE_DIR"], "_metrics"))
+    metrics.start_flusher()
+    idempotency.configure(os.path.join(app.config["STORAGE_DIR"], "_idem"), app.config["IDEMPOTENCY_TTL_MIN"] * 60)
+    storage.configure(app.config["STORAGE_DIR"])
+    template_registry.configure(app.config["FAST_RENDER"])
+    downloads.configure(
+        app.config["STORAGE_DIR"],
+        app.config["DOWNLOAD_OFFLOAD"],
+        app.config["DOWNLOAD_ACCEL_PREFIX"],
+    )
+    profiling.configure(
+        app.config["PROFILING"],
+        os.path.join(app.config["STORAGE_DIR"], "_profiles"),
+        app.config["PROFILER"],
+    )
+
     db.init_app(app)
     with app.app_context():
         db.create_all()
+        ensure_schema()
+        search.init_search()
+
+    # /metrics confere token ou sessão ele mesmo (o Prometheus não faz login)
+    PUBLIC_PATHS = {"/", "/login", "/hub", "/logout", "/health", "/ready", "/metrics"}
 
-    PUBLIC_PATHS = {"/", "/login", "/hub", "/logout", "/health"}
+    # limpeza (expiradas + temporários) roda em segundo plano, fora das requisições
+    start_sweeper(app, app.config["SWEEPER_INTERVAL_MIN"])
+
+    # aquecimento em segundo plano: a porta abre já, o /ready espera por ele
+    warmup.start(app.config["PREWARM"])
+
+    @app.before_request
+    def _start_timer():
+        g.t0 = time.perf_counter()
+
+    @app.after_request
+    def _server_timing(response):
+        if "etapas" not in g:
+            return response
+        etapas = profiling.em_ms({**g.etapas, "app": time.perf_counter() - g.t0})
+        response.headers["Server-Timing"] = ", ".join(
+            v for v in (response.headers.get("Server-Timing"), profiling.server_timing(etapas)) if v
+        )
+
+        perfil = g.pop("perfil", None)
+        if perfil is not None:
+            response.headers["X-Profile"] = url_for("profile_download", arquivo=perfil.nome_arquivo)
+            if response.is_streamed:
+                # lote: a geração acontece enquanto o corpo é enviado
+                response.call_on_close(perfil.stop)
+            else:
+                perfil.stop()
+        return response
+
+    @app.after_request
+    def _record_metrics(response):
+        rota = request.endpoint or "sem_rota"
+        if rota != "static" and "t0" in g:
+            metrics.REQUEST_SECONDS.observe(time.perf_counter() - g.t0, rota=rota)
+            metrics.REQUESTS.inc(rota=rota, resultado="falha" if response.status_code >= 400 else "sucesso")
+
+            if request.method == "POST" and request.files:
+                for campo, f in request.files.items(multi=True):
+                    f.stream.seek(0, os.SEEK_END)
+                    metrics.UPLOAD_BYTES.observe(f.stream.tell(), campo=campo)
+        return response
 
     @app.before_request
-    def _guard_and_cleanup():
+    def _guard():
         path = request.path
 
         if path.startswith("/static/") or path in PUBLIC_PATHS:
@@ -50,20 +152,91 @@ def create_app():
         if not session.get("logged_in"):
             return redirect(url_for("access"))
 
-        # limpeza
-        try:
-            cleanup_expired(app.config["RETENTION_DAYS"])
-        except Exception:
-            pass
+        return None
 
-        for folder in ["_contratos_tmp", "_promissorias_tmp", "_termos_tmp", "_tmp"]:
-            try:
-                cleanup_tmp_contracts(os.path.join(app.config["STORAGE_DIR"], folder), max_age_hours=24)
-            except Exception:
-                pass
+    # POSTs que geram documento (passam pela fila limitada)
+    GERACAO = {"proposta", "contrato_manual", "contrato", "promissoria", "termo", "pacote", "lote"}
 
+    def _fila_cheia(e: jobs.FilaCheia):
+        """503 + Retry-After: JSON para scripts, tela de espera para o navegador."""
+        if request.accept_mimetypes.best == "application/json":
+            resp = jsonify({"erro": str(e), "retry_after": e.retry_after, "fila": jobs.stats()})
+        else:
+            resp = Response(render_template("ocupado.html", erro=str(e), retry_after=e.retry_after))
+        resp.status_code = 503
+        resp.headers["Retry-After"] = str(e.retry_after)
+        return resp
+
+    # corrida com o _admission (fila encheu entre a checagem e o submit)
+    app.register_error_handler(jobs.FilaCheia, _fila_cheia)
+
+    @app.context_processor
+    def _idem_token():
+        # token novo a cada formulário montado (campo oculto "idem")
+        return {"idem_token": idempotency.new_token}
+
+    @app.before_request
+    def _idempotency():
+        """POST repetido (mesmo token, mesmo conteúdo) cai no job do primeiro."""
+        if request.method != "POST" or request.endpoint not in GERACAO:
+            return None
+        token = request.form.get(idempotency.FIELD, "")
+        fp = idempotency.fingerprint(request.form, request.files)
+        resultado, job_id = idempotency.reserve(token, fp)
+
+        if resultado == idempotency.DONO:
+            g.idem = (token, fp)
+        elif resultado == idempotency.DUPLICADO and request.endpoint != "lote":
+            layout = "public_base.html" if request.endpoint == "termo" else "base.html"
+            return _job_response(job_id, layout=layout)
+        elif resultado != idempotency.IGNORADO:
+            # lote repetido (o ZIP já está descendo) ou primeiro envio ainda no handler
+            msg = "Este envio já foi recebido e está sendo processado."
+            if request.accept_mimetypes.best == "application/json":
+                return jsonify({"erro": msg, "job_id": job_id}), 409
+            return render_template("ocupado.html", erro=msg, retry_after=0), 409
         return None
 
+    @app.after_request
+    def _idem_release(response):
+        # primeiro envio que não virou job (erro no formulário, 503...): token livre
+        idem = g.pop("idem", None)
+        if idem is not None:
+            idempotency.release(idem[0])
+        return response
+
+    def _idem_attach(job_id: str) -> None:
+        idem = g.pop("idem", None)
+        if idem is not None:
+            idempotency.attach(idem[0], idem[1], job_id)
+
+    @app.before_request
+    def _admission():
+        if request.method == "POST" and request.endpoint in GERACAO:
+            try:
+                jobs.admit()
+            except jobs.FilaCheia as e:
+                return _fila_cheia(e)
+        return None
+
+    @app.before_request
+    def _profiling():
+        # depois do _guard: perfil só para quem está logado
+        perfilar = profiling.pedido(request) and bool(session.get("logged_in"))
+        g.etapas = profiling.iniciar_requisicao(perfilar)
+        if perfilar:
+            perfil = profiling.Perfil()
+            if perfil.start():
+                g.perfil = perfil
+
+    def _job_response(job_id: str, layout: str = "base.html"):
+        """Resposta do POST: id do job (JSON) ou a tela que acompanha o job."""
+        _idem_attach(job_id)
+        status_url = url_for("job_status", job_id=job_id)
+        if request.accept_mimetypes.best == "application/json":
+            return jsonify({"job_id": job_id, "status_url": status_url}), 202
+        return render_template("job.html", job_id=job_id, status_url=status_url, layout=layout), 202
+
     # ---------- Telas públicas ----------
     @app.get("/")
     def access():
@@ -111,11 +284,8 @@ def create_app():
             return render_template("proposta.html", erro=None)
 
         try:
-            cliente = request.form.get("cliente", "").strip()
-            cpf = request.form.get("cpf", "").strip()
-            modelo = request.form.get("modelo", "").strip()
-            franquia = request.form.get("franquia", "").strip()
-            valor = request.form.get("valor", "").strip()
+            payload = proposal_service.dados_do_formulario(request.form)
+            cliente = payload["CLIENTE"]
 
             img = request.files.get("imagem")
             if not img or img.filename == "":
@@ -124,14 +294,6 @@ def create_app():
             created_at = datetime.now()
             expires_at = created_at + timedelta(days=app.config["RETENTION_DAYS"])
 
-            payload = {
-                "CLIENTE": cliente,
-                "CPF": cpf,
-                "MODELO": modelo,
-                "FRANQUIA": franquia,
-                "VALOR": valor,
-            }
-
             p = Proposal(
                 client_name=cliente,
                 created_at=created_at,
@@ -141,39 +303,126 @@ def create_app():
             )
             db.session.add(p)
             db.session.commit()
+            search.index_proposal(p.id, cliente, payload)
 
-            tmp_dir = os.path.join(app.config["STORAGE_DIR"], "_tmp")
-            os.makedirs(tmp_dir, exist_ok=True)
-            img_path = os.path.join(tmp_dir, f"img_{p.id}.png")
-            img.save(img_path)
+            # upload fica em memória até virar DOCX (sem passar por _tmp)
+            img_bytes = img.read()
 
             template_path = os.path.abspath("./assets/template_proposta.docx")
-            pdf_final = proposal_pdf_path(app.config["STORAGE_DIR"], cliente, created_at, p.id)
+            # gera num arquivo único e guarda como blob (storage.py); o nome fica no banco
+            pdf_tmp = storage.output_path(os.path.join(app.config["STORAGE_DIR"], "_tmp"))
+            nome_pdf = storage.download_name("PROPOSTA", cliente)
+            proposal_id = p.id
+
+            def _gerar():
+                imagem, stats = preparar_imagem(img_bytes, IMAGEM_LARGURA_MM, dpi=app.config["IMAGE_DPI"])
+                gerar_proposta_pdf(
+                    template_docx_path=template_path,
+                    output_pdf_path=pdf_tmp,
+                    dados=payload,
+                    imagem_upload_path=imagem
+                )
+
+                with app.app_context():
+                    sha = storage.put_blob(pdf_tmp)
+                    row = db.session.get(Proposal, proposal_id)
+                    if row is not None:
+                        row.blob_sha256 = sha
+                        row.download_name = nome_pdf
+                        db.session.commit()
+                    else:
+                        # excluída enquanto gerava
+                        storage.unref_blobs([sha])
+                        db.session.commit()
+                        storage.collect_blobs([sha])
+
+                return {"imagem": stats}
 
-            gerar_proposta_pdf(
-                template_docx_path=template_path,
-                output_pdf_path=pdf_final,
-                dados=payload,
-                imagem_upload_path=img_path
-            )
+            try:
+                job_id = jobs.submit("proposta", _gerar, redirect_url=url_for("recentes"))
+            except jobs.FilaCheia:
+                # fila encheu depois do _admission: sem job, a linha não fica em Recentes sem PDF
+                search.unindex([proposal_id])
+                db.session.delete(p)
+                db.session.commit()
+                raise
+            return _job_response(job_id)
+
+        except jobs.FilaCheia:
+            raise  # 503 + Retry-After (_fila_cheia)
+        except Exception as e:
+            return render_template("proposta.html", erro=str(e))
 
-            p.pdf_path = pdf_final
-            db.session.commit()
+    RECENTES_PAGE = 30
+
+    def _recentes_page(cursor: str = None, limit: int = RECENTES_PAGE):
+        """
+        Uma página de /recentes, mais novas primeiro, só com as colunas da lista.
+        Paginação por cursor "created_at|id" (keyset): não usa OFFSET, então
+        custa o mesmo na primeira página e na milésima.
+        """
+        q = db.session.query(Proposal.id, Proposal.client_name, Proposal.created_at, Proposal.expires_at)
 
+        if cursor:
             try:
-                os.remove(img_path)
-            except Exception:
-                pass
+                ts, _, last_id = cursor.rpartition("|")
+                c_at, c_id = datetime.fromisoformat(ts), int(last_id)
+            except ValueError:
+                abort(400, "Cursor inválido.")
+            q = q.filter(or_(
+                Proposal.created_at < c_at,
+                and_(Proposal.created_at == c_at, Proposal.id < c_id),
+            ))
 
-            return redirect(url_for("recentes"))
+        rows = q.order_by(Proposal.created_at.desc(), Proposal.id.desc()).limit(limit + 1).all()
 
-        except Exception as e:
-            return render_template("proposta.html", erro=str(e))
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = f"{rows[-1].created_at.isoformat()}|{rows[-1].id}"
+
+        return rows, next_cursor
 
     @app.get("/recentes")
     def recentes():
-        items = Proposal.query.order_by(Proposal.created_at.desc()).limit(200).all()
-        return render_template("recentes.html", items=items)
+        items, next_cursor = _recentes_page()
+        return render_template("recentes.html", items=items, next_cursor=next_cursor)
+
+    def _item_json(p) -> dict:
+        def dt_br(dt):
+            return dt.strftime("%d/%m/%Y %H:%M")
+
+        return {
+            "id": p.id,
+            "client_name": p.client_name,
+            "criada": dt_br(p.created_at),
+            "expira": dt_br(p.expires_at),
+            "baixar_url": url_for("baixar_proposta", proposal_id=p.id),
+            "contrato_url": url_for("contrato", proposal_id=p.id),
+            "excluir_url": url_for("excluir_proposta", proposal_id=p.id),
+        }
+
+    @app.get("/api/recentes")
+    def api_recentes():
+        items, next_cursor = _recentes_page(request.args.get("cursor"))
+        return jsonify({
+            "items": [_item_json(p) for p in items],
+            "next_cursor": next_cursor,
+        })
+
+    @app.get("/api/busca")
+    def api_busca():
+        """Busca por cliente, CPF ou modelo (índice FTS/trigram, ver search.py)."""
+        ids = search.search_ids(request.args.get("q", ""), limit=RECENTES_PAGE)
+        rows = []
+        if ids:
+            rows = (
+                db.session.query(Proposal.id, Proposal.client_name, Proposal.created_at, Proposal.expires_at)
+                .filter(Proposal.id.in_(ids))
+                .order_by(Proposal.created_at.desc(), Proposal.id.desc())
+                .all()
+            )
+        return jsonify({"items": [_item_json(p) for p in rows], "min_len": search.MIN_QUERY_LEN})
 
     @app.get("/api/proposta/<int:proposal_id>")
     def api_proposta(proposal_id: int):
@@ -197,9 +446,17 @@ def create_app():
     @app.get("/proposta/<int:proposal_id>/baixar")
     def baixar_proposta(proposal_id: int):
         p = Proposal.query.get_or_404(proposal_id)
+        # ETag/304, Range e X-Accel-Redirect/X-Sendfile: downloads.py
+        if p.blob_sha256:
+            path = storage.blob_path(p.blob_sha256)
+            if not os.path.exists(path):
+                abort(404, "PDF não encontrado.")
+            return downloads.enviar_pdf(path, p.download_name or storage.download_name("PROPOSTA", p.client_name),
+                                        p.id, sha256=p.blob_sha256)
+        # propostas de antes dos blobs
         if not p.pdf_path or not os.path.exists(p.pdf_path):
             abort(404, "PDF não encontrado.")
-        return send_file(p.pdf_path, as_attachment=True)
+        return downloads.enviar_pdf(p.pdf_path, os.path.basename(p.pdf_path), p.id)
 
     @app.post("/proposta/<int:proposal_id>/excluir")
     def excluir_proposta(proposal_id: int):
@@ -209,8 +466,12 @@ def create_app():
                 os.remove(p.pdf_path)
             except Exception:
                 pass
+        sha = p.blob_sha256
+        search.unindex([p.id])
+        storage.unref_blobs([sha])
         db.session.delete(p)
         db.session.commit()
+        storage.collect_blobs([sha])
         return redirect(url_for("recentes"))
 
     # ---------------- CONTRATO ----------------
@@ -222,46 +483,21 @@ def create_app():
             return render_template("contrato.html", pre=pre, erro=None, back_url=url_for("gerador"))
 
         try:
-            denominacao = request.form.get("denominacao", "").strip()
-            cpf_cnpj = request.form.get("cpf_cnpj", "").strip()
-            endereco = request.form.get("endereco", "").strip()
-            telefone = request.form.get("telefone", "").strip()
-            email = request.form.get("email", "").strip()
-            equipamento = request.form.get("equipamento", "").strip()
-            franquia = request.form.get("franquia", "").strip()
-            valor_mensal = request.form.get("valor_mensal", "").strip()
-
-            data_inicio = data_curta_para_extenso(request.form.get("data_inicio", "").strip())
-            data_termino = data_curta_para_extenso(request.form.get("data_termino", "").strip())
-
-            acc_list = request.form.getlist("acc")
-            acc_outros = request.form.get("acc_outros", "").strip()
-            if acc_outros:
-                acc_list.append(acc_outros)
-            acessorios = " / ".join([a for a in acc_list if a])
-
-            dados_contrato = {
-                "DENOMINACAO": denominacao,
-                "CPF_CNPJ": cpf_cnpj,
-                "ENDERECO": endereco,
-                "TELEFONE": telefone,
-                "EMAIL": email,
-                "EQUIPAMENTO": equipamento,
-                "ACESSORIOS": acessorios,
-                "DATA_INICIO": data_inicio,
-                "DATA_TERMINO": data_termino,
-                "FRANQUIA": franquia,
-                "VALOR_MENSAL": valor_mensal,
-            }
+            dados_contrato = contract_service.dados_do_formulario(request.form)
 
             template_path = os.path.abspath("./assets/template_contrato.docx")
-            out_dir = os.path.join(app.config["STORAGE_DIR"], "_contratos_tmp")
-            os.makedirs(out_dir, exist_ok=True)
-            pdf_path = os.path.join(out_dir, f"CONTRATO - {denominacao}.pdf")
+            pdf_path = storage.output_path(os.path.join(app.config["STORAGE_DIR"], "_contratos_tmp"))
 
-            gerar_contrato_pdf(template_docx_path=template_path, output_pdf_path=pdf_path, dados=dados_contrato)
-            return send_file(pdf_path, as_attachment=True)
+            job_id = jobs.submit(
+                "contrato",
+                lambda: gerar_contrato_pdf(template_docx_path=template_path, output_pdf_path=pdf_path, dados=dados_contrato),
+                pdf_path=pdf_path,
+                download_name=storage.download_name("CONTRATO", dados_contrato["DENOMINACAO"]),
+            )
+            return _job_response(job_id)
 
+        except jobs.FilaCheia:
+            raise  # 503 + Retry-After (_fila_cheia)
         except Exception as e:
             return render_template("contrato.html", pre=pre, erro=str(e), back_url=url_for("gerador"))
 
@@ -282,46 +518,21 @@ def create_app():
             return render_template("contrato.html", pre=pre, erro=None, back_url=url_for("recentes"))
 
         try:
-            denominacao = request.form.get("denominacao", "").strip()
-            cpf_cnpj = request.form.get("cpf_cnpj", "").strip()
-            endereco = request.form.get("endereco", "").strip()
-            telefone = request.form.get("telefone", "").strip()
-            email = request.form.get("email", "").strip()
-            equipamento = request.form.get("equipamento", "").strip()
-            franquia = request.form.get("franquia", "").strip()
-            valor_mensal = request.form.get("valor_mensal", "").strip()
-
-            data_inicio = data_curta_para_extenso(request.form.get("data_inicio", "").strip())
-            data_termino = data_curta_para_extenso(request.form.get("data_termino", "").strip())
-
-            acc_list = request.form.getlist("acc")
-            acc_outros = request.form.get("acc_outros", "").strip()
-            if acc_outros:
-                acc_list.append(acc_outros)
-            acessorios = " / ".join([a for a in acc_list if a])
-
-            dados_contrato = {
-                "DENOMINACAO": denominacao,
-                "CPF_CNPJ": cpf_cnpj,
-                "ENDERECO": endereco,
-                "TELEFONE": telefone,
-                "EMAIL": email,
-                "EQUIPAMENTO": equipamento,
-                "ACESSORIOS": acessorios,
-                "DATA_INICIO": data_inicio,
-                "DATA_TERMINO": data_termino,
-                "FRANQUIA": franquia,
-                "VALOR_MENSAL": valor_mensal,
-            }
+            dados_contrato = contract_service.dados_do_formulario(request.form)
 
             template_path = os.path.abspath("./assets/template_contrato.docx")
-            out_dir = os.path.join(app.config["STORAGE_DIR"], "_contratos_tmp")
-            os.makedirs(out_dir, exist_ok=True)
-            pdf_path = os.path.join(out_dir, f"CONTRATO - {p.client_name}.pdf")
+            pdf_path = storage.output_path(os.path.join(app.config["STORAGE_DIR"], "_contratos_tmp"))
 
-            gerar_contrato_pdf(template_docx_path=template_path, output_pdf_path=pdf_path, dados=dados_contrato)
-            return send_file(pdf_path, as_attachment=True)
+            job_id = jobs.submit(
+                "contrato",
+                lambda: gerar_contrato_pdf(template_docx_path=template_path, output_pdf_path=pdf_path, dados=dados_contrato),
+                pdf_path=pdf_path,
+                download_name=storage.download_name("CONTRATO", p.client_name),
+            )
+            return _job_response(job_id)
 
+        except jobs.FilaCheia:
+            raise  # 503 + Retry-After (_fila_cheia)
         except Exception as e:
             return render_template("contrato.html", pre=pre, erro=str(e), back_url=url_for("recentes"))
 
@@ -332,39 +543,34 @@ def create_app():
             return render_template("promissoria.html", erro=None)
 
         try:
-            nome = request.form.get("nome", "").strip()
-            cpf = request.form.get("cpf", "").strip()
-            endereco = request.form.get("endereco", "").strip()
-            venc = data_curta_para_extenso(request.form.get("data_venc", "").strip())
+            dados = promissoria_service.dados_do_formulario(request.form)
 
             img = request.files.get("imagem_rg")
             if not img or img.filename == "":
                 return render_template("promissoria.html", erro="Envie a foto do documento (RG/CNH).")
 
-            tmp_dir = os.path.join(app.config["STORAGE_DIR"], "_promissorias_tmp")
-            os.makedirs(tmp_dir, exist_ok=True)
-            img_path = os.path.join(tmp_dir, f"rg_{int(datetime.utcnow().timestamp())}.png")
-            img.save(img_path)
+            img_bytes = img.read()
 
             template_path = os.path.abspath("./assets/template_promissoria.docx")
-            pdf_path = os.path.join(tmp_dir, f"PROMISSORIA - {nome}.pdf")
+            pdf_path = storage.output_path(os.path.join(app.config["STORAGE_DIR"], "_promissorias_tmp"))
 
-            dados = {"DATA": venc, "NOME": nome, "CPF": cpf, "ENDERECO": endereco}
+            def _gerar():
+                imagem, stats = preparar_imagem(img_bytes, IMAGEM_RG_LARGURA_MM, dpi=app.config["IMAGE_DPI"])
+                gerar_promissoria_pdf(
+                    template_docx_path=template_path,
+                    output_pdf_path=pdf_path,
+                    dados=dados,
+                    imagem_rg_path=imagem
+                )
 
-            gerar_promissoria_pdf(
-                template_docx_path=template_path,
-                output_pdf_path=pdf_path,
-                dados=dados,
-                imagem_rg_path=img_path
-            )
-
-            try:
-                os.remove(img_path)
-            except Exception:
-                pass
+                return {"imagem": stats}
 
-            return send_file(pdf_path, as_attachment=True)
+            job_id = jobs.submit("promissoria", _gerar, pdf_path=pdf_path,
+                                 download_name=storage.download_name("PROMISSORIA", dados["NOME"]))
+            return _job_response(job_id)
 
+        except jobs.FilaCheia:
+            raise  # 503 + Retry-After (_fila_cheia)
         except Exception as e:
             return render_template("promissoria.html", erro=str(e))
 
@@ -375,48 +581,208 @@ def create_app():
             return render_template("termo.html", erro=None)
 
         try:
-            eq = set(request.form.getlist("eq"))
-            ck = "☑"
-            un = "☐"
-
-            dados = {
-                "DATA_RET": request.form.get("data_ret", "").strip(),
-                "HORA_RET": request.form.get("hora_ret", "").strip(),
-                "DATA_DEV": request.form.get("data_dev", "").strip(),
-                "HORA_DEV": request.form.get("hora_dev", "").strip(),
-
-                "NOME": request.form.get("nome", "").strip(),
-                "TELEFONE": request.form.get("telefone", "").strip(),
-                "ENDEREÇO": request.form.get("endereco", "").strip(),
-
-                "CK_CPU": ck if "CPU" in eq else un,
-                "CK_NOT": ck if "NOT" in eq else un,
-                "CK_MON": ck if "MON" in eq else un,
-                "CK_IMP": ck if "IMP" in eq else un,
-
-                "MARCA": request.form.get("marca", "").strip(),
-                "MODELO": request.form.get("modelo", "").strip(),
-                "SERIE": request.form.get("serie", "").strip(),
-                "ACESSORIO": request.form.get("acessorio", "").strip(),
-                "OBSERVAÇÃO": request.form.get("observacao", "").strip(),
-            }
+            dados = termo_service.dados_do_formulario(request.form)
 
             template_path = os.path.abspath("./assets/template_termo_retirada.docx")
-            tmp_dir = os.path.join(app.config["STORAGE_DIR"], "_termos_tmp")
-            os.makedirs(tmp_dir, exist_ok=True)
-
-            nome = dados["NOME"] or "Cliente"
-            pdf_path = os.path.join(tmp_dir, f"TERMO RETIRADA - {nome}.pdf")
+            pdf_path = storage.output_path(os.path.join(app.config["STORAGE_DIR"], "_termos_tmp"))
 
-            gerar_termo_pdf(template_docx_path=template_path, output_pdf_path=pdf_path, dados=dados)
-            return send_file(pdf_path, as_attachment=True)
+            job_id = jobs.submit(
+                "termo",
+                lambda: gerar_termo_pdf(template_docx_path=template_path, output_pdf_path=pdf_path, dados=dados),
+                pdf_path=pdf_path,
+                download_name=storage.download_name("TERMO RETIRADA", dados["NOME"]),
+            )
+            return _job_response(job_id, layout="public_base.html")
 
+        except jobs.FilaCheia:
+            raise  # 503 + Retry-After (_fila_cheia)
         except Exception as e:
             return render_template("termo.html", erro=str(e))
 
+    # ---------------- PACOTE ----------------
+    @app.route("/pacote", methods=["GET", "POST"])
+    def pacote():
+        if request.method == "GET":
+            return render_template("pacote.html", erro=None)
+
+        try:
+            documentos = [d for d in request.form.getlist("docs") if d in PACOTE_DOCUMENTOS]
+            if not documentos:
+                return render_template("pacote.html", erro="Escolha pelo menos um documento.")
+            formato = "zip" if request.form.get("formato") == "zip" else "pdf"
+
+            # campos conferidos aqui, como nos formulários avulsos (erro antes de virar job)
+            dados = pacote_service.dados_do_formulario(request.form, documentos)
+
+            # uploads em memória; a redução acontece no job
+            uploads = {}
+            for doc, campo, msg in (
+                ("proposta", "imagem", "Envie a imagem do equipamento."),
+                ("promissoria", "imagem_rg", "Envie a foto do documento (RG/CNH)."),
+            ):
+                if doc in documentos:
+                    img = request.files.get(campo)
+                    if not img or img.filename == "":
+                        return render_template("pacote.html", erro=msg)
+                    uploads[doc] = img.read()
+
+            nome = request.form.get("nome", "")
+            out_path = storage.output_path(os.path.join(app.config["STORAGE_DIR"], "_pacotes_tmp"), formato)
+            nome_pacote = storage.download_name("PACOTE", nome, formato)
+
+            def _gerar():
+                imagens = {
+                    doc: preparar_imagem(data, engine.documento(doc).imagem[1], dpi=app.config["IMAGE_DPI"])[0]
+                    for doc, data in uploads.items()
+                }
+                return gerar_pacote(out_path, dados, nome, imagens=imagens, formato=formato)
+
+            job_id = jobs.submit("pacote", _gerar, pdf_path=out_path, download_name=nome_pacote)
+            return _job_response(job_id)
+
+        except jobs.FilaCheia:
+            raise  # 503 + Retry-After (_fila_cheia)
+        except Exception as e:
+            return render_template("pacote.html", erro=str(e))
+
+    # ---------------- LOTE ----------------
+    @app.route("/lote", methods=["GET", "POST"])
+    def lote():
+        tipos = batch.TIPOS
+        if request.method == "GET":
+            return render_template("lote.html", erro=None, tipos=tipos, lote_max=app.config["LOTE_MAX"])
+
+        def _erro(msg):
+            return render_template("lote.html", erro=msg, tipos=tipos, lote_max=app.config["LOTE_MAX"]), 400
+
+        try:
+            tipo = request.form.get("tipo", "")
+            if tipo not in batch.TIPOS:
+                return _erro("Escolha o tipo de documento.")
+
+            arq = request.files.get("arquivo")
+            if not arq or arq.filename == "":
+                return _erro("Envie o arquivo CSV ou JSON com os registros.")
+
+            registros = batch.ler_registros(arq.read(), arq.filename)
+            if not registros:
+                return _erro("O arquivo não tem registros.")
+            if len(registros) > app.config["LOTE_MAX"]:
+                return _erro(f"No máximo {app.config['LOTE_MAX']} registros por lote.")
+
+            imagem = None
+            img = request.files.get("imagem")
+            if engine.documento(tipo).imagem:
+                if not img or img.filename == "":
+                    return _erro("Envie a imagem do equipamento.")
+                imagem, _stats = preparar_imagem(
+                    img.read(), engine.documento(tipo).imagem[1], dpi=app.config["IMAGE_DPI"]
+                )
+
+            out_dir = os.path.join(app.config["STORAGE_DIR"], "_lotes_tmp")
+            os.makedirs(out_dir, exist_ok=True)
+        except Exception as e:
+            return _erro(str(e))
+
+        job = jobs.track(f"lote_{tipo}", len(registros))
+        _idem_attach(job["id"])
+
+        def _stream():
+            # PDFs do lote numa pasta própria, apagada no final (mesmo se o download cair)
+            work_dir = tempfile.mkdtemp(dir=out_dir)
+            erro = "Download interrompido."
+            try:
+                resultados = batch.gerar_lote(tipo, registros, work_dir, imagem=imagem)
+                yield from batch.stream_zip(resultados, lambda feitos, erros: jobs.progress(job, feitos, erros))
+                erro = None
+            except Exception as e:
+                erro = str(e)
+                raise
+            finally:
+                jobs.finish(job, error=erro)
+                shutil.rmtree(work_dir, ignore_errors=True)
+
+        nome_zip = f"LOTE {tipo.upper()} - {datetime.now():%Y-%m-%d %H%M}.zip"
+        return Response(
+            _stream(),
+            mimetype="application/zip",
+            headers={
+                "Content-Disposition": f'attachment; filename="{nome_zip}"',
+                "X-Job-Id": job["id"],
+            },
+        )
+
+    # ---------------- JOBS ----------------
+    @app.get("/jobs/<job_id>")
+    def job_status(job_id: str):
+        job = jobs.get_job(job_id)
+        if job is None:
+            abort(404, "Job não encontrado.")
+
+        ready = job["status"] == "pronto"
+        # "profile": True enquanto o job roda, nome do arquivo quando termina
+        perfil = job.get("profile")
+        resp = jsonify({
+            "id": job["id"],
+            "kind": job["kind"],
+            "status": job["status"],
+            "error": job["error"],
+            "info": job.get("info"),
+            "progress": job.get("progress"),
+            "created_at": job["created_at"],
+            "finished_at": job["finished_at"],
+            "download_url": url_for("job_download", job_id=job_id) if ready and job["pdf_path"] else None,
+            "redirect_url": job["redirect_url"] if ready else None,
+            "timings": job.get("timings"),
+            "profile_url": url_for("profile_download", arquivo=perfil) if isinstance(perfil, str) else None,
+        })
+        if job.get("timings"):
+            resp.headers["Server-Timing"] = profiling.server_timing(job["timings"])
+        return resp
+
+    @app.get("/jobs/<job_id>/download")
+    def job_download(job_id: str):
+        job = jobs.get_job(job_id)
+        if job is None or job["status"] != "pronto" or not job["pdf_path"]:
+            abort(404, "Job não encontrado ou ainda não terminou.")
+        if not os.path.exists(job["pdf_path"]):
+            abort(404, "PDF não encontrado.")
+        return send_file(job["pdf_path"], as_attachment=True, download_name=job["download_name"])
+
+    @app.get("/profiles/<arquivo>")
+    def profile_download(arquivo: str):
+        path = profiling.caminho(arquivo)
+        if path is None:
+            abort(404, "Perfil não encontrado.")
+        if arquivo.endswith(".txt"):
+            return send_file(path, mimetype="text/plain")
+        if arquivo.endswith(".html"):
+            return send_file(path, mimetype="text/html")
+        return send_file(path, as_attachment=True, download_name=arquivo)
+
+    @app.get("/metrics")
+    def metrics_endpoint():
+        """
+        Formato texto do Prometheus, somando todos os workers.
+        Só com "Authorization: Bearer <METRICS_TOKEN>" ou logado.
+        """
+        token = app.config["METRICS_TOKEN"]
+        auth = request.headers.get("Authorization", "")
+        com_token = bool(token) and hmac.compare_digest(auth, f"Bearer {token}")
+        if not com_token and not session.get("logged_in"):
+            abort(401)
+        return Response(metrics.render(metrics.collect()), mimetype="text/plain; version=0.0.4")
+
+    @app.get("/ready")
+    def ready():
+        """Pronto para receber tráfego: aquecimento deste worker terminou."""
+        warmup.start(app.config["PREWARM"])
+        info = warmup.status()
+        return info, 200 if info["pronto"] else 503
+
     @app.get("/health")
     def health():
-        return {"ok": True}
+        return {"ok": True, "conversor": converter.health(), "fila": jobs.stats(), "documentos": engine.stats(), "pdf_cache": pdf_cache.stats(), "cleanup": last_sweep}
 
     return app
 
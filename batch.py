@@ -0,0 +1,283 @@
+"""
+Geração em lote: uma lista de registros (CSV ou JSON) vira um ZIP de PDFs.
+
+Os registros usam os mesmos nomes de campo dos formulários (cliente, cpf,
+modelo...). Campos de múltipla escolha (acc, eq) vêm separados por "|".
+
+Fluxo:
+  - cada registro vira contexto -> chave do cache; acertos saem na hora;
+  - os demais .docx são renderizados em paralelo (threads) no SCRATCH_DIR;
+  - os .docx são convertidos em grupos: sem UNO, um "soffice --convert-to"
+    recebe o grupo inteiro (paga a subida do LibreOffice uma vez por grupo);
+    os grupos rodam em paralelo nos workers do pool;
+  - cada PDF entra no ZIP assim que o grupo dele termina (stream_zip).
+
+Uso pela linha de comando:
+  python batch.py proposta clientes.csv propostas.zip --imagem foto.jpg
+"""
+import csv
+import io
+import json
+import os
+import sys
+import tempfile
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+from converter import SCRATCH_DIR, get_backend
+from engine import engine
+from storage import _safe_name, zip_stored
+
+# registram proposta/contrato/termo no engine
+import contract_service  # noqa: F401
+import proposal_service
+import termo_service  # noqa: F401
+
+# Documentos por chamada ao LibreOffice
+LOTE_GRUPO = int(os.getenv("LOTE_GRUPO", "20"))
+
+# Threads que renderizam os .docx
+LOTE_RENDER_WORKERS = int(os.getenv("LOTE_RENDER_WORKERS", "4"))
+
+# Tipos aceitos no lote (promissória precisa de uma foto por registro)
+TIPOS = ("proposta", "contrato", "termo")
+
+
+class Registro(dict):
+    """Um registro do lote com a mesma interface do request.form (get/getlist)."""
+
+    def get(self, key, default=None):
+        v = super().get(key, default)
+        if isinstance(v, (int, float)):
+            return str(v)
+        return v if v is not None else default
+
+    def getlist(self, key) -> list:
+        v = super().get(key)
+        if v is None or v == "":
+            return []
+        if isinstance(v, list):
+            return [str(x).strip() for x in v]
+        return [x.strip() for x in str(v).split("|") if x.strip()]
+
+
+def ler_registros(data: bytes, filename: str) -> list:
+    """CSV (separador "," ou ";", com cabeçalho) ou JSON (lista de objetos)."""
+    text = data.decode("utf-8-sig")
+
+    if filename.lower().endswith(".json"):
+        try:
+            items = json.loads(text)
+        except ValueError as e:
+            raise RuntimeError(f"JSON inválido: {e}")
+        if not isinstance(items, list) or not all(isinstance(i, dict) for i in items):
+            raise RuntimeError("O JSON precisa ser uma lista de objetos.")
+        return [Registro(i) for i in items]
+
+    try:
+        dialect = csv.Sniffer().sniff(text[:4096], delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.DictReader(io.StringIO(text), dialect=dialect)
+    return [Registro({(k or "").strip(): v for k, v in row.items()}) for row in reader]
+
+
+def _nomes_unicos(nomes: list) -> list:
+    vistos = {}
+    out = []
+    for n in nomes:
+        n = _safe_name(n) or "documento"
+        vistos[n] = vistos.get(n, 0) + 1
+        out.append(n if vistos[n] == 1 else f"{n} ({vistos[n]})")
+    return out
+
+
+def gerar_lote(tipo: str, registros: list, out_dir: str, imagem=None,
+               grupo: int = LOTE_GRUPO, render_workers: int = LOTE_RENDER_WORKERS):
+    """
+    Gera os PDFs em out_dir e vai produzindo (nome.pdf, caminho, erro) na
+    ordem em que ficam prontos. Com erro, caminho é None e o lote continua.
+    imagem: bytes/BytesIO já preparada (propostas usam a mesma para todos).
+    """
+    if tipo not in TIPOS:
+        raise RuntimeError(f"Tipo de lote desconhecido: {tipo}")
+    doc = engine.documento(tipo)
+    if doc.imagem and imagem is None:
+        raise RuntimeError("Envie a imagem do equipamento para o lote de propostas.")
+
+    # bytes: cada thread de render abre o seu BytesIO (não dá para dividir um)
+    if hasattr(imagem, "getvalue"):
+        imagem = imagem.getvalue()
+
+    # contexto + cache (barato, na thread de quem chamou)
+    trabalhos = []
+    for reg in registros:
+        try:
+            trabalhos.append((engine.preparar(tipo, doc.dados(reg), imagem=imagem), None))
+        except Exception as e:
+            engine.erro(tipo)
+            trabalhos.append((None, str(e)))
+
+    nomes = _nomes_unicos([
+        doc.nome_arquivo(t.dados) if t else f"registro {n}" for n, (t, _e) in enumerate(trabalhos, start=1)
+    ])
+
+    pendentes = []
+    for i, ((trabalho, erro), nome) in enumerate(zip(trabalhos, nomes)):
+        pdf_name = f"{nome}.pdf"
+        if erro:
+            yield pdf_name, None, erro
+            continue
+
+        pdf_path = os.path.join(out_dir, f"{i:05d}.pdf")
+        if engine.do_cache(trabalho, pdf_path):
+            yield pdf_name, pdf_path, None
+        else:
+            pendentes.append((i, pdf_name, trabalho))
+
+    if not pendentes:
+        return
+
+    def _render(item, scratch):
+        i, _pdf_name, trabalho = item
+        buf = engine.render(trabalho)
+        docx_path = os.path.join(scratch, f"{i:05d}.docx")
+        with open(docx_path, "wb") as f:
+            f.write(buf.getbuffer())
+        return docx_path
+
+    paralelo = get_backend().parallelism
+
+    with tempfile.TemporaryDirectory(dir=SCRATCH_DIR) as scratch, \
+            ThreadPoolExecutor(max_workers=max(1, render_workers), thread_name_prefix="lote-render") as render_ex, \
+            ThreadPoolExecutor(max_workers=paralelo, thread_name_prefix="lote-conv") as conv_ex:
+
+        renders = {render_ex.submit(_render, item, scratch): item for item in pendentes}
+        conversoes = {}
+        buffer = []
+
+        def _flush():
+            if buffer:
+                grupo_atual = list(buffer)
+                conversoes[conv_ex.submit(
+                    engine.converter_grupo,
+                    [item[2] for item, _d in grupo_atual],
+                    [d for _item, d in grupo_atual],
+                    out_dir,
+                )] = grupo_atual
+                buffer.clear()
+
+        # cada grupo vai para a conversão assim que enche, enquanto o resto renderiza
+        for fut in as_completed(renders):
+            item = renders[fut]
+            try:
+                buffer.append((item, fut.result()))
+            except Exception as e:
+                engine.erro(tipo)
+                yield item[1], None, f"Falha ao montar o documento: {e}"
+                continue
+            if len(buffer) >= grupo:
+                _flush()
+        _flush()
+
+        for fut in as_completed(conversoes):
+            erro_grupo = fut.exception()
+            for (i, pdf_name, trabalho), _docx in conversoes[fut]:
+                pdf_path = os.path.join(out_dir, f"{i:05d}.pdf")
+                if os.path.exists(pdf_path):
+                    engine.guardar(trabalho, pdf_path)
+                    yield pdf_name, pdf_path, None
+                else:
+                    engine.erro(tipo)
+                    yield pdf_name, None, str(erro_grupo or "PDF não foi gerado.")
+
+
+class _Sink:
+    """Destino sem seek para o ZipFile: junta os bytes até alguém recolher."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, b) -> int:
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def flush(self) -> None:
+        pass
+
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_zip(resultados, progresso=None):
+    """
+    Recebe o que gerar_lote produz e devolve o ZIP em pedaços (bytes), um por
+    PDF pronto. Os PDFs são apagados depois de entrar no ZIP. Registros com
+    erro vão para ERROS.txt no final.
+    progresso(feitos, erros) é chamado a cada registro.
+    """
+    sink = _Sink()
+    erros = []
+    feitos = 0
+
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for pdf_name, pdf_path, erro in resultados:
+            if erro:
+                erros.append(f"{pdf_name}: {erro}")
+            else:
+                zip_stored(zf, pdf_name, pdf_path)
+                try:
+                    os.remove(pdf_path)
+                except OSError:
+                    pass
+            feitos += 1
+
+            if progresso:
+                progresso(feitos, len(erros))
+            chunk = sink.take()
+            if chunk:
+                yield chunk
+
+        if erros:
+            zf.writestr("ERROS.txt", "\n".join(erros) + "\n")
+
+    yield sink.take()
+
+
+def main(argv=None) -> int:
+    import argparse
+    from images import preparar_imagem
+
+    parser = argparse.ArgumentParser(description="Gera PDFs em lote a partir de um CSV/JSON.")
+    parser.add_argument("tipo", choices=TIPOS)
+    parser.add_argument("arquivo", help="CSV ou JSON com os registros")
+    parser.add_argument("saida", help="ZIP de saída")
+    parser.add_argument("--imagem", help="foto do equipamento (obrigatória para proposta)")
+    parser.add_argument("--grupo", type=int, default=LOTE_GRUPO, help="documentos por chamada ao LibreOffice")
+    args = parser.parse_args(argv)
+
+    registros = ler_registros(Path(args.arquivo).read_bytes(), args.arquivo)
+
+    imagem = None
+    if args.imagem:
+        imagem, _stats = preparar_imagem(Path(args.imagem).read_bytes(), proposal_service.IMAGEM_LARGURA_MM)
+
+    total = len(registros)
+
+    def _progresso(feitos, erros):
+        print(f"\r{feitos}/{total} ({erros} com erro)", end="", file=sys.stderr, flush=True)
+
+    with tempfile.TemporaryDirectory() as out_dir, open(args.saida, "wb") as f:
+        resultados = gerar_lote(args.tipo, registros, out_dir, imagem=imagem, grupo=args.grupo)
+        for chunk in stream_zip(resultados, _progresso):
+            f.write(chunk)
+
+    print(file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
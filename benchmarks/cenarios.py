@@ -0,0 +1,202 @@
+"""
+Cenários do benchmark: cada um devolve uma função op(i) que gera um
+documento (ou um lote) e só retorna quando o PDF está pronto.
+
+Os dados mudam a cada chamada (i entra no nome e no valor), então o cache
+de PDFs nunca acerta mesmo se estiver ligado.
+
+"funcao_*" chamam os gerar_*_pdf direto; "rota_*" passam pelo Flask (test
+client): POST, espera o job terminar e baixa o PDF, como o navegador faz.
+"""
+import io
+import os
+import threading
+import time
+
+from PIL import Image
+
+ASSETS = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "assets"))
+
+# Foto "de celular": 3000x2000, reduzida pelo preparar_imagem como no upload
+FOTO_TAMANHO = (3000, 2000)
+
+# Registros por chamada do cenário rota_lote
+LOTE_REGISTROS = 20
+
+# Espera entre consultas ao /jobs/<id>
+POLL_S = 0.005
+
+
+def foto_jpeg() -> bytes:
+    img = Image.linear_gradient("L").resize(FOTO_TAMANHO).convert("RGB")
+    buf = io.BytesIO()
+    img.save(buf, "JPEG", quality=90)
+    return buf.getvalue()
+
+
+def form_proposta(i: int) -> dict:
+    return {"cliente": f"Cliente {i}", "cpf": "123.456.789-00", "modelo": "Impressora X",
+            "franquia": "1000", "valor": str(300 + i)}
+
+
+def form_contrato(i: int) -> dict:
+    return {"denominacao": f"Empresa {i}", "cpf_cnpj": "12.345.678/0001-00", "equipamento": "Impressora X",
+            "franquia": "1000", "valor_mensal": str(300 + i), "acc": ["Toner"],
+            "data_inicio": "01/02/26", "data_termino": "01/02/27"}
+
+
+def form_promissoria(i: int) -> dict:
+    return {"nome": f"Fulano {i}", "cpf": "123.456.789-00", "endereco": "Rua A, 1",
+            "data_venc": "01/03/26"}
+
+
+def form_termo(i: int) -> dict:
+    return {"nome": f"Fulano {i}", "cpf": "123.456.789-00", "eq": ["CPU"]}
+
+
+def form_pacote(i: int) -> dict:
+    return {"nome": f"Fulano {i}", "cpf": "123.456.789-00", "modelo": "Impressora X", "franquia": "1000",
+            "valor": str(300 + i), "data_inicio": "01/02/26", "data_termino": "01/02/27",
+            "data_venc": "01/03/26", "eq": ["CPU"]}
+
+
+def csv_lote(i: int) -> bytes:
+    linhas = ["cliente;cpf;modelo;franquia;valor"]
+    linhas += [f"Cliente {i}-{n};1;Impressora X;1000;{200 + n},00" for n in range(LOTE_REGISTROS)]
+    return ("\n".join(linhas) + "\n").encode()
+
+
+# ---------------- gerar_*_pdf direto ----------------
+
+def _funcao(nome: str, ctx: dict):
+    from batch import Registro
+    from images import preparar_imagem
+    import contract_service
+    import promissoria_service
+    import proposal_service
+    import termo_service
+
+    out_dir = ctx["out_dir"]
+    foto = ctx["foto"]
+
+    def _pdf(i):
+        return os.path.join(out_dir, f"{nome}-{i}.pdf")
+
+    if nome == "proposta":
+        imagem, _ = preparar_imagem(foto, proposal_service.IMAGEM_LARGURA_MM)
+        template = os.path.join(ASSETS, "template_proposta.docx")
+
+        def op(i):
+            dados = proposal_service.dados_do_formulario(Registro(form_proposta(i)))
+            proposal_service.gerar_proposta_pdf(template, _pdf(i), dados, imagem.getvalue())
+    elif nome == "contrato":
+        template = os.path.join(ASSETS, "template_contrato.docx")
+
+        def op(i):
+            dados = contract_service.dados_do_formulario(Registro(form_contrato(i)))
+            contract_service.gerar_contrato_pdf(template, _pdf(i), dados)
+    elif nome == "promissoria":
+        imagem, _ = preparar_imagem(foto, promissoria_service.IMAGEM_RG_LARGURA_MM)
+        template = os.path.join(ASSETS, "template_promissoria.docx")
+
+        def op(i):
+            dados = promissoria_service.dados_do_formulario(Registro(form_promissoria(i)))
+            promissoria_service.gerar_promissoria_pdf(template, _pdf(i), dados, imagem.getvalue())
+    else:
+        template = os.path.join(ASSETS, "template_termo_retirada.docx")
+
+        def op(i):
+            dados = termo_service.dados_do_formulario(Registro(form_termo(i)))
+            termo_service.gerar_termo_pdf(template, _pdf(i), dados)
+
+    def _op(i):
+        op(i)
+        os.remove(_pdf(i))
+
+    return _op
+
+
+# ---------------- rotas (Flask test client) ----------------
+
+def _client(app):
+    c = app.test_client()
+    with c.session_transaction() as s:
+        s["logged_in"] = True
+    return c
+
+
+def _esperar_job(c, resp) -> None:
+    if resp.status_code != 202:
+        raise RuntimeError(f"POST devolveu {resp.status_code}")
+    job_id = resp.json["job_id"]
+    while True:
+        st = c.get(f"/jobs/{job_id}").json
+        if st["status"] == "erro":
+            raise RuntimeError(st["error"])
+        if st["status"] == "pronto":
+            break
+        time.sleep(POLL_S)
+    if st["download_url"]:
+        d = c.get(st["download_url"])
+        if d.status_code != 200:
+            raise RuntimeError(f"download devolveu {d.status_code}")
+        d.close()
+
+
+def _rota(nome: str, ctx: dict):
+    app = ctx["app"]
+    foto = ctx["foto"]
+    headers = {"Accept": "application/json"}
+
+    def _post(c, url, data):
+        return c.post(url, data=data, headers=headers, content_type="multipart/form-data")
+
+    def op_proposta(c, i):
+        _esperar_job(c, _post(c, "/proposta", {**form_proposta(i), "imagem": (io.BytesIO(foto), "foto.jpg")}))
+
+    def op_contrato(c, i):
+        _esperar_job(c, _post(c, "/contrato", form_contrato(i)))
+
+    def op_promissoria(c, i):
+        _esperar_job(c, _post(c, "/promissoria", {**form_promissoria(i), "imagem_rg": (io.BytesIO(foto), "rg.jpg")}))
+
+    def op_termo(c, i):
+        _esperar_job(c, _post(c, "/termo", form_termo(i)))
+
+    def op_pacote(c, i):
+        _esperar_job(c, _post(c, "/pacote", {
+            **form_pacote(i),
+            "docs": ["proposta", "contrato", "promissoria", "termo"],
+            "imagem": (io.BytesIO(foto), "foto.jpg"),
+            "imagem_rg": (io.BytesIO(foto), "rg.jpg"),
+        }))
+
+    def op_lote(c, i):
+        r = _post(c, "/lote", {"tipo": "proposta", "arquivo": (io.BytesIO(csv_lote(i)), "lote.csv"),
+                               "imagem": (io.BytesIO(foto), "foto.jpg")})
+        if r.status_code != 200:
+            raise RuntimeError(f"POST devolveu {r.status_code}")
+        r.get_data()
+        r.close()
+
+    ops = {"proposta": op_proposta, "contrato": op_contrato, "promissoria": op_promissoria,
+           "termo": op_termo, "pacote": op_pacote, "lote": op_lote}
+    op = ops[nome]
+
+    # um test client (cookie de sessão próprio) por thread, como clientes diferentes
+    local = threading.local()
+
+    def _op(i):
+        c = getattr(local, "client", None)
+        if c is None:
+            c = local.client = _client(app)
+        op(c, i)
+
+    return _op
+
+
+FUNCOES = ("proposta", "contrato", "promissoria", "termo")
+ROTAS = ("proposta", "contrato", "promissoria", "termo", "pacote", "lote")
+
+CENARIOS = {f"funcao_{n}": (lambda ctx, n=n: _funcao(n, ctx)) for n in FUNCOES}
+CENARIOS.update({f"rota_{n}": (lambda ctx, n=n: _rota(n, ctx)) for n in ROTAS})
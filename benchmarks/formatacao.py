@@ -0,0 +1,190 @@
+"""
+Micro-benchmark das funções de formatação do utils (valores e datas).
+
+Compara a versão atual com a anterior (cópia abaixo, em _Antes: replace em
+cadeia, num2words(..., lang="pt_BR") e format_decimal(..., locale="pt_BR")
+a cada chamada) em duas cargas:
+  - repetidos: valores de um lote típico (poucas franquias, valores e datas
+    diferentes se repetindo), o caso do caminho de geração;
+  - distintos: todo valor é novo e o cache é limpo antes de cada rodada
+    (pior caso para a versão memoizada).
+
+Antes de medir confere que as duas versões devolvem o mesmo resultado.
+
+Uso (na raiz do projeto):
+  python benchmarks/formatacao.py
+  python benchmarks/formatacao.py -n 20000 --saida formatacao.json
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import utils  # noqa: E402
+
+
+class _Antes:
+    """utils antes da memoização (referência)."""
+
+    @staticmethod
+    def _normalizar(valor_str):
+        s = valor_str.strip().replace("R$", "").strip()
+        if s.count(",") == 1 and s.count(".") == 0:
+            s = s.replace(",", ".")
+        if s.count(".") >= 1 and s.count(",") == 1:
+            s = s.replace(".", "").replace(",", ".")
+        return float(s)
+
+    @staticmethod
+    def moeda_pt_br(valor_str):
+        from num2words import num2words
+        v = _Antes._normalizar(valor_str)
+        moeda = f"R$ {v:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+        return moeda, num2words(int(v), lang="pt_BR") + " reais"
+
+    @staticmethod
+    def moeda_formatada_pt_br(valor_str):
+        from num2words import num2words
+        v = _Antes._normalizar(valor_str)
+        moeda = f"{v:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+        return moeda, num2words(int(v), lang="pt_BR") + " reais"
+
+    @staticmethod
+    def inteiro_formatado_pt_br(valor_str):
+        s = valor_str.strip().replace("R$", "").strip()
+        s = s.replace(".", "")
+        if s.isdigit():
+            return int(s)
+        s = s.replace(",", ".")
+        return int(float(s))
+
+    @staticmethod
+    def numero_milhar_pt_br(n):
+        from babel.numbers import format_decimal
+        return format_decimal(n, locale="pt_BR")
+
+    @staticmethod
+    def extenso_pt_br(n):
+        from num2words import num2words
+        return num2words(n, lang="pt_BR")
+
+    @staticmethod
+    def data_curta_para_extenso(data_curta):
+        partes = data_curta.strip().split("/")
+        dd, mm, aa = int(partes[0]), int(partes[1]), partes[2]
+        if len(aa) == 2:
+            y = int(aa)
+            ano = 2000 + y if y <= 79 else 1900 + y
+        else:
+            ano = int(aa)
+        return utils.data_pt_br(datetime(ano, mm, dd))
+
+
+# O que um contrato chama (contract_service.dados_do_formulario e contexto_contrato)
+FUNCOES = ("moeda_pt_br", "moeda_formatada_pt_br", "inteiro_formatado_pt_br",
+           "numero_milhar_pt_br", "extenso_pt_br", "data_curta_para_extenso")
+
+
+def _entradas(carga: str, n: int, seed: int = 42) -> dict:
+    rnd = random.Random(seed)
+    if carga == "repetidos":
+        valores = [f"{v},00" for v in (199, 250, 300, 349, 420, 500)] + ["1.234,56", "R$ 890"]
+        franquias = ["1000", "2.000", "3000", "5.000"]
+        datas = ["01/02/26", "15/03/26", "01/02/2027", "10/10/26"]
+        valor = [rnd.choice(valores) for _ in range(n)]
+        franquia = [rnd.choice(franquias) for _ in range(n)]
+        data = [rnd.choice(datas) for _ in range(n)]
+    else:
+        # "123,45", "1.234,56", "R$ 123" se alternando
+        formatos = ("{r},{c:02d}", "{m}.{r:03d},{c:02d}", "R$ {r}")
+        valor = [formatos[i % 3].format(r=100 + i % 900, m=1 + i // 900, c=i % 100) for i in range(n)]
+        franquia = [str(1000 + i) for i in range(n)]
+        data = [f"{1 + i % 28:02d}/{1 + i // 28 % 12:02d}/{2000 + i // 336}" for i in range(n)]
+    inteiros = [int(f.replace(".", "")) for f in franquia]
+    return {
+        "moeda_pt_br": valor,
+        "moeda_formatada_pt_br": valor,
+        "inteiro_formatado_pt_br": franquia,
+        "numero_milhar_pt_br": inteiros,
+        "extenso_pt_br": inteiros,
+        "data_curta_para_extenso": data,
+    }
+
+
+def _limpar_caches() -> None:
+    for fn in (utils._extenso, utils._normalizar_moeda, utils.inteiro_formatado_pt_br,
+               utils.numero_milhar_pt_br, utils.data_curta_para_extenso):
+        fn.cache_clear()
+
+
+def _conferir(entradas: dict) -> None:
+    for nome, args in entradas.items():
+        antes, depois = getattr(_Antes, nome), getattr(utils, nome)
+        for a in args:
+            if antes(a) != depois(a):
+                raise SystemExit(f"{nome}({a!r}): {antes(a)!r} != {depois(a)!r}")
+
+
+def _medir(fn, args: list, rodadas: int, limpar: bool) -> float:
+    """Melhor de N rodadas, em µs por chamada."""
+    melhor = None
+    for _ in range(rodadas):
+        if limpar:
+            _limpar_caches()
+        t0 = time.perf_counter()
+        for a in args:
+            fn(a)
+        dt = time.perf_counter() - t0
+        melhor = dt if melhor is None else min(melhor, dt)
+    return melhor / len(args) * 1e6
+
+
+def rodar(n: int, rodadas: int) -> dict:
+    # imports e primeiras chamadas fora da medição (as duas versões)
+    utils.preload()
+    _Antes.moeda_pt_br("1")
+    _Antes.numero_milhar_pt_br(1)
+
+    resultados = []
+    for carga in ("repetidos", "distintos"):
+        entradas = _entradas(carga, n)
+        _conferir(entradas)
+        for nome in FUNCOES:
+            args = entradas[nome]
+            antes = _medir(getattr(_Antes, nome), args, rodadas, limpar=False)
+            depois = _medir(getattr(utils, nome), args, rodadas, limpar=carga == "distintos")
+            resultados.append({
+                "carga": carga,
+                "funcao": nome,
+                "antes_us": round(antes, 3),
+                "depois_us": round(depois, 3),
+                "ganho": round(antes / depois, 1) if depois else None,
+            })
+            print(f"{carga:<10} {nome:<24} antes={antes:>8.2f}µs depois={depois:>8.2f}µs "
+                  f"{antes / depois:>6.1f}x", file=sys.stderr)
+    return {"n": n, "rodadas": rodadas, "resultados": resultados}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Micro-benchmark da formatação de valores e datas.")
+    parser.add_argument("-n", type=int, default=5000, help="chamadas por função e rodada")
+    parser.add_argument("--rodadas", type=int, default=5, help="rodadas (vale a melhor)")
+    parser.add_argument("--saida", help="grava o JSON aqui (padrão: stdout)")
+    args = parser.parse_args(argv)
+
+    relatorio = rodar(args.n, args.rodadas)
+    texto = json.dumps(relatorio, indent=2, ensure_ascii=False)
+    if args.saida:
+        Path(args.saida).write_text(texto + "\n", encoding="utf-8")
+    else:
+        print(texto)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,328 @@
+"""
+Benchmark do caminho de geração (gerar_*_pdf e rotas do Flask).
+
+Modos:
+  - stub: CONVERTER_BACKEND=stub, PDF em branco sem LibreOffice; mede só o
+    nosso lado (contexto, render do .docx, jobs, rotas). Roda em qualquer
+    máquina;
+  - real: CONVERTER_BACKEND=daemon (ou o que estiver no ambiente), com o
+    LibreOffice de verdade (LIBREOFFICE_PATH).
+
+Cada (cenário, clientes) roda num processo Python novo, com STORAGE_DIR e
+banco temporários e o cache de PDFs desligado: o pico de memória (RSS) é
+daquele cenário e um não aquece o outro.
+
+Saída: latência p50/p95/p99 (ms), vazão (documentos/s) com N clientes
+simultâneos e pico de RSS do processo e dos filhos (soffice, vivos ou
+não), em JSON.
+
+Uso (na raiz do projeto):
+  python benchmarks/run.py --modo stub --saida bench-stub.json
+  python benchmarks/run.py --modo real --clientes 1,2,4 -n 40
+  python benchmarks/run.py --cenarios rota_proposta,funcao_termo
+  python benchmarks/run.py --comparar antes.json depois.json
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from cenarios import CENARIOS  # noqa: E402
+
+MODOS = ("stub", "real")
+
+
+def percentil(valores: list, p: float) -> float:
+    """Percentil pelo posto mais próximo (valores já ordenados)."""
+    if not valores:
+        return 0.0
+    k = max(0, min(len(valores) - 1, math.ceil(p / 100 * len(valores)) - 1))
+    return valores[k]
+
+
+def _rss_mb(who) -> float:
+    kb = resource.getrusage(who).ru_maxrss
+    # Linux devolve KB, macOS devolve bytes
+    if sys.platform == "darwin":
+        kb /= 1024
+    return round(kb / 1024, 1)
+
+
+def _descendentes(pid: int) -> list:
+    """PIDs dos processos abaixo de pid ainda vivos (Linux, via /proc)."""
+    filhos = {}
+    for entrada in os.listdir("/proc"):
+        if not entrada.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entrada}/stat") as f:
+                # "pid (comm) estado ppid ...": comm pode ter espaço e parêntese
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        filhos.setdefault(ppid, []).append(int(entrada))
+    pids, pendentes = [], [pid]
+    while pendentes:
+        for filho in filhos.get(pendentes.pop(), []):
+            pids.append(filho)
+            pendentes.append(filho)
+    return pids
+
+
+def _vm_hwm_kb(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for linha in f:
+                if linha.startswith("VmHWM:"):
+                    return int(linha.split()[1])
+    except (OSError, ValueError):
+        pass
+    return 0
+
+
+def _rss_filhos_mb() -> float:
+    """
+    Pico de RSS dos filhos (LibreOffice). RUSAGE_CHILDREN só conta quem já
+    terminou (subprocess por conversão); o daemon e o pool continuam vivos
+    no fim do cenário, então soma o VmHWM de cada descendente vivo e fica
+    com o maior dos dois.
+    """
+    mortos = _rss_mb(resource.RUSAGE_CHILDREN)
+    if not os.path.isdir("/proc"):
+        return mortos
+    vivos = sum(_vm_hwm_kb(pid) for pid in _descendentes(os.getpid()))
+    return max(mortos, round(vivos / 1024, 1))
+
+
+# ---------------- processo filho: um cenário ----------------
+
+def _rodar_cenario(nome: str, clientes: int, n: int, aquecimento: int) -> dict:
+    from app import app
+    import converter
+    import warmup
+
+    # espera o aquecimento do worker (o mesmo que o /ready espera)
+    limite = time.monotonic() + 300
+    while not warmup.status()["pronto"] and time.monotonic() < limite:
+        time.sleep(0.1)
+
+    ctx = {"app": app, "foto": _foto(), "out_dir": tempfile.mkdtemp(prefix="bench-")}
+    op = CENARIOS[nome](ctx)
+
+    # primeira conversão sobe o LibreOffice, primeiro render abre o template
+    for i in range(aquecimento):
+        op(-1 - i)
+
+    latencias = []
+    erros = []
+    proximo = iter(range(n))
+    lock = threading.Lock()
+
+    def _cliente():
+        while True:
+            with lock:
+                i = next(proximo, None)
+            if i is None:
+                return
+            t0 = time.perf_counter()
+            try:
+                op(i)
+            except Exception as e:
+                with lock:
+                    erros.append(str(e))
+                continue
+            dt = time.perf_counter() - t0
+            with lock:
+                latencias.append(dt)
+
+    threads = [threading.Thread(target=_cliente) for _ in range(clientes)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    total_s = time.perf_counter() - t0
+
+    latencias.sort()
+    ms = [x * 1000 for x in latencias]
+    return {
+        "cenario": nome,
+        "clientes": clientes,
+        "n": n,
+        "ok": len(latencias),
+        "erros": len(erros),
+        "primeiro_erro": erros[0] if erros else None,
+        "p50_ms": round(percentil(ms, 50), 2),
+        "p95_ms": round(percentil(ms, 95), 2),
+        "p99_ms": round(percentil(ms, 99), 2),
+        "media_ms": round(sum(ms) / len(ms), 2) if ms else 0.0,
+        "max_ms": round(ms[-1], 2) if ms else 0.0,
+        "vazao_por_s": round(len(latencias) / total_s, 2) if total_s else 0.0,
+        "rss_pico_mb": _rss_mb(resource.RUSAGE_SELF),
+        "rss_pico_filhos_mb": _rss_filhos_mb(),
+        "backend": converter.get_backend().name,
+    }
+
+
+_FOTO = None
+
+
+def _foto() -> bytes:
+    global _FOTO
+    if _FOTO is None:
+        from cenarios import foto_jpeg
+        _FOTO = foto_jpeg()
+    return _FOTO
+
+
+def _filho(args) -> int:
+    resultado = _rodar_cenario(args.um, args.clientes_um, args.n, args.aquecimento)
+    # stdout pode ter log do app: o resultado vai numa linha marcada
+    print("BENCH_RESULT " + json.dumps(resultado), flush=True)
+    # não espera a fila de jobs/LibreOffice fechar com calma
+    os._exit(0)
+
+
+# ---------------- processo pai ----------------
+
+def _ambiente(modo: str, pasta: str) -> dict:
+    env = dict(os.environ)
+    env.update({
+        "STORAGE_DIR": os.path.join(pasta, "storage"),
+        "DATABASE_URL": f"sqlite:///{os.path.join(pasta, 'bench.db')}",
+        "PDF_CACHE_MAX_MB": "0",
+        "SWEEPER_INTERVAL_MIN": "0",
+    })
+    if modo == "stub":
+        env["CONVERTER_BACKEND"] = "stub"
+    elif env.get("CONVERTER_BACKEND", "daemon") == "stub":
+        env["CONVERTER_BACKEND"] = "daemon"
+    return env
+
+
+def _git_commit() -> str:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ, capture_output=True, text=True)
+        sujo = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=RAIZ,
+                              capture_output=True, text=True).stdout.strip()
+        return out.stdout.strip() + ("-sujo" if sujo else "") if out.returncode == 0 else ""
+    except OSError:
+        return ""
+
+
+def _checar_libreoffice() -> None:
+    import converter
+    if not os.path.exists(converter.LIBREOFFICE_PATH):
+        raise SystemExit(
+            f"LibreOffice não encontrado em {converter.LIBREOFFICE_PATH} "
+            "(defina LIBREOFFICE_PATH ou use --modo stub)."
+        )
+
+
+def rodar(modo: str, cenarios: list, clientes: list, n: int, aquecimento: int) -> dict:
+    if modo == "real":
+        _checar_libreoffice()
+
+    resultados = []
+    for nome in cenarios:
+        for c in clientes:
+            with tempfile.TemporaryDirectory(prefix="bench-") as pasta:
+                cmd = [sys.executable, __file__, "--um", nome, "--clientes-um", str(c),
+                       "-n", str(n), "--aquecimento", str(aquecimento)]
+                proc = subprocess.run(cmd, cwd=RAIZ, env=_ambiente(modo, pasta), capture_output=True, text=True)
+
+            linha = next((ln for ln in proc.stdout.splitlines() if ln.startswith("BENCH_RESULT ")), None)
+            if linha is None:
+                print(proc.stderr, file=sys.stderr)
+                raise SystemExit(f"{nome} com {c} cliente(s) falhou (código {proc.returncode}).")
+
+            r = json.loads(linha[len("BENCH_RESULT "):])
+            resultados.append(r)
+            print(f"{nome:<20} c={c:<3} p50={r['p50_ms']:>9.1f}ms p95={r['p95_ms']:>9.1f}ms "
+                  f"p99={r['p99_ms']:>9.1f}ms {r['vazao_por_s']:>7.2f}/s rss={r['rss_pico_mb']}MB"
+                  + (f" erros={r['erros']} ({r['primeiro_erro']})" if r["erros"] else ""),
+                  file=sys.stderr)
+
+    return {
+        "modo": modo,
+        "commit": _git_commit(),
+        "data": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+        "n": n,
+        "aquecimento": aquecimento,
+        "resultados": resultados,
+    }
+
+
+def comparar(antes_path: str, depois_path: str) -> None:
+    """Diferença (%) de p50/p95/p99, vazão e RSS entre dois JSON."""
+    antes = json.loads(Path(antes_path).read_text(encoding="utf-8"))
+    depois = json.loads(Path(depois_path).read_text(encoding="utf-8"))
+    base = {(r["cenario"], r["clientes"]): r for r in antes["resultados"]}
+
+    print(f"{antes.get('commit') or antes_path} -> {depois.get('commit') or depois_path} ({depois['modo']})")
+    for r in depois["resultados"]:
+        a = base.get((r["cenario"], r["clientes"]))
+        if a is None:
+            continue
+        partes = []
+        for campo in ("p50_ms", "p95_ms", "p99_ms", "vazao_por_s", "rss_pico_mb"):
+            if a[campo]:
+                partes.append(f"{campo}={(r[campo] - a[campo]) / a[campo] * 100:+.1f}%")
+        print(f"{r['cenario']:<20} c={r['clientes']:<3} " + " ".join(partes))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark da geração de documentos.")
+    parser.add_argument("--modo", choices=MODOS, default="stub")
+    parser.add_argument("--cenarios", default=",".join(CENARIOS),
+                        help=f"separados por vírgula (padrão: todos: {', '.join(CENARIOS)})")
+    parser.add_argument("--clientes", default="1,4", help="clientes simultâneos, ex.: 1,4,8")
+    parser.add_argument("-n", type=int, default=30, help="documentos medidos por cenário")
+    parser.add_argument("--aquecimento", type=int, default=2, help="execuções descartadas antes de medir")
+    parser.add_argument("--saida", help="grava o JSON aqui (padrão: stdout)")
+    parser.add_argument("--comparar", nargs=2, metavar=("ANTES", "DEPOIS"), help="compara dois JSON")
+    # uso interno: processo filho que roda um cenário só
+    parser.add_argument("--um", help=argparse.SUPPRESS)
+    parser.add_argument("--clientes-um", type=int, default=1, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.um:
+        return _filho(args)
+
+    if args.comparar:
+        comparar(*args.comparar)
+        return 0
+
+    cenarios = [c.strip() for c in args.cenarios.split(",") if c.strip()]
+    desconhecidos = [c for c in cenarios if c not in CENARIOS]
+    if desconhecidos:
+        parser.error(f"cenário desconhecido: {', '.join(desconhecidos)}")
+    clientes = [int(c) for c in args.clientes.split(",") if c.strip()]
+
+    relatorio = rodar(args.modo, cenarios, clientes, args.n, args.aquecimento)
+    texto = json.dumps(relatorio, indent=2, ensure_ascii=False)
+    if args.saida:
+        Path(args.saida).write_text(texto + "\n", encoding="utf-8")
+    else:
+        print(texto)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,35 +1,83 @@
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+
+from sqlalchemy import delete, or_
+
+import search
+import storage
 from models import db, Proposal
 
-def cleanup_expired(retention_days: int) -> int:
-    now = datetime.utcnow()
+
+def _remove_files(paths, workers: int = 8) -> None:
+    def _rm(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    if len(paths) <= 1 or workers <= 1:
+        for path in paths:
+            _rm(path)
+        return
+
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        list(ex.map(_rm, paths))
+
+
+def cleanup_expired(retention_days: int, batch_size: int = 500, workers: int = 8) -> int:
+    """
+    Remove propostas vencidas (expires_at já passou ou criadas há mais de
+    retention_days) e seus PDFs, em lotes de batch_size.
+
+    Só id/pdf_path/blob_sha256 são lidos; cada lote vira um DELETE ... WHERE
+    id IN (...), com as referências dos blobs descontadas na mesma transação.
+    Blobs que ficaram sem referência saem depois do commit.
+    """
+    now = datetime.now()  # created_at/expires_at são gravados em hora local
     cutoff = now - timedelta(days=retention_days)
 
-    expired = Proposal.query.filter(Proposal.created_at < cutoff).all()
+    expired = or_(Proposal.expires_at < now, Proposal.created_at < cutoff)
     removed = 0
 
-    for p in expired:
-        if p.pdf_path and os.path.exists(p.pdf_path):
-            try:
-                os.remove(p.pdf_path)
-            except Exception:
-                pass
+    while True:
+        rows = (
+            db.session.query(Proposal.id, Proposal.pdf_path, Proposal.blob_sha256)
+            .filter(expired)
+            .order_by(Proposal.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not rows:
+            break
 
-        db.session.delete(p)
-        removed += 1
+        # PDFs de antes dos blobs
+        _remove_files([r.pdf_path for r in rows if r.pdf_path], workers=workers)
 
-    if removed:
+        ids = [r.id for r in rows]
+        shas = [r.blob_sha256 for r in rows]
+        search.unindex(ids)
+        storage.unref_blobs(shas)
+        db.session.execute(
+            delete(Proposal).where(Proposal.id.in_(ids)).execution_options(synchronize_session=False)
+        )
         db.session.commit()
+        storage.collect_blobs(shas)
+        removed += len(ids)
+
+        if len(rows) < batch_size:
+            break
 
     return removed
 
+import shutil
 import time
 from pathlib import Path
 
-def cleanup_tmp_contracts(tmp_dir: str, max_age_hours: int = 24) -> int:
+def cleanup_tmp_contracts(tmp_dir: str, max_age_hours: int = 24, pattern: str = "*.pdf") -> int:
     """
     Apaga PDFs de contrato temporários mais antigos que max_age_hours.
+    (pattern troca o tipo de arquivo, ex.: "*.json" dos jobs)
     Retorna quantos apagou.
     """
     p = Path(tmp_dir)
@@ -40,7 +88,7 @@ def cleanup_tmp_contracts(tmp_dir: str, max_age_hours: int = 24) -> int:
     cutoff = now - (max_age_hours * 3600)
 
     removed = 0
-    for f in p.glob("*.pdf"):
+    for f in p.glob(pattern):
         try:
             if f.stat().st_mtime < cutoff:
                 f.unlink()
@@ -48,4 +96,185 @@ def cleanup_tmp_contracts(tmp_dir: str, max_age_hours: int = 24) -> int:
         except Exception:
             pass
 
-    return removed
\ No newline at end of file
+    return removed
+
+
+def cleanup_tmp_dirs(tmp_dir: str, max_age_hours: int = 24) -> int:
+    """
+    Apaga as subpastas de tmp_dir (com o que tiver dentro) sem mudança há
+    mais de max_age_hours. Retorna quantas apagou.
+    """
+    p = Path(tmp_dir)
+    if not p.exists():
+        return 0
+
+    cutoff = time.time() - (max_age_hours * 3600)
+
+    removed = 0
+    for d in p.iterdir():
+        try:
+            if d.is_dir() and d.stat().st_mtime < cutoff:
+                shutil.rmtree(d)
+                removed += 1
+        except Exception:
+            pass
+
+    return removed
+
+
+# ---------------- Varredura em segundo plano ----------------
+import logging
+import threading
+
+import metrics
+from locks import FileLock
+
+log = logging.getLogger("cleanup")
+
+# última passada deste processo (aparece no /health)
+last_sweep = {"at": None, "removed": {}}
+
+TMP_FOLDERS = ["_contratos_tmp", "_promissorias_tmp", "_termos_tmp", "_pacotes_tmp", "_tmp"]
+
+
+def run_sweep(app) -> dict:
+    """
+    Uma passada completa de limpeza. Retorna quantos itens saíram de cada lugar.
+    """
+    storage_dir = app.config["STORAGE_DIR"]
+    report = {}
+
+    with app.app_context():
+        try:
+            report["propostas"] = cleanup_expired(app.config["RETENTION_DAYS"])
+        except Exception:
+            log.exception("falha ao limpar propostas expiradas")
+            report["propostas"] = 0
+
+    for folder in TMP_FOLDERS:
+        try:
+            report[folder] = cleanup_tmp_contracts(os.path.join(storage_dir, folder), max_age_hours=24)
+        except Exception:
+            log.exception("falha ao limpar %s", folder)
+            report[folder] = 0
+
+    try:
+        # pacotes também saem em ZIP
+        report["_pacotes_tmp"] += cleanup_tmp_contracts(
+            os.path.join(storage_dir, "_pacotes_tmp"), max_age_hours=24, pattern="*.zip"
+        )
+    except Exception:
+        log.exception("falha ao limpar _pacotes_tmp")
+
+    try:
+        report["_jobs"] = cleanup_tmp_contracts(os.path.join(storage_dir, "_jobs"), max_age_hours=24, pattern="*.json")
+    except Exception:
+        log.exception("falha ao limpar _jobs")
+        report["_jobs"] = 0
+
+    try:
+        report["_idem"] = cleanup_tmp_contracts(
+            os.path.join(storage_dir, "_idem"), max_age_hours=app.config["IDEMPOTENCY_TTL_MIN"] / 60, pattern="*.json"
+        )
+    except Exception:
+        log.exception("falha ao limpar _idem")
+        report["_idem"] = 0
+
+    try:
+        # pastas do lote ficam para trás se o worker morre no meio do download
+        report["_lotes_tmp"] = cleanup_tmp_dirs(os.path.join(storage_dir, "_lotes_tmp"), max_age_hours=24)
+    except Exception:
+        log.exception("falha ao limpar _lotes_tmp")
+        report["_lotes_tmp"] = 0
+
+    # perfis (PROFILING=1): .prof e .txt do cProfile, .html do pyinstrument
+    report["_profiles"] = 0
+    for pattern in ("*.prof", "*.txt", "*.html"):
+        try:
+            report["_profiles"] += cleanup_tmp_contracts(
+                os.path.join(storage_dir, "_profiles"), max_age_hours=24, pattern=pattern
+            )
+        except Exception:
+            log.exception("falha ao limpar _profiles")
+
+    for where, count in report.items():
+        if count:
+            metrics.CLEANUP_REMOVED.inc(count, local=where)
+
+    return report
+
+
+def _sweeper_loop(app, interval_seconds: int) -> None:
+    # só um processo (worker do gunicorn) varre; os outros ficam tentando
+    # pegar a trava, e assumem se o dono morrer
+    lock = FileLock(os.path.join(app.config["STORAGE_DIR"], ".sweeper.lock"))
+
+    while True:
+        if lock.acquire(blocking=False):
+            try:
+                report = run_sweep(app)
+                removed = {k: v for k, v in report.items() if v}
+                last_sweep["at"] = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
+                last_sweep["removed"] = removed
+                if removed:
+                    log.info("limpeza (pid %s): %s", os.getpid(), removed)
+            except Exception:
+                log.exception("falha na limpeza periódica")
+        time.sleep(interval_seconds)
+
+
+def start_sweeper(app, interval_minutes: int):
+    """
+    Sobe a thread de limpeza periódica. interval_minutes <= 0 não sobe nada.
+    """
+    if interval_minutes <= 0:
+        return None
+
+    if not log.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("[%(asctime)s] %(name)s: %(message)s"))
+        log.addHandler(handler)
+        log.setLevel(logging.INFO)
+
+    t = threading.Thread(
+        target=_sweeper_loop,
+        args=(app, interval_minutes * 60),
+        name="cleanup-sweeper",
+        daemon=True,
+    )
+    t.start()
+    return t
+
+
+def _cli_app():
+    """
+    App mínimo para a passada do cron: só config, banco e storage. Importar
+    o app.py subiria o aquecimento (conversão de verdade no LibreOffice), o
+    flusher de métricas e a thread de limpeza neste processo de uma passada.
+    """
+    from flask import Flask
+
+    from config import Config
+    from models import ensure_schema
+
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    os.makedirs(app.config["STORAGE_DIR"], exist_ok=True)
+    storage.configure(app.config["STORAGE_DIR"])
+
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        ensure_schema()
+        search.init_search()
+    return app
+
+
+if __name__ == "__main__":
+    # Uso: python cleanup.py  (uma passada, ex.: via cron)
+    flask_app = _cli_app()
+
+    logging.basicConfig(level=logging.INFO)
+    for where, count in run_sweep(flask_app).items():
+        print(f"{where}: {count} removido(s)")
+
@@ -14,4 +14,65 @@ class Config:
     STORAGE_DIR = os.getenv("STORAGE_DIR", os.path.abspath("./data"))
 
     # Expiração em dias
-    RETENTION_DAYS = int(os.getenv("RETENTION_DAYS", "10"))
\ No newline at end of file
+    RETENTION_DAYS = int(os.getenv("RETENTION_DAYS", "10"))
+
+    # Quem converte DOCX -> PDF: "daemon" (pool de LibreOffice residentes),
+    # "subprocess" (um soffice por PDF) ou "stub" (PDF em branco, sem LibreOffice)
+    CONVERTER_BACKEND = os.getenv("CONVERTER_BACKEND", "daemon")
+    # Tempo máximo (s) de cada conversão; passou, o LibreOffice é morto. 0 = sem limite.
+    CONVERTER_TIMEOUT = int(os.getenv("CONVERTER_TIMEOUT", "60"))
+    # Tentativas extras quando a conversão falha (espera 0,5s, 1s, 2s...)
+    CONVERTER_RETRIES = int(os.getenv("CONVERTER_RETRIES", "2"))
+    # Disjuntor: depois de N falhas seguidas recusa conversões por COOLDOWN segundos
+    CONVERTER_BREAKER_THRESHOLD = int(os.getenv("CONVERTER_BREAKER_THRESHOLD", "5"))
+    CONVERTER_BREAKER_COOLDOWN = int(os.getenv("CONVERTER_BREAKER_COOLDOWN", "30"))
+    # Conversões ao mesmo tempo na máquina (todos os workers); as demais esperam
+    # uma vaga por até CONVERTER_QUEUE_TIMEOUT segundos
+    CONVERTER_MAX_CONCURRENT = int(os.getenv("CONVERTER_MAX_CONCURRENT", "2"))
+    CONVERTER_QUEUE_TIMEOUT = int(os.getenv("CONVERTER_QUEUE_TIMEOUT", "120"))
+
+    # Pool de LibreOffice por worker do gunicorn (cada um com perfil próprio)
+    CONVERTER_POOL_SIZE = int(os.getenv("CONVERTER_POOL_SIZE", "2"))
+    # Recicla o soffice depois de tantas conversões (0 = nunca)
+    CONVERTER_MAX_CONVERSIONS = int(os.getenv("CONVERTER_MAX_CONVERSIONS", "100"))
+
+    # Threads (por worker do gunicorn) que rodam a fila de geração de PDFs
+    JOB_WORKERS = int(os.getenv("JOB_WORKERS", str(CONVERTER_POOL_SIZE)))
+    # Jobs pendentes (fila + gerando) somando os workers; passou disso, 503. 0 = sem limite.
+    JOB_QUEUE_MAX = int(os.getenv("JOB_QUEUE_MAX", "20"))
+
+    # Cache de PDFs prontos (mesma entrada = mesmo PDF). 0 desliga.
+    PDF_CACHE_MAX_MB = int(os.getenv("PDF_CACHE_MAX_MB", "200"))
+
+    # Intervalo da limpeza em segundo plano (expiradas + temporários). 0 desliga.
+    SWEEPER_INTERVAL_MIN = int(os.getenv("SWEEPER_INTERVAL_MIN", "15"))
+
+    # Resolução das fotos enviadas no documento (reduzidas antes do DOCX)
+    IMAGE_DPI = int(os.getenv("IMAGE_DPI", "200"))
+
+    # Por quanto tempo (min) um formulário reenviado cai no job do primeiro envio
+    IDEMPOTENCY_TTL_MIN = int(os.getenv("IDEMPOTENCY_TTL_MIN", "10"))
+
+    # Máximo de registros por lote (/lote)
+    LOTE_MAX = int(os.getenv("LOTE_MAX", "500"))
+
+    # /metrics (Prometheus): "Authorization: Bearer <token>" ou sessão logada;
+    # sem token definido, só quem está logado vê
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+    # Perfil por requisição (X-Profile: 1 ou ?profile=1, só logado). "1" liga.
+    PROFILING = os.getenv("PROFILING", "0") == "1"
+    # "cprofile" (padrão) ou "pyinstrument" (precisa do pacote instalado)
+    PROFILER = os.getenv("PROFILER", "cprofile")
+
+    # PDFs das propostas servidos pelo proxy: "x-accel" (nginx) ou "x-sendfile" (Apache/lighttpd).
+    # Vazio (padrão): o próprio Flask envia.
+    DOWNLOAD_OFFLOAD = os.getenv("DOWNLOAD_OFFLOAD", "")
+    # Location "internal" do nginx que aponta para o STORAGE_DIR (modo x-accel)
+    DOWNLOAD_ACCEL_PREFIX = os.getenv("DOWNLOAD_ACCEL_PREFIX", "/_protegido/")
+
+    # Templates só com {{ VARIAVEL }} são preenchidos direto no XML, sem docxtpl. "0" desliga.
+    FAST_RENDER = os.getenv("FAST_RENDER", "1") == "1"
+
+    # Aquece cada worker ao subir (imports, templates, uma conversão); /ready espera por isso
+    PREWARM = os.getenv("PREWARM", "1") == "1"
\ No newline at end of file
@@ -1,44 +1,36 @@
-import os
-import subprocess
-import tempfile
 from datetime import datetime
-from pathlib import Path
 
-from docxtpl import DocxTemplate
+from engine import engine
+from utils import data_pt_br, inteiro_formatado_pt_br, numero_milhar_pt_br, extenso_pt_br, moeda_formatada_pt_br, data_curta_para_extenso
 
-from utils import data_pt_br, inteiro_formatado_pt_br, numero_milhar_pt_br, extenso_pt_br, moeda_formatada_pt_br
 
-import os
-LIBREOFFICE_PATH = os.getenv("LIBREOFFICE_PATH", r"C:\Program Files\LibreOffice\program\soffice.exe")
+def dados_do_formulario(form) -> dict:
+    """
+    form: request.form ou um registro de lote (precisa de .get e .getlist).
+    Datas chegam como dd/mm/aa e saem por extenso.
+    """
+    acc_list = form.getlist("acc")
+    acc_outros = form.get("acc_outros", "").strip()
+    if acc_outros:
+        acc_list.append(acc_outros)
+    acessorios = " / ".join([a for a in acc_list if a])
 
-def _convert_docx_to_pdf(docx_path: str, out_dir: str) -> str:
-    Path(out_dir).mkdir(parents=True, exist_ok=True)
-
-    cmd = [
-        LIBREOFFICE_PATH,
-        "--headless",
-        "--convert-to", "pdf",
-        "--outdir", out_dir,
-        docx_path,
-    ]
-
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    if result.returncode != 0:
-        raise RuntimeError(
-            "Falha ao converter para PDF.\n"
-            f"stdout: {result.stdout}\n"
-            f"stderr: {result.stderr}\n"
-        )
-
-    pdf_name = Path(docx_path).with_suffix(".pdf").name
-    pdf_path = str(Path(out_dir) / pdf_name)
-    if not os.path.exists(pdf_path):
-        raise RuntimeError("PDF não foi encontrado após conversão.")
-    return pdf_path
+    return {
+        "DENOMINACAO": form.get("denominacao", "").strip(),
+        "CPF_CNPJ": form.get("cpf_cnpj", "").strip(),
+        "ENDERECO": form.get("endereco", "").strip(),
+        "TELEFONE": form.get("telefone", "").strip(),
+        "EMAIL": form.get("email", "").strip(),
+        "EQUIPAMENTO": form.get("equipamento", "").strip(),
+        "ACESSORIOS": acessorios,
+        "DATA_INICIO": data_curta_para_extenso(form.get("data_inicio", "").strip()),
+        "DATA_TERMINO": data_curta_para_extenso(form.get("data_termino", "").strip()),
+        "FRANQUIA": form.get("franquia", "").strip(),
+        "VALOR_MENSAL": form.get("valor_mensal", "").strip(),
+    }
 
-def gerar_contrato_pdf(template_docx_path: str, output_pdf_path: str, dados: dict) -> None:
-    tpl = DocxTemplate(template_docx_path)
 
+def contexto_contrato(dados: dict) -> dict:
     # Franquia (número + extenso)
     franquia_int = inteiro_formatado_pt_br(dados["FRANQUIA"])
     franquia_fmt = numero_milhar_pt_br(franquia_int)
@@ -47,7 +39,7 @@ def gerar_contrato_pdf(template_docx_path: str, output_pdf_path: str, dados: dic
     # Valor mensal (formatado + extenso)
     valor_fmt, valor_ext = moeda_formatada_pt_br(dados["VALOR_MENSAL"])
 
-    context = {
+    return {
         "DENOMINACAO": dados["DENOMINACAO"],
         "CPF_CNPJ": dados["CPF_CNPJ"],
         "ENDERECO": dados["ENDERECO"],
@@ -64,14 +56,15 @@ def gerar_contrato_pdf(template_docx_path: str, output_pdf_path: str, dados: dic
         "DATA_ASSINATURA": data_pt_br(datetime.now()),
     }
 
-    tpl.render(context)
 
-    with tempfile.TemporaryDirectory() as tmp:
-        docx_out = str(Path(tmp) / "contrato_preenchido.docx")
-        tpl.save(docx_out)
+def gerar_contrato_pdf(template_docx_path: str, output_pdf_path: str, dados: dict) -> None:
+    engine.gerar("contrato", output_pdf_path, dados, template=template_docx_path)
 
-        pdf_tmp = _convert_docx_to_pdf(docx_out, tmp)
 
-        Path(output_pdf_path).parent.mkdir(parents=True, exist_ok=True)
-        with open(pdf_tmp, "rb") as src, open(output_pdf_path, "wb") as dst:
-            dst.write(src.read())
\ No newline at end of file
+engine.register(
+    "contrato",
+    template="template_contrato.docx",
+    dados=dados_do_formulario,
+    contexto=contexto_contrato,
+    campo_nome="DENOMINACAO",
+)
\ No newline at end of file
@@ -0,0 +1,696 @@
+"""
+Conversão DOCX -> PDF compartilhada por todos os serviços.
+
+Em vez de abrir um soffice novo para cada PDF (vários segundos de CPU e
+centenas de MB por documento), mantemos um LibreOffice "quente" escutando
+num pipe UNO e mandamos os documentos para ele através do uno_client.py.
+
+Se o UNO não estiver disponível (ex.: máquina de desenvolvimento sem o
+python do LibreOffice), cai no modo antigo: um "soffice --convert-to" por
+documento.
+
+Os LibreOffice ficam num pool (converter_pool.py), cada um com seu perfil.
+
+Quem converte de fato é o backend (CONVERTER_BACKEND):
+  - "daemon": o pool acima (padrão);
+  - "subprocess": um soffice novo por chamada, com perfil temporário;
+  - "stub": não chama o LibreOffice, grava um PDF de uma página em branco
+    (testes, benchmarks, máquina sem LibreOffice).
+
+Proteções (valem para qualquer backend, ver GuardedBackend):
+  - no máximo CONVERTER_MAX_CONCURRENT conversões ao mesmo tempo na máquina
+    (semáforo entre processos em arquivo); as demais esperam uma vaga;
+  - prazo por conversão (CONVERTER_TIMEOUT): o soffice roda no próprio grupo
+    de processos e, estourado o prazo, o grupo inteiro é morto (o "soffice"
+    é só um lançador do soffice.bin, matar só ele deixa o filho travado);
+  - novas tentativas com espera crescente (CONVERTER_RETRIES);
+  - disjuntor: depois de CONVERTER_BREAKER_THRESHOLD falhas seguidas as
+    conversões falham na hora por CONVERTER_BREAKER_COOLDOWN segundos, em
+    vez de prender threads esperando um LibreOffice doente.
+"""
+import os
+import random
+import signal
+import subprocess
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import metrics
+from locks import Semaphore
+
+LIBREOFFICE_PATH = os.getenv("LIBREOFFICE_PATH", r"C:\Program Files\LibreOffice\program\soffice.exe")
+
+# "0" desliga o LibreOffice residente (volta a um soffice por PDF)
+LIBREOFFICE_DAEMON = os.getenv("LIBREOFFICE_DAEMON", "1") == "1"
+
+# Python que enxerga o módulo "uno" (Debian: python3-uno -> /usr/bin/python3).
+# Vazio = tenta o python que vem junto do LibreOffice.
+UNO_PYTHON = os.getenv("UNO_PYTHON", "")
+
+# Pasta base dos perfis de cada LibreOffice do pool
+LIBREOFFICE_PROFILE_DIR = os.getenv("LIBREOFFICE_PROFILE_DIR", tempfile.gettempdir())
+
+# Onde fica o .docx que o soffice lê. /dev/shm é tmpfs (memória), sem ir ao disco.
+SCRATCH_DIR = os.getenv("CONVERTER_SCRATCH_DIR") or ("/dev/shm" if os.path.isdir("/dev/shm") else None)
+
+# "daemon", "subprocess" ou "stub" (ver get_backend)
+CONVERTER_BACKEND = os.getenv("CONVERTER_BACKEND", "daemon")
+
+# Tempo máximo (s) de uma conversão. 0 = sem limite.
+CONVERTER_TIMEOUT = int(os.getenv("CONVERTER_TIMEOUT", "60"))
+
+# Tentativas extras depois de uma falha, esperando BACKOFF, 2*BACKOFF... (s)
+CONVERTER_RETRIES = int(os.getenv("CONVERTER_RETRIES", "2"))
+CONVERTER_RETRY_BACKOFF = float(os.getenv("CONVERTER_RETRY_BACKOFF", "0.5"))
+
+# Disjuntor: falhas seguidas até abrir / segundos aberto
+CONVERTER_BREAKER_THRESHOLD = int(os.getenv("CONVERTER_BREAKER_THRESHOLD", "5"))
+CONVERTER_BREAKER_COOLDOWN = int(os.getenv("CONVERTER_BREAKER_COOLDOWN", "30"))
+
+# Conversões ao mesmo tempo na máquina inteira (todos os workers e o CLI do lote).
+# Quem passa do limite espera uma vaga por até CONVERTER_QUEUE_TIMEOUT segundos.
+CONVERTER_MAX_CONCURRENT = int(os.getenv("CONVERTER_MAX_CONCURRENT", "2"))
+CONVERTER_QUEUE_TIMEOUT = int(os.getenv("CONVERTER_QUEUE_TIMEOUT", "120"))
+# Arquivos das vagas: precisa ser local da máquina (a memória que se protege é dela)
+CONVERTER_SLOTS_DIR = os.getenv("CONVERTER_SLOTS_DIR") or os.path.join(tempfile.gettempdir(), "conversor-vagas")
+
+_UNO_CLIENT = str(Path(__file__).with_name("uno_client.py"))
+
+
+def _uno_python() -> str:
+    if UNO_PYTHON:
+        return UNO_PYTHON
+    exe = "python.exe" if os.name == "nt" else "python"
+    candidate = Path(LIBREOFFICE_PATH).parent / exe
+    return str(candidate) if candidate.exists() else ""
+
+
+def _uno_in_process() -> bool:
+    try:
+        import uno  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class ConversionTimeout(RuntimeError):
+    """A conversão passou do prazo e o LibreOffice foi encerrado."""
+
+
+class ConverterBusy(RuntimeError):
+    """Nenhum conversor livre (sobrecarga, não defeito: não conta no disjuntor)."""
+
+
+class ConverterUnavailable(RuntimeError):
+    """Disjuntor aberto: o conversor vem falhando e está descansando."""
+
+
+def _new_group() -> dict:
+    # grupo de processos próprio: dá para matar o soffice e os filhos juntos
+    if os.name == "nt":
+        return {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {"start_new_session": True}
+
+
+def _kill_tree(proc: subprocess.Popen) -> None:
+    """Mata o processo e tudo o que ele abriu (soffice -> soffice.bin)."""
+    try:
+        if os.name == "nt":
+            subprocess.run(["taskkill", "/F", "/T", "/PID", str(proc.pid)], capture_output=True)
+        else:
+            os.killpg(proc.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError, OSError):
+        pass
+    try:
+        proc.kill()
+        proc.wait(timeout=5)
+    except (OSError, subprocess.TimeoutExpired):
+        pass
+
+
+def _run(cmd: list, timeout: float = None) -> subprocess.CompletedProcess:
+    """subprocess.run com prazo; estourou, o grupo de processos inteiro morre."""
+    timeout = CONVERTER_TIMEOUT if timeout is None else timeout
+    proc = subprocess.Popen(
+        cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        text=True, **_new_group()
+    )
+    try:
+        stdout, stderr = proc.communicate(timeout=timeout or None)
+    except subprocess.TimeoutExpired:
+        _kill_tree(proc)
+        proc.communicate()
+        raise ConversionTimeout(f"LibreOffice não respondeu em {timeout:g}s (processo encerrado).")
+    return subprocess.CompletedProcess(cmd, proc.returncode, stdout, stderr)
+
+
+class OfficeDaemon:
+    """
+    Um LibreOffice com perfil próprio (-env:UserInstallation).
+
+    Com UNO disponível fica residente, escutando num pipe; sem UNO roda um
+    "soffice --convert-to" por documento, mas ainda com o perfil dele (dois
+    soffice no mesmo perfil se atrapalham ou falham).
+    As conversões de um mesmo LibreOffice são serializadas.
+    """
+
+    def __init__(self, soffice_path: str, profile_dir: str, pipe_name: str):
+        self.soffice_path = soffice_path
+        self.profile_dir = profile_dir
+        self.pipe_name = pipe_name
+
+        self.conversions = 0
+        self.failed = False
+
+        self._proc = None
+        self._desktop = None
+        self._lock = threading.Lock()
+        self._in_process = _uno_in_process()
+        self._client_python = _uno_python()
+        self.resident = LIBREOFFICE_DAEMON and self.available()
+
+    @staticmethod
+    def available() -> bool:
+        return _uno_in_process() or bool(_uno_python())
+
+    @property
+    def profile_url(self) -> str:
+        return Path(self.profile_dir).resolve().as_uri()
+
+    def alive(self) -> bool:
+        return self._proc is not None and self._proc.poll() is None
+
+    def start(self) -> None:
+        Path(self.profile_dir).mkdir(parents=True, exist_ok=True)
+
+        cmd = [
+            self.soffice_path,
+            "--headless",
+            "--invisible",
+            "--nologo",
+            "--nodefault",
+            "--norestore",
+            "--nolockcheck",
+            f"-env:UserInstallation={self.profile_url}",
+            f"--accept=pipe,name={self.pipe_name};urp;StarOffice.ComponentContext",
+        ]
+        self._proc = subprocess.Popen(
+            cmd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            **_new_group()
+        )
+        self._desktop = None
+
+        if self._in_process:
+            import uno_client
+            self._desktop = uno_client.connect(self.pipe_name, timeout=30)
+
+    def stop(self, force: bool = False) -> None:
+        """force: mata o grupo de processos direto (soffice travado não atende terminate)."""
+        self._desktop = None
+        if self._proc is None:
+            return
+        if force:
+            _kill_tree(self._proc)
+        elif self._proc.poll() is None:
+            self._proc.terminate()
+            try:
+                self._proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                _kill_tree(self._proc)
+        self._proc = None
+
+    def recycle(self) -> None:
+        """Derruba o soffice; o próximo uso sobe um novo (mesmo perfil)."""
+        with self._lock:
+            self.stop()
+            self.conversions = 0
+            self.failed = False
+
+    def _convert_cold(self, docx_paths, out_dir: str) -> None:
+        """docx_paths: um caminho ou uma lista (um soffice converte todos)."""
+        if isinstance(docx_paths, str):
+            docx_paths = [docx_paths]
+
+        cmd = [
+            self.soffice_path,
+            "--headless",
+            "--norestore",
+            "--invisible",
+            f"-env:UserInstallation={self.profile_url}",
+            "--convert-to", "pdf",
+            "--outdir", out_dir,
+            *docx_paths,
+        ]
+
+        # prazo proporcional: um grupo de N documentos tem N prazos
+        result = _run(cmd, timeout=CONVERTER_TIMEOUT * len(docx_paths))
+        if result.returncode != 0:
+            raise RuntimeError(
+                "Falha ao converter para PDF.\n"
+                f"stdout: {result.stdout}\n"
+                f"stderr: {result.stderr}\n"
+            )
+
+    def _convert_resident(self, docx_path: str, pdf_path: str) -> None:
+        if not self.alive():
+            self.stop()
+            self.start()
+
+        if self._in_process:
+            import uno_client
+
+            # cão de guarda: a chamada UNO não tem prazo; se passar, mata o
+            # soffice e a chamada volta com erro de conexão
+            expired = threading.Event()
+
+            def _watchdog():
+                expired.set()
+                if self._proc is not None:
+                    _kill_tree(self._proc)
+
+            timer = threading.Timer(CONVERTER_TIMEOUT, _watchdog) if CONVERTER_TIMEOUT else None
+            if timer:
+                timer.daemon = True
+                timer.start()
+            try:
+                uno_client.convert(
+                    self._desktop,
+                    Path(docx_path).resolve().as_uri(),
+                    Path(pdf_path).resolve().as_uri(),
+                )
+            except Exception:
+                if expired.is_set():
+                    raise ConversionTimeout(f"LibreOffice não respondeu em {CONVERTER_TIMEOUT}s (processo encerrado).")
+                raise
+            finally:
+                if timer:
+                    timer.cancel()
+            return
+
+        cmd = [self._client_python, _UNO_CLIENT, self.pipe_name, docx_path, pdf_path]
+        result = _run(cmd)
+        if result.returncode != 0:
+            raise RuntimeError(
+                "Falha ao converter para PDF.\n"
+                f"stdout: {result.stdout}\n"
+                f"stderr: {result.stderr}\n"
+            )
+
+    def convert(self, docx_path: str, pdf_path: str) -> None:
+        """pdf_path precisa ter o mesmo nome do docx (modo sem UNO usa --outdir)."""
+        with self._lock:
+            try:
+                if self.resident:
+                    self._convert_resident(docx_path, pdf_path)
+                else:
+                    self._convert_cold(docx_path, str(Path(pdf_path).parent))
+            except Exception:
+                # soffice travado/morto: derruba já (a nova tentativa fica com o GuardedBackend)
+                self.failed = True
+                self.stop(force=True)
+                raise
+            finally:
+                self.conversions += 1
+
+    def convert_group(self, docx_paths: list, out_dir: str) -> None:
+        """
+        Converte vários .docx para out_dir (mesmos nomes, extensão .pdf).
+
+        Sem UNO é uma única chamada "soffice --convert-to" com todos os
+        arquivos: o custo de subir o LibreOffice é pago uma vez por grupo.
+        Residente, os documentos vão um a um para o soffice que já está de pé.
+        """
+        if not self.resident:
+            with self._lock:
+                try:
+                    self._convert_cold(docx_paths, out_dir)
+                except Exception:
+                    self.failed = True
+                    self.stop(force=True)
+                    raise
+                finally:
+                    self.conversions += len(docx_paths)
+            return
+
+        for docx_path in docx_paths:
+            pdf_path = str(Path(out_dir) / Path(docx_path).with_suffix(".pdf").name)
+            self.convert(docx_path, pdf_path)
+
+
+# ---------------- Backends ----------------
+
+class ConversionBackend:
+    """
+    Interface dos backends: convert_group() converte vários .docx para
+    out_dir com o mesmo nome e extensão .pdf.
+    """
+    name = ""
+
+    def convert_group(self, docx_paths: list, out_dir: str) -> None:
+        raise NotImplementedError
+
+    def convert(self, docx_path: str, pdf_path: str) -> None:
+        """pdf_path precisa ter o mesmo nome do docx (ver convert_docx_to_pdf)."""
+        self.convert_group([docx_path], str(Path(pdf_path).parent))
+
+    def warm(self, docx_path: str, out_dir: str) -> None:
+        """Conversão de aquecimento (warmup.py): sobe o que for preciso."""
+        self.convert_group([docx_path], out_dir)
+
+    @property
+    def parallelism(self) -> int:
+        """Quantos convert_group podem rodar ao mesmo tempo com proveito."""
+        return 1
+
+
+class DaemonBackend(ConversionBackend):
+    """LibreOffice residentes do converter_pool (um perfil por worker)."""
+    name = "daemon"
+
+    def _pool(self):
+        # import aqui: converter_pool importa este módulo
+        from converter_pool import get_pool
+        return get_pool()
+
+    def convert_group(self, docx_paths: list, out_dir: str) -> None:
+        self._pool().convert_group(docx_paths, out_dir)
+
+    def convert(self, docx_path: str, pdf_path: str) -> None:
+        self._pool().convert(docx_path, pdf_path)
+
+    def warm(self, docx_path: str, out_dir: str) -> None:
+        # todos os LibreOffice do pool, não só o primeiro livre
+        self._pool().warm(docx_path, out_dir)
+
+    @property
+    def parallelism(self) -> int:
+        return self._pool().size
+
+
+class SubprocessBackend(ConversionBackend):
+    """Um "soffice --convert-to" por chamada, com perfil temporário próprio."""
+    name = "subprocess"
+
+    def convert_group(self, docx_paths: list, out_dir: str) -> None:
+        with tempfile.TemporaryDirectory(dir=LIBREOFFICE_PROFILE_DIR, prefix="senasoft-lo-") as profile:
+            office = OfficeDaemon(LIBREOFFICE_PATH, profile_dir=profile, pipe_name="")
+            office._convert_cold(docx_paths, out_dir)
+
+    @property
+    def parallelism(self) -> int:
+        return os.cpu_count() or 1
+
+
+class StubBackend(ConversionBackend):
+    """Não chama o LibreOffice: cada .docx vira um PDF de uma página em branco."""
+    name = "stub"
+
+    def convert_group(self, docx_paths: list, out_dir: str) -> None:
+        for docx_path in docx_paths:
+            Path(out_dir, Path(docx_path).with_suffix(".pdf").name).write_bytes(_BLANK_PDF)
+
+    @property
+    def parallelism(self) -> int:
+        return os.cpu_count() or 1
+
+
+class CircuitBreaker:
+    """
+    fechado -> (threshold falhas seguidas) -> aberto -> (cooldown) -> meio_aberto
+    Meio aberto deixa passar uma conversão de teste: deu certo fecha, falhou
+    abre de novo.
+    """
+
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = "fechado"
+        self.consecutive = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def before(self) -> None:
+        if self.threshold <= 0:
+            return
+        with self._lock:
+            if self.state == "fechado":
+                return
+            if self.state == "aberto" and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = "meio_aberto"
+                self._probing = False
+            if self.state == "meio_aberto" and not self._probing:
+                self._probing = True
+                return
+            wait = max(0, round(self.cooldown - (time.monotonic() - self.opened_at)))
+            raise ConverterUnavailable(
+                f"Conversor de PDF indisponível (falhas seguidas). Tente novamente em {wait or 1}s."
+            )
+
+    def release(self) -> None:
+        """A conversão de teste nem chegou a rodar: libera a vaga para outra."""
+        with self._lock:
+            self._probing = False
+
+    def success(self) -> None:
+        with self._lock:
+            self.state = "fechado"
+            self.consecutive = 0
+            self._probing = False
+
+    def failure(self) -> None:
+        with self._lock:
+            self.consecutive += 1
+            if self.threshold > 0 and (self.state == "meio_aberto" or self.consecutive >= self.threshold):
+                self.state = "aberto"
+                self.opened_at = time.monotonic()
+            self._probing = False
+
+    def retry_after(self) -> int:
+        with self._lock:
+            if self.state != "aberto":
+                return 0
+            return max(1, round(self.cooldown - (time.monotonic() - self.opened_at)))
+
+
+class GuardedBackend(ConversionBackend):
+    """Envolve um backend com limite de conversões simultâneas, novas tentativas e disjuntor."""
+
+    def __init__(self, inner: ConversionBackend):
+        self.inner = inner
+        self.name = inner.name
+        self.vagas = Semaphore(CONVERTER_SLOTS_DIR, CONVERTER_MAX_CONCURRENT)
+        self.esperando = 0
+        self.breaker = CircuitBreaker(CONVERTER_BREAKER_THRESHOLD, CONVERTER_BREAKER_COOLDOWN)
+        self.counters = {"conversoes": 0, "falhas": 0, "timeouts": 0, "retentativas": 0, "recusadas": 0}
+        self.last_error = None
+        self._lock = threading.Lock()
+
+    def _inc(self, key: str) -> None:
+        with self._lock:
+            self.counters[key] += 1
+
+    @contextmanager
+    def _vaga(self):
+        """Segura uma das vagas da máquina enquanto converte."""
+        with self._lock:
+            self.esperando += 1
+        try:
+            with metrics.CONVERSIONS_WAITING.track():
+                vaga = self.vagas.acquire(timeout=CONVERTER_QUEUE_TIMEOUT or None)
+        finally:
+            with self._lock:
+                self.esperando -= 1
+        if vaga is None:
+            raise ConverterBusy(
+                f"Conversor ocupado: nenhuma vaga em {CONVERTER_QUEUE_TIMEOUT}s. Tente novamente."
+            )
+        try:
+            yield
+        finally:
+            vaga.release()
+
+    def _call(self, fn, *args) -> None:
+        attempts = 1 + max(0, CONVERTER_RETRIES)
+        for attempt in range(attempts):
+            try:
+                self.breaker.before()
+            except ConverterUnavailable:
+                self._inc("recusadas")
+                metrics.CONVERSION_FAILURES.inc(motivo="disjuntor")
+                raise
+
+            try:
+                # a vaga é solta durante a espera entre tentativas
+                with self._vaga(), metrics.CONVERSIONS_IN_FLIGHT.track():
+                    fn(*args)
+            except ConverterBusy:
+                # fila cheia não é defeito do LibreOffice
+                self.breaker.release()
+                metrics.CONVERSION_FAILURES.inc(motivo="ocupado")
+                raise
+            except Exception as e:
+                self.breaker.failure()
+                self._inc("falhas")
+                if isinstance(e, ConversionTimeout):
+                    self._inc("timeouts")
+                metrics.CONVERSION_FAILURES.inc(motivo="timeout" if isinstance(e, ConversionTimeout) else "erro")
+                self.last_error = f"{type(e).__name__}: {str(e).splitlines()[0] if str(e) else ''}"
+                if attempt + 1 >= attempts:
+                    raise
+                self._inc("retentativas")
+                # espera crescente com um pouco de acaso (workers não tentam juntos)
+                time.sleep(CONVERTER_RETRY_BACKOFF * (2 ** attempt) * (0.5 + random.random()))
+            else:
+                self.breaker.success()
+                self._inc("conversoes")
+                return
+
+    def convert_group(self, docx_paths: list, out_dir: str) -> None:
+        self._call(self.inner.convert_group, docx_paths, out_dir)
+
+    def convert(self, docx_path: str, pdf_path: str) -> None:
+        self._call(self.inner.convert, docx_path, pdf_path)
+
+    def warm(self, docx_path: str, out_dir: str) -> None:
+        self._call(self.inner.warm, docx_path, out_dir)
+
+    @property
+    def parallelism(self) -> int:
+        return self.inner.parallelism
+
+    def health(self) -> dict:
+        with self._lock:
+            out = dict(self.counters)
+        out.update(
+            backend=self.name,
+            estado=self.breaker.state,
+            falhas_seguidas=self.breaker.consecutive,
+            retry_after=self.breaker.retry_after(),
+            ultimo_erro=self.last_error,
+            timeout_s=CONVERTER_TIMEOUT,
+            vagas={
+                "limite": self.vagas.limit,
+                "em_uso": self.vagas.in_use(),
+                "esperando": self.esperando,
+            },
+        )
+        return out
+
+
+def _blank_pdf() -> bytes:
+    objs = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] >>",
+    ]
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for n, obj in enumerate(objs, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (n, obj)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objs) + 1)
+    out += b"".join(b"%010d 00000 n \n" % o for o in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objs) + 1, xref)
+    return out
+
+
+_BLANK_PDF = _blank_pdf()
+
+BACKENDS = {
+    "daemon": DaemonBackend,
+    "subprocess": SubprocessBackend,
+    "stub": StubBackend,
+}
+
+_backend = None
+
+
+def configure(backend: str = None, timeout: int = None, retries: int = None,
+              breaker_threshold: int = None, breaker_cooldown: int = None,
+              max_concurrent: int = None, queue_timeout: int = None) -> None:
+    """Chamado pelo create_app com os valores do Config."""
+    global CONVERTER_BACKEND, CONVERTER_TIMEOUT, CONVERTER_RETRIES, _backend
+    global CONVERTER_BREAKER_THRESHOLD, CONVERTER_BREAKER_COOLDOWN
+    global CONVERTER_MAX_CONCURRENT, CONVERTER_QUEUE_TIMEOUT
+    if backend is not None:
+        if backend not in BACKENDS:
+            raise RuntimeError(f"CONVERTER_BACKEND inválido: {backend} (use {', '.join(BACKENDS)})")
+        CONVERTER_BACKEND = backend
+    if timeout is not None:
+        CONVERTER_TIMEOUT = timeout
+    if retries is not None:
+        CONVERTER_RETRIES = retries
+    if breaker_threshold is not None:
+        CONVERTER_BREAKER_THRESHOLD = breaker_threshold
+    if breaker_cooldown is not None:
+        CONVERTER_BREAKER_COOLDOWN = breaker_cooldown
+    if max_concurrent is not None:
+        CONVERTER_MAX_CONCURRENT = max_concurrent
+    if queue_timeout is not None:
+        CONVERTER_QUEUE_TIMEOUT = queue_timeout
+    _backend = None
+
+
+def get_backend() -> GuardedBackend:
+    global _backend
+    if _backend is None or _backend.name != CONVERTER_BACKEND:
+        cls = BACKENDS.get(CONVERTER_BACKEND)
+        if cls is None:
+            raise RuntimeError(f"CONVERTER_BACKEND inválido: {CONVERTER_BACKEND}")
+        _backend = GuardedBackend(cls())
+    return _backend
+
+
+def health() -> dict:
+    """Estado do conversor deste processo (para o /health)."""
+    info = get_backend().health()
+    if CONVERTER_BACKEND == "daemon":
+        from converter_pool import current_stats
+        info["pool"] = current_stats()
+    return info
+
+
+def convert_docx_to_pdf(docx_path: str, out_dir: str) -> str:
+    """
+    Converte DOCX -> PDF (mesmo nome, extensão .pdf) dentro de out_dir.
+    Retorna o caminho do PDF gerado.
+    """
+    Path(out_dir).mkdir(parents=True, exist_ok=True)
+
+    pdf_name = Path(docx_path).with_suffix(".pdf").name
+    pdf_path = str(Path(out_dir) / pdf_name)
+
+    get_backend().convert(docx_path, pdf_path)
+
+    if not os.path.exists(pdf_path):
+        raise RuntimeError("PDF não foi encontrado após conversão.")
+
+    return pdf_path
+
+
+def convert_docx_bytes(docx, output_pdf_path: str) -> None:
+    """
+    Converte um DOCX em memória (bytes ou BytesIO) direto para output_pdf_path.
+
+    O .docx vai para SCRATCH_DIR (tmpfs quando existe). O PDF é gerado numa
+    pasta temporária ao lado do destino e entra no lugar com os.replace:
+    atômico e sem ler/regravar o arquivo.
+    """
+    data = docx.getbuffer() if hasattr(docx, "getbuffer") else docx
+
+    out_dir = Path(output_pdf_path).parent
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    with tempfile.TemporaryDirectory(dir=SCRATCH_DIR) as scratch, \
+            tempfile.TemporaryDirectory(dir=out_dir, prefix=".conv-") as staging:
+        docx_path = os.path.join(scratch, "documento.docx")
+        with open(docx_path, "wb") as f:
+            f.write(data)
+
+        pdf_tmp = convert_docx_to_pdf(docx_path, staging)
+        os.replace(pdf_tmp, output_pdf_path)
@@ -0,0 +1,135 @@
+"""
+Pool de LibreOffice "quentes" por processo.
+
+Cada worker do pool tem seu próprio perfil (-env:UserInstallation) e seu
+próprio pipe UNO, então conversões simultâneas (threads do gunicorn) rodam
+em paralelo em vez de brigarem pelo perfil padrão.
+
+O worker volta para a fila depois de cada conversão; se falhou ou já fez
+max_conversions conversões, o soffice dele é reciclado antes.
+"""
+import atexit
+import os
+import queue
+import shutil
+import threading
+from contextlib import contextmanager
+
+from converter import LIBREOFFICE_PATH, LIBREOFFICE_PROFILE_DIR, ConverterBusy, OfficeDaemon
+
+POOL_SIZE = int(os.getenv("CONVERTER_POOL_SIZE", "2"))
+MAX_CONVERSIONS = int(os.getenv("CONVERTER_MAX_CONVERSIONS", "100"))
+CHECKOUT_TIMEOUT = int(os.getenv("CONVERTER_CHECKOUT_TIMEOUT", "120"))
+
+
+class ConverterPool:
+    def __init__(self, size: int, max_conversions: int, checkout_timeout: int = CHECKOUT_TIMEOUT):
+        self.size = max(1, size)
+        self.max_conversions = max_conversions
+        self.checkout_timeout = checkout_timeout
+
+        pid = os.getpid()
+        self.workers = [
+            OfficeDaemon(
+                LIBREOFFICE_PATH,
+                profile_dir=os.path.join(LIBREOFFICE_PROFILE_DIR, f"senasoft-lo-{pid}-{i}"),
+                pipe_name=f"senasoft_lo_{pid}_{i}",
+            )
+            for i in range(self.size)
+        ]
+
+        self._idle = queue.Queue()
+        for w in self.workers:
+            self._idle.put(w)
+
+    def checkout(self) -> OfficeDaemon:
+        try:
+            return self._idle.get(timeout=self.checkout_timeout)
+        except queue.Empty:
+            raise ConverterBusy("Nenhum conversor livre. Tente novamente em instantes.")
+
+    def checkin(self, worker: OfficeDaemon) -> None:
+        if worker.failed or (self.max_conversions and worker.conversions >= self.max_conversions):
+            worker.recycle()
+        self._idle.put(worker)
+
+    @contextmanager
+    def worker(self):
+        w = self.checkout()
+        try:
+            yield w
+        finally:
+            self.checkin(w)
+
+    def convert(self, docx_path: str, pdf_path: str) -> None:
+        with self.worker() as w:
+            w.convert(docx_path, pdf_path)
+
+    def convert_group(self, docx_paths: list, out_dir: str) -> None:
+        with self.worker() as w:
+            w.convert_group(docx_paths, out_dir)
+
+    def warm(self, docx_path: str, out_dir: str) -> None:
+        """Uma conversão em cada LibreOffice: cria os perfis e deixa todos de pé."""
+        for w in self.workers:
+            w.convert_group([docx_path], out_dir)
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size,
+            "idle": self._idle.qsize(),
+            "alive": sum(1 for w in self.workers if w.alive()),
+        }
+
+    def shutdown(self) -> None:
+        for w in self.workers:
+            w.stop()
+            shutil.rmtree(w.profile_dir, ignore_errors=True)
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def configure(size: int, max_conversions: int) -> None:
+    """Chamado pelo create_app com os valores do Config (antes da 1ª conversão)."""
+    global POOL_SIZE, MAX_CONVERSIONS, _pool
+    with _pool_lock:
+        POOL_SIZE = size
+        MAX_CONVERSIONS = max_conversions
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.shutdown()
+        _pool = None
+
+
+def get_pool() -> ConverterPool:
+    """
+    Pool deste processo. Cada worker do gunicorn tem o seu (perfis e pipes
+    levam o pid), criado na primeira conversão.
+    """
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ConverterPool(POOL_SIZE, MAX_CONVERSIONS)
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def current_stats():
+    """stats() do pool deste processo, sem criar um se ainda não existe."""
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            return None
+        return _pool.stats()
+
+
+def shutdown() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.shutdown()
+        _pool = None
+
+
+atexit.register(shutdown)
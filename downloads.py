@@ -0,0 +1,97 @@
+"""
+Entrega dos PDFs guardados (/proposta/<id>/baixar).
+
+- ETag forte: o sha256 do blob (storage.py), ou "<id>-<mtime_ns>-<tamanho>"
+  (hex) para os PDFs de antes dos blobs; muda quando o PDF muda;
+- Last-Modified do arquivo e Cache-Control "private, no-cache": o navegador
+  (PWA) guarda o PDF e revalida a cada download, recebendo 304 sem corpo
+  se não mudou;
+- Range/If-Range (206, 416) pelo make_conditional do werkzeug.
+
+DOWNLOAD_OFFLOAD passa o envio dos bytes para o proxy na frente do
+gunicorn (sendfile sem ocupar uma thread do Python):
+  - "x-accel" (nginx): X-Accel-Redirect: DOWNLOAD_ACCEL_PREFIX + caminho
+    relativo ao STORAGE_DIR. No nginx:
+        location /_protegido/ { internal; alias /caminho/do/STORAGE_DIR/; }
+  - "x-sendfile" (Apache mod_xsendfile, lighttpd): X-Sendfile: caminho
+    absoluto.
+O 304 continua respondido aqui (sem abrir o arquivo); o Range fica com o
+proxy, que vê o cabeçalho original da requisição.
+"""
+import os
+from urllib.parse import quote
+
+from flask import current_app, request
+from werkzeug.utils import send_file
+
+OFFLOAD_MODES = ("", "x-accel", "x-sendfile")
+
+STORAGE_DIR = None
+OFFLOAD = ""
+ACCEL_PREFIX = "/_protegido/"
+
+# Cabeçalhos de Range que ficam com o proxy no modo offload
+_RANGE_HEADERS = ("HTTP_RANGE", "HTTP_IF_RANGE")
+
+
+def configure(storage_dir: str, offload: str = "", accel_prefix: str = "/_protegido/") -> None:
+    global STORAGE_DIR, OFFLOAD, ACCEL_PREFIX
+    offload = (offload or "").strip().lower()
+    if offload not in OFFLOAD_MODES:
+        raise RuntimeError(f"DOWNLOAD_OFFLOAD inválido: {offload} (use x-accel, x-sendfile ou vazio)")
+    STORAGE_DIR = os.path.realpath(storage_dir)
+    OFFLOAD = offload
+    ACCEL_PREFIX = "/" + accel_prefix.strip("/") + "/"
+
+
+def etag(chave, st: os.stat_result, sha256: str = None) -> str:
+    return sha256 or f"{chave}-{st.st_mtime_ns:x}-{st.st_size:x}"
+
+
+def _accel_uri(path: str):
+    """URI interna do nginx para o arquivo, ou None se ele não está no STORAGE_DIR."""
+    rel = os.path.relpath(os.path.realpath(path), STORAGE_DIR)
+    if rel.startswith(os.pardir):
+        return None
+    return ACCEL_PREFIX + quote(rel.replace(os.sep, "/"))
+
+
+def enviar_pdf(path: str, download_name: str, chave, sha256: str = None):
+    """
+    Resposta para baixar o PDF em path (200, 206, 304 ou 416).
+    chave: identifica o registro no ETag (id da proposta); sha256: o
+    conteúdo já tem hash (blob), ele é o ETag.
+    """
+    path = os.path.abspath(path)
+    st = os.stat(path)
+
+    offload = OFFLOAD
+    accel_uri = _accel_uri(path) if offload == "x-accel" else None
+    if offload == "x-accel" and accel_uri is None:
+        offload = ""
+    elif offload == "x-sendfile" and not path.isascii():
+        # cabeçalho WSGI vai em latin-1 e o nome no disco é UTF-8: com acento, envia aqui
+        offload = ""
+
+    environ = request.environ
+    if offload:
+        environ = {k: v for k, v in environ.items() if k not in _RANGE_HEADERS}
+
+    rv = send_file(
+        path,
+        environ,
+        mimetype="application/pdf",
+        as_attachment=True,
+        download_name=download_name,
+        etag=etag(chave, st, sha256),
+        last_modified=st.st_mtime,
+        use_x_sendfile=bool(offload),
+        response_class=current_app.response_class,
+    )
+    rv.cache_control.private = True
+
+    # send_file já tira o X-Sendfile do 304
+    if offload == "x-accel" and "X-Sendfile" in rv.headers:
+        del rv.headers["X-Sendfile"]
+        rv.headers["X-Accel-Redirect"] = accel_uri
+    return rv
@@ -0,0 +1,189 @@
+"""
+Motor único de geração de documentos.
+
+Cada tipo de documento (proposta, contrato, promissória, termo) só se
+registra aqui com seu template, o parser do formulário e o montador de
+contexto. O caminho contexto -> cache -> render -> conversão -> cache é um
+só para todos (formulário avulso, lote e pacote), e é aqui que são medidos
+os tempos de cada etapa por tipo (metrics.py) e por requisição/job
+(profiling.py, Server-Timing).
+
+A conversão vai para o backend do converter.py (daemon, subprocess ou
+stub); o tempo limite de cada chamada é o CONVERTER_TIMEOUT de lá.
+"""
+import io
+import os
+import time
+
+import metrics
+import pdf_cache
+import profiling
+from converter import convert_docx_bytes, get_backend
+from template_registry import render_to_bytes
+
+ASSETS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "assets"))
+
+
+class Documento:
+    """
+    Um tipo de documento registrado.
+
+    - dados(form) -> dict: lê o formulário (request.form, registro de lote...)
+    - contexto(dados) -> dict: variáveis do template, sem a imagem
+    - imagem: ("VARIAVEL", largura_mm) quando o template tem foto
+    - titulo / campo_nome: nome do arquivo, "<titulo> - <dados[campo_nome]>.pdf"
+    """
+
+    def __init__(self, nome: str, template: str, dados, contexto, imagem: tuple = None,
+                 titulo: str = None, campo_nome: str = None):
+        self.nome = nome
+        self.template = template
+        self.dados = dados
+        self.contexto = contexto
+        self.imagem = imagem
+        self.titulo = titulo or nome.upper()
+        self.campo_nome = campo_nome
+
+    @property
+    def template_path(self) -> str:
+        return os.path.join(ASSETS_DIR, self.template)
+
+    def nome_arquivo(self, dados: dict) -> str:
+        cliente = (dados.get(self.campo_nome) if self.campo_nome else "") or "Cliente"
+        return f"{self.titulo} - {cliente}"
+
+
+class Trabalho:
+    """Um documento a gerar: contexto pronto e chave do cache já calculada."""
+
+    def __init__(self, documento: Documento, template_path: str, dados: dict, context: dict, imagem, key: str):
+        self.documento = documento
+        self.template_path = template_path
+        self.dados = dados
+        self.context = context
+        self.imagem = imagem
+        self.key = key
+
+
+class DocumentEngine:
+    def __init__(self):
+        self.documentos = {}
+
+    # ---------- registro ----------
+    def register(self, nome: str, **kwargs) -> Documento:
+        doc = Documento(nome, **kwargs)
+        self.documentos[nome] = doc
+        return doc
+
+    def documento(self, nome: str) -> Documento:
+        doc = self.documentos.get(nome)
+        if doc is None:
+            raise RuntimeError(f"Documento desconhecido: {nome}")
+        return doc
+
+    # ---------- métricas ----------
+    def erro(self, nome: str) -> None:
+        metrics.DOCUMENTS.inc(documento=nome, resultado="erro")
+
+    def stats(self) -> dict:
+        """Resumo deste processo (o /metrics tem os histogramas de todos)."""
+        out = {"backend": get_backend().name}
+        for nome in self.documentos:
+            render_s, n_render = metrics.RENDER_SECONDS.totals(documento=nome)
+            conv_s, n_conv = metrics.CONVERSION_SECONDS.totals(documento=nome)
+            out[nome] = {
+                "gerados": metrics.DOCUMENTS.value(documento=nome, resultado="gerado"),
+                "cache": metrics.DOCUMENTS.value(documento=nome, resultado="cache"),
+                "erros": metrics.DOCUMENTS.value(documento=nome, resultado="erro"),
+                "render_medio_ms": round(render_s * 1000 / max(1, n_render), 1),
+                "conversao_media_ms": round(conv_s * 1000 / max(1, n_conv), 1),
+            }
+        return out
+
+    # ---------- etapas ----------
+    def preparar(self, nome: str, dados: dict, imagem=None, template: str = None) -> Trabalho:
+        """Monta o contexto e a chave do cache (não gera nada)."""
+        doc = self.documento(nome)
+        if doc.imagem and imagem is None:
+            raise RuntimeError(f"Envie a imagem para o documento {nome}.")
+        if not doc.imagem:
+            imagem = None
+
+        template_path = template or doc.template_path
+        with profiling.medir("contexto"):
+            context = doc.contexto(dados)
+            key = pdf_cache.make_key(template_path, context, imagem)
+        return Trabalho(doc, template_path, dados, context, imagem, key)
+
+    def do_cache(self, trabalho: Trabalho, pdf_path: str) -> bool:
+        """Copia o PDF do cache para pdf_path, se existir."""
+        with profiling.medir("cache"):
+            achou = pdf_cache.fetch(trabalho.key, pdf_path)
+        if achou:
+            metrics.DOCUMENTS.inc(documento=trabalho.documento.nome, resultado="cache")
+            return True
+        return False
+
+    def render(self, trabalho: Trabalho) -> io.BytesIO:
+        """DOCX preenchido, em memória."""
+        doc = trabalho.documento
+        images = None
+        if doc.imagem:
+            var, largura_mm = doc.imagem
+            imagem = trabalho.imagem
+            # bytes: cada render abre o seu BytesIO (várias threads usam a mesma foto)
+            if isinstance(imagem, (bytes, bytearray)):
+                imagem = io.BytesIO(imagem)
+            elif hasattr(imagem, "seek"):
+                imagem.seek(0)
+            images = {var: (imagem, largura_mm)}
+
+        timings = {}
+        buf = render_to_bytes(trabalho.template_path, trabalho.context, images=images, timings=timings)
+        metrics.RENDER_SECONDS.observe(timings["render"], documento=doc.nome)
+        metrics.DOCX_SAVE_SECONDS.observe(timings["save"], documento=doc.nome)
+        profiling.etapa("render", timings["render"])
+        profiling.etapa("docx", timings["save"])
+        return buf
+
+    def converter_grupo(self, trabalhos: list, docx_paths: list, out_dir: str) -> None:
+        """Converte vários .docx numa chamada do backend (tempo dividido entre os documentos)."""
+        t0 = time.perf_counter()
+        get_backend().convert_group(docx_paths, out_dir)
+        total = time.perf_counter() - t0
+        profiling.etapa("conversao", total)
+        dt = total / max(1, len(trabalhos))
+        for t in trabalhos:
+            metrics.CONVERSION_SECONDS.observe(dt, documento=t.documento.nome)
+
+    def guardar(self, trabalho: Trabalho, pdf_path: str) -> None:
+        """PDF gerado: entra no cache e conta como gerado."""
+        pdf_cache.store(trabalho.key, pdf_path)
+        metrics.DOCUMENTS.inc(documento=trabalho.documento.nome, resultado="gerado")
+
+    # ---------- caminho completo (um documento) ----------
+    def gerar(self, nome: str, output_pdf_path: str, dados: dict, imagem=None, template: str = None) -> None:
+        """
+        Gera um documento em output_pdf_path.
+        imagem: caminho, bytes ou BytesIO (só para documentos com foto).
+        """
+        try:
+            trabalho = self.preparar(nome, dados, imagem=imagem, template=template)
+            if self.do_cache(trabalho, output_pdf_path):
+                return
+
+            docx_buf = self.render(trabalho)
+
+            t0 = time.perf_counter()
+            convert_docx_bytes(docx_buf, output_pdf_path)
+            dt = time.perf_counter() - t0
+            metrics.CONVERSION_SECONDS.observe(dt, documento=nome)
+            profiling.etapa("conversao", dt)
+
+            self.guardar(trabalho, output_pdf_path)
+        except Exception:
+            self.erro(nome)
+            raise
+
+
+engine = DocumentEngine()
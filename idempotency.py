@@ -0,0 +1,141 @@
+"""
+Envio idempotente dos formulários de geração.
+
+Cada formulário leva um token aleatório (campo oculto "idem", gerado a cada
+vez que a página é montada). O primeiro POST com o token cria
+STORAGE_DIR/_idem/<token>.json com O_EXCL (vale entre workers do gunicorn)
+e, quando o job nasce, grava o id dele ali. Um POST repetido com o mesmo
+token (toque duplo no celular, reenvio do navegador) não gera de novo: cai
+na tela do job do primeiro.
+
+O arquivo guarda também uma impressão digital do envio (campos + arquivos).
+Mesmo token com conteúdo diferente (voltou na página, mudou o cliente e
+enviou) é um envio novo, não o mesmo.
+
+Tokens valem IDEMPOTENCY_TTL segundos; o sweeper apaga os vencidos.
+"""
+import hashlib
+import json
+import os
+import time
+
+IDEM_DIR = None
+IDEMPOTENCY_TTL = 600
+
+# Quanto o POST repetido espera o primeiro criar o job (s)
+WAIT_FOR_FIRST = 10
+
+FIELD = "idem"
+
+# resultados de reserve()
+DONO = "dono"              # primeiro envio: segue e chama attach()/release()
+DUPLICADO = "duplicado"    # job do primeiro envio no segundo valor
+EM_ANDAMENTO = "em_andamento"  # primeiro envio ainda não criou o job
+IGNORADO = "ignorado"      # sem token válido ou conteúdo diferente: segue sem proteção
+
+
+def configure(idem_dir: str, ttl_seconds: int) -> None:
+    global IDEM_DIR, IDEMPOTENCY_TTL
+    IDEM_DIR = idem_dir
+    IDEMPOTENCY_TTL = ttl_seconds
+    os.makedirs(IDEM_DIR, exist_ok=True)
+
+
+def new_token() -> str:
+    return os.urandom(16).hex()
+
+
+def _valid(token: str) -> bool:
+    return bool(token) and len(token) == 32 and all(c in "0123456789abcdef" for c in token)
+
+
+def _path(token: str) -> str:
+    return os.path.join(IDEM_DIR, f"{token}.json")
+
+
+def fingerprint(form, files) -> str:
+    """Hash dos campos (menos o token) e do conteúdo dos arquivos enviados."""
+    h = hashlib.sha256()
+    for key in sorted(k for k in form.keys() if k != FIELD):
+        for v in form.getlist(key):
+            h.update(f"{key}\0{v}\0".encode())
+    for key in sorted(files.keys()):
+        for f in files.getlist(key):
+            h.update(f"{key}\0{f.filename}\0".encode())
+            pos = f.stream.tell()
+            for chunk in iter(lambda: f.stream.read(1024 * 1024), b""):
+                h.update(chunk)
+            f.stream.seek(pos)
+    return h.hexdigest()
+
+
+def _read(path: str):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _write(path: str, data: dict) -> None:
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def reserve(token: str, fp: str) -> tuple:
+    """
+    Tenta ser o primeiro envio com este token. Retorna (resultado, job_id):
+    (DONO, None), (DUPLICADO, job_id), (EM_ANDAMENTO, None) ou (IGNORADO, None).
+    """
+    if not IDEM_DIR or not _valid(token):
+        return IGNORADO, None
+
+    path = _path(token)
+    deadline = time.monotonic() + WAIT_FOR_FIRST
+    while True:
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+        except FileExistsError:
+            pass
+        else:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"fp": fp, "job_id": None}, f)
+            return DONO, None
+
+        try:
+            vencido = time.time() - os.path.getmtime(path) > IDEMPOTENCY_TTL
+        except FileNotFoundError:
+            continue
+        if vencido:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            continue
+
+        data = _read(path)
+        # data None: o primeiro ainda está gravando (ou acabou de soltar)
+        if data is not None:
+            if data.get("fp") != fp:
+                return IGNORADO, None
+            if data.get("job_id"):
+                return DUPLICADO, data["job_id"]
+
+        if time.monotonic() >= deadline:
+            return EM_ANDAMENTO, None
+        time.sleep(0.1)
+
+
+def attach(token: str, fp: str, job_id: str) -> None:
+    """O primeiro envio criou o job: os repetidos passam a cair nele."""
+    _write(_path(token), {"fp": fp, "job_id": job_id})
+
+
+def release(token: str) -> None:
+    """O primeiro envio não gerou nada (erro no formulário, fila cheia): token livre de novo."""
+    try:
+        os.remove(_path(token))
+    except OSError:
+        pass
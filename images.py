@@ -0,0 +1,77 @@
+"""
+Pré-processamento das fotos enviadas (equipamento, RG/CNH) antes de irem
+para o DOCX.
+
+Foto de celular chega com 12 MP / vários MB, mas no documento ocupa 70 ou
+185 mm. Aqui a imagem é:
+  - girada conforme o EXIF (foto "deitada" do celular);
+  - reduzida para a largura impressa no DPI configurado;
+  - salva como JPEG (PNG só quando tem transparência de verdade);
+  - sem metadados (EXIF, GPS...).
+"""
+import io
+import logging
+
+import profiling
+
+log = logging.getLogger("images")
+
+JPEG_QUALITY = 85
+
+
+def _has_transparency(img) -> bool:
+    if img.mode in ("RGBA", "LA"):
+        lo, _hi = img.getchannel("A").getextrema()
+        return lo < 255
+    if img.mode == "P" and "transparency" in img.info:
+        return True
+    return False
+
+
+def preparar_imagem(dados: bytes, largura_mm: float, dpi: int = 200) -> tuple[io.BytesIO, dict]:
+    """
+    Recebe os bytes enviados e devolve (imagem otimizada em memória, estatísticas).
+    Tudo em memória: nada passa pelo disco.
+
+    Se o Pillow não conseguir abrir a imagem, devolve os bytes originais.
+    """
+    with profiling.medir("imagem"):
+        return _preparar(dados, largura_mm, dpi)
+
+
+def _preparar(dados: bytes, largura_mm: float, dpi: int) -> tuple[io.BytesIO, dict]:
+    # Pillow no primeiro upload, não na subida do worker
+    from PIL import Image, ImageOps
+
+    antes = len(dados)
+
+    try:
+        with Image.open(io.BytesIO(dados)) as im:
+            im.load()
+            img = ImageOps.exif_transpose(im)
+    except Exception:
+        log.warning("imagem não pôde ser processada, usando original")
+        return io.BytesIO(dados), {"antes": antes, "depois": antes, "formato": None}
+
+    largura_px = max(1, round(largura_mm / 25.4 * dpi))
+    if img.width > largura_px:
+        altura_px = max(1, round(img.height * largura_px / img.width))
+        img = img.resize((largura_px, altura_px), Image.LANCZOS)
+
+    if _has_transparency(img):
+        formato = "PNG"
+        img = img.convert("RGBA")
+        save_kwargs = {"optimize": True}
+    else:
+        formato = "JPEG"
+        img = img.convert("RGB")
+        save_kwargs = {"quality": JPEG_QUALITY, "optimize": True, "progressive": True}
+
+    # sem exif=/icc_profile=: metadados ficam para trás
+    out = io.BytesIO()
+    img.save(out, format=formato, dpi=(dpi, dpi), **save_kwargs)
+    out.seek(0)
+
+    depois = out.getbuffer().nbytes
+    log.info("imagem: %d -> %d bytes (%s)", antes, depois, formato)
+    return out, {"antes": antes, "depois": depois, "formato": formato}
@@ -0,0 +1,274 @@
+"""
+Fila de geração de documentos.
+
+Os POSTs só enfileiram a geração e respondem na hora com o id do job; as
+threads deste módulo rodam os gerar_*_pdf em segundo plano.
+
+O estado de cada job fica num JSON em STORAGE_DIR/_jobs, então qualquer
+worker do gunicorn responde /jobs/<id>, não só o que recebeu o POST.
+
+A fila é limitada (JOB_QUEUE_MAX, somando todos os workers): cada job
+pendente tem um "ticket" em _jobs/_fila, travado pelo processo dono (some
+sozinho se ele morrer). Com a fila cheia, submit() levanta FilaCheia e o
+app responde 503 + Retry-After em vez de empilhar LibreOffices. O limite
+é aproximado (dois POSTs juntos podem passar por um); quem segura a
+memória de verdade é o semáforo do converter.py.
+"""
+import json
+import math
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import metrics
+import profiling
+from locks import FileLock
+
+JOBS_DIR = None
+QUEUE_DIR = None
+_executor = None
+_executor_pid = None
+_workers = 2
+
+# Jobs pendentes (na fila + gerando) somando todos os workers. 0 = sem limite.
+JOB_QUEUE_MAX = 0
+
+# Ticket sem dono só é apagado depois disso (s): dá tempo de quem criou travar
+_TICKET_GRACE = 5
+
+_tickets = {}
+_tickets_lock = threading.Lock()
+# Duração média de um job (s), para o Retry-After
+_duracao_media = 5.0
+
+
+class FilaCheia(RuntimeError):
+    """Fila de geração cheia; retry_after = segundos sugeridos para tentar de novo."""
+
+    def __init__(self, msg: str, retry_after: int):
+        super().__init__(msg)
+        self.retry_after = retry_after
+
+
+def init_jobs(storage_dir: str, workers: int, queue_max: int = 0) -> None:
+    global JOBS_DIR, QUEUE_DIR, _workers, JOB_QUEUE_MAX
+    JOBS_DIR = os.path.join(storage_dir, "_jobs")
+    QUEUE_DIR = os.path.join(JOBS_DIR, "_fila")
+    os.makedirs(QUEUE_DIR, exist_ok=True)
+    _workers = max(1, workers)
+    JOB_QUEUE_MAX = max(0, queue_max)
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    # executor por processo (depois do fork do gunicorn as threads não existem)
+    global _executor, _executor_pid
+    if _executor is None or _executor_pid != os.getpid():
+        _executor = ThreadPoolExecutor(max_workers=_workers, thread_name_prefix="job")
+        _executor_pid = os.getpid()
+    return _executor
+
+
+def _job_file(job_id: str) -> str:
+    return os.path.join(JOBS_DIR, f"{job_id}.json")
+
+
+def _save(job: dict) -> None:
+    path = _job_file(job["id"])
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(job, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def get_job(job_id: str):
+    # id vem da URL: só hex, para não virar caminho arbitrário
+    if not job_id or not all(c in "0123456789abcdef" for c in job_id):
+        return None
+    try:
+        with open(_job_file(job_id), encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+# ---------------- Fila limitada ----------------
+
+def pending() -> int:
+    """Jobs pendentes em todos os workers (tickets com dono vivo)."""
+    if not QUEUE_DIR:
+        return 0
+    total = 0
+    agora = time.time()
+    for f in os.listdir(QUEUE_DIR):
+        path = os.path.join(QUEUE_DIR, f)
+        lock = FileLock(path)
+        if not lock.acquire(blocking=False):
+            total += 1
+            continue
+        # ninguém segura: dono morreu (ou acabou de criar e ainda vai travar)
+        lock.release()
+        try:
+            if agora - os.path.getmtime(path) > _TICKET_GRACE:
+                os.remove(path)
+        except OSError:
+            pass
+    return total
+
+
+def retry_after() -> int:
+    """Segundos sugeridos no Retry-After: mais ou menos um job terminar."""
+    return max(1, min(60, math.ceil(_duracao_media)))
+
+
+def admit() -> None:
+    """Levanta FilaCheia se não cabe mais um job."""
+    if JOB_QUEUE_MAX and pending() >= JOB_QUEUE_MAX:
+        raise FilaCheia("Muitos documentos sendo gerados agora. Tente novamente em instantes.", retry_after())
+
+
+def _take_ticket(job_id: str) -> None:
+    if not QUEUE_DIR:
+        return
+    lock = FileLock(os.path.join(QUEUE_DIR, job_id))
+    lock.acquire()
+    with _tickets_lock:
+        _tickets[job_id] = lock
+    metrics.JOBS_PENDING.inc()
+
+
+def _drop_ticket(job_id: str) -> None:
+    with _tickets_lock:
+        lock = _tickets.pop(job_id, None)
+    if lock is None:
+        return
+    metrics.JOBS_PENDING.dec()
+    try:
+        os.remove(lock.path)
+    except OSError:
+        pass
+    lock.release()
+
+
+def stats() -> dict:
+    return {"pendentes": pending(), "limite": JOB_QUEUE_MAX, "retry_after": retry_after()}
+
+
+def _now() -> str:
+    return datetime.now().strftime("%d/%m/%Y %H:%M:%S")
+
+
+def _run(job: dict, fn, queued_at: float) -> None:
+    espera = time.monotonic() - queued_at
+    metrics.JOB_QUEUE_SECONDS.observe(espera, tipo=job["kind"])
+    job["status"] = "processando"
+    job["started_at"] = _now()
+    _save(job)
+
+    perfil = None
+    if job.get("profile"):
+        perfil = profiling.Perfil(job["id"])
+        if not perfil.start():
+            perfil = None
+
+    with profiling.coletar() as etapas:
+        profiling.etapa("fila", espera)
+        try:
+            info = fn()
+            if isinstance(info, dict):
+                job["info"] = info
+            job["status"] = "pronto"
+        except Exception as e:
+            job["status"] = "erro"
+            job["error"] = str(e)
+        finally:
+            job["profile"] = perfil.stop() if perfil else None
+
+    total = time.monotonic() - queued_at
+    job["timings"] = profiling.em_ms({**etapas, "total": total})
+    job["finished_at"] = _now()
+    _save(job)
+    _drop_ticket(job["id"])
+    _registrar_duracao(total)
+
+    metrics.JOB_SECONDS.observe(total, tipo=job["kind"])
+    metrics.JOBS.inc(tipo=job["kind"], resultado="sucesso" if job["status"] == "pronto" else "falha")
+
+
+def _registrar_duracao(segundos: float) -> None:
+    global _duracao_media
+    _duracao_media = 0.8 * _duracao_media + 0.2 * segundos
+
+
+def _new_job(kind: str, **fields) -> dict:
+    job = {
+        "id": uuid.uuid4().hex,
+        "kind": kind,
+        "status": "na_fila",
+        "created_at": _now(),
+        "started_at": None,
+        "finished_at": None,
+        "error": None,
+        "info": None,
+        "pdf_path": None,
+        "download_name": None,
+        "redirect_url": None,
+        # tempo por etapa em ms (Server-Timing do /jobs/<id>) e perfil, se pedido
+        "timings": None,
+        "profile": None,
+    }
+    job.update(fields)
+    return job
+
+
+def submit(kind: str, fn, pdf_path: str = None, download_name: str = None,
+           redirect_url: str = None) -> str:
+    """
+    Enfileira fn() (que deve gerar o PDF em pdf_path) e retorna o id do job.
+    Se fn() retornar um dict, ele aparece como "info" no status do job.
+    Se a requisição pediu perfil (profiling.py), fn() roda dentro do profiler.
+
+    - download_name: nome do arquivo em /jobs/<id>/download
+    - redirect_url: para onde a tela de espera vai quando terminar
+
+    Levanta FilaCheia se já há JOB_QUEUE_MAX jobs pendentes.
+    """
+    admit()
+    job = _new_job(kind, pdf_path=pdf_path, download_name=download_name, redirect_url=redirect_url,
+                   profile=True if profiling.foi_pedido() else None)
+    _take_ticket(job["id"])
+    _save(job)
+    _get_executor().submit(_run, job, fn, time.monotonic())
+    return job["id"]
+
+
+def track(kind: str, total: int) -> dict:
+    """
+    Job acompanhado por quem já está gerando (ex.: lote em streaming), sem
+    passar pela fila. Atualize com progress() e feche com finish().
+    Conta na fila limitada como os outros (FilaCheia se não couber).
+    """
+    admit()
+    job = _new_job(kind, status="processando", started_at=_now(),
+                   progress={"feitos": 0, "erros": 0, "total": total})
+    _take_ticket(job["id"])
+    _save(job)
+    return job
+
+
+def progress(job: dict, feitos: int, erros: int = 0) -> None:
+    job["progress"].update(feitos=feitos, erros=erros)
+    _save(job)
+
+
+def finish(job: dict, error: str = None, info: dict = None) -> None:
+    metrics.JOBS.inc(tipo=job["kind"], resultado="falha" if error else "sucesso")
+    job["status"] = "erro" if error else "pronto"
+    job["error"] = error
+    if info is not None:
+        job["info"] = info
+    job["finished_at"] = _now()
+    _save(job)
+    _drop_ticket(job["id"])
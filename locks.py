@@ -0,0 +1,113 @@
+"""
+Travas entre processos baseadas em arquivo (workers do gunicorn, CLI...):
+FileLock (exclusiva) e Semaphore (N vagas).
+
+Usa flock no Linux e msvcrt.locking no Windows. A trava some sozinha se o
+processo que a segura morrer.
+"""
+import os
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class FileLock:
+    def __init__(self, path: str):
+        self.path = path
+        self._fd = None
+
+    def _try_lock(self, fd: int) -> bool:
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            return False
+
+    def acquire(self, blocking: bool = True, timeout: float = None) -> bool:
+        """
+        Tenta pegar a trava. Com blocking=False ou timeout estourado retorna False.
+        """
+        if self._fd is not None:
+            return True
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self._try_lock(fd):
+            if not blocking or (deadline is not None and time.monotonic() >= deadline):
+                os.close(fd)
+                return False
+            time.sleep(0.05)
+
+        self._fd = fd
+        return True
+
+    def release(self) -> None:
+        if self._fd is None:
+            return
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+    @property
+    def locked(self) -> bool:
+        return self._fd is not None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class Semaphore:
+    """
+    Até `limit` donos ao mesmo tempo entre processos (workers do gunicorn,
+    CLI do lote...). Cada vaga é um arquivo slot-<n>.lock travado com
+    FileLock: vaga de processo que morreu é liberada pelo sistema.
+    """
+
+    def __init__(self, directory: str, limit: int):
+        self.directory = directory
+        self.limit = max(1, limit)
+
+    def _slot(self, n: int) -> FileLock:
+        return FileLock(os.path.join(self.directory, f"slot-{n}.lock"))
+
+    def acquire(self, timeout: float = None):
+        """Devolve a FileLock da vaga (solte com release()) ou None se o timeout estourou."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            for n in range(self.limit):
+                lock = self._slot(n)
+                if lock.acquire(blocking=False):
+                    return lock
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+            time.sleep(0.05)
+
+    def in_use(self) -> int:
+        """Vagas ocupadas agora (por qualquer processo)."""
+        ocupadas = 0
+        for n in range(self.limit):
+            lock = self._slot(n)
+            if lock.acquire(blocking=False):
+                lock.release()
+            else:
+                ocupadas += 1
+        return ocupadas
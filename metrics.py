@@ -0,0 +1,304 @@
+"""
+Métricas no formato texto do Prometheus (/metrics), sem dependência externa.
+
+Cada worker do gunicorn tem os seus contadores em memória e grava um retrato
+deles em STORAGE_DIR/_metrics/<pid>.json a cada FLUSH_INTERVAL segundos.
+O /metrics soma os retratos de todos os workers (qualquer worker responde
+pelo conjunto, como no jobs.py).
+
+Retrato que parou de ser atualizado é de worker que morreu: contadores e
+histogramas dele vão para _mortos.json (o total nunca diminui), os gauges
+são descartados.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from locks import FileLock
+
+PREFIX = "senasoft_"
+
+# Segundos entre gravações do retrato de cada worker
+FLUSH_INTERVAL = 10
+# Retrato mais velho que isso = worker morto
+STALE_AFTER = 60
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+BYTES_BUCKETS = (10_000, 50_000, 100_000, 500_000, 1_000_000, 2_000_000, 5_000_000, 10_000_000, 20_000_000)
+
+METRICS_DIR = None
+_DEAD_FILE = "_mortos.json"
+
+_registry = {}
+_lock = threading.Lock()
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = PREFIX + name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        _registry[self.name] = self
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(k, "")) for k in self.labels)
+
+    def dump(self) -> dict:
+        with _lock:
+            samples = [[list(k), v if not isinstance(v, list) else list(v)] for k, v in self._values.items()]
+        return {"kind": self.kind, "help": self.help, "labels": list(self.labels), "samples": samples}
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        """Valor de uma série neste processo."""
+        with _lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track(self, **labels):
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(_Metric):
+    """Valor de cada série: [contagem por faixa..., soma, total]."""
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = SECONDS_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with _lock:
+            v = self._values.get(key)
+            if v is None:
+                v = self._values[key] = [0] * (len(self.buckets) + 2)
+            for i, b in enumerate(self.buckets):
+                if value <= b:
+                    v[i] += 1
+                    break
+            v[-2] += value
+            v[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, **labels)
+
+    def totals(self, **labels) -> tuple:
+        """(soma, total) de uma série deste processo."""
+        with _lock:
+            v = self._values.get(self._key(labels))
+            return (v[-2], v[-1]) if v else (0.0, 0)
+
+    def dump(self) -> dict:
+        d = super().dump()
+        d["buckets"] = list(self.buckets)
+        return d
+
+
+# ---------------- Métricas do app ----------------
+
+RENDER_SECONDS = Histogram("render_seconds", "Preenchimento do template .docx", ("documento",))
+DOCX_SAVE_SECONDS = Histogram("docx_save_seconds", "Gravação do .docx preenchido em memória", ("documento",))
+CONVERSION_SECONDS = Histogram("conversion_seconds", "Conversão DOCX -> PDF no LibreOffice", ("documento",))
+DOCUMENTS = Counter("documents_total", "Documentos pedidos ao motor", ("documento", "resultado"))
+
+JOB_SECONDS = Histogram("job_seconds", "Do POST até o PDF pronto (fila + geração)", ("tipo",))
+JOB_QUEUE_SECONDS = Histogram("job_queue_seconds", "Espera na fila antes de começar a gerar", ("tipo",))
+JOBS = Counter("jobs_total", "Jobs terminados", ("tipo", "resultado"))
+
+REQUEST_SECONDS = Histogram("http_request_seconds", "Tempo de resposta das rotas", ("rota",))
+REQUESTS = Counter("http_requests_total", "Respostas por rota", ("rota", "resultado"))
+
+UPLOAD_BYTES = Histogram("upload_bytes", "Tamanho dos arquivos enviados", ("campo",), buckets=BYTES_BUCKETS)
+
+CONVERSIONS_IN_FLIGHT = Gauge("conversions_in_flight", "Conversões rodando agora")
+CONVERSIONS_WAITING = Gauge("conversions_waiting", "Conversões esperando uma vaga do conversor")
+JOBS_PENDING = Gauge("jobs_pending", "Jobs na fila ou gerando (todos os workers)")
+CONVERSION_FAILURES = Counter("conversion_failures_total", "Falhas do conversor", ("motivo",))
+
+CLEANUP_REMOVED = Counter("cleanup_removed_total", "Itens apagados pela limpeza", ("local",))
+
+
+# ---------------- Entre processos ----------------
+
+def configure(metrics_dir: str) -> None:
+    global METRICS_DIR
+    METRICS_DIR = metrics_dir
+    os.makedirs(METRICS_DIR, exist_ok=True)
+
+
+def snapshot() -> dict:
+    return {name: m.dump() for name, m in list(_registry.items())}
+
+
+def _write_json(path: str, data: dict) -> None:
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def _read_json(path: str):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def flush() -> None:
+    """Grava o retrato deste processo."""
+    if METRICS_DIR:
+        _write_json(os.path.join(METRICS_DIR, f"{os.getpid()}.json"), snapshot())
+
+
+def _flusher_loop() -> None:
+    while True:
+        time.sleep(FLUSH_INTERVAL)
+        try:
+            flush()
+        except OSError:
+            pass
+
+
+_flusher_pid = None
+
+
+def start_flusher() -> None:
+    """Sobe (uma vez por processo) a thread que grava o retrato periodicamente."""
+    global _flusher_pid
+    if not METRICS_DIR or _flusher_pid == os.getpid():
+        return
+    _flusher_pid = os.getpid()
+    threading.Thread(target=_flusher_loop, name="metrics-flush", daemon=True).start()
+
+
+def _merge(into: dict, snap: dict, keep_gauges: bool = True) -> None:
+    for name, m in snap.items():
+        if m["kind"] == "gauge" and not keep_gauges:
+            continue
+        dst = into.setdefault(name, {**m, "samples": []})
+        index = {tuple(k): i for i, (k, _v) in enumerate(dst["samples"])}
+        for k, v in m["samples"]:
+            i = index.get(tuple(k))
+            if i is None:
+                index[tuple(k)] = len(dst["samples"])
+                dst["samples"].append([k, list(v) if isinstance(v, list) else v])
+            elif isinstance(v, list):
+                dst["samples"][i][1] = [a + b for a, b in zip(dst["samples"][i][1], v)]
+            else:
+                dst["samples"][i][1] += v
+
+
+def collect() -> dict:
+    """Soma de todos os workers vivos + o que sobrou dos que morreram."""
+    if not METRICS_DIR:
+        return snapshot()
+
+    flush()
+    total = {}
+    now = time.time()
+
+    with FileLock(os.path.join(METRICS_DIR, ".lock")):
+        dead_path = os.path.join(METRICS_DIR, _DEAD_FILE)
+        dead = _read_json(dead_path) or {}
+        changed = False
+
+        for f in os.listdir(METRICS_DIR):
+            if not f.endswith(".json") or f == _DEAD_FILE:
+                continue
+            path = os.path.join(METRICS_DIR, f)
+            snap = _read_json(path)
+            if snap is None:
+                continue
+            try:
+                stale = now - os.path.getmtime(path) > STALE_AFTER
+            except FileNotFoundError:
+                continue
+            if stale:
+                _merge(dead, snap, keep_gauges=False)
+                os.remove(path)
+                changed = True
+            else:
+                _merge(total, snap)
+
+        if changed:
+            _write_json(dead_path, dead)
+
+    _merge(total, dead)
+    return total
+
+
+# ---------------- Formato texto ----------------
+
+def _fmt(v) -> str:
+    if isinstance(v, float) and v.is_integer():
+        v = int(v)
+    return str(v)
+
+
+def _escape(s) -> str:
+    return str(s).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra: dict = None) -> str:
+    pairs = [(n, v) for n, v in zip(names, values)]
+    if extra:
+        pairs += list(extra.items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in pairs) + "}"
+
+
+def render(data: dict) -> str:
+    lines = []
+    for name in sorted(data):
+        m = data[name]
+        lines.append(f"# HELP {name} {m['help']}")
+        lines.append(f"# TYPE {name} {m['kind']}")
+        for values, v in sorted(m["samples"], key=lambda s: s[0]):
+            if m["kind"] != "histogram":
+                lines.append(f"{name}{_labels(m['labels'], values)} {_fmt(v)}")
+                continue
+            acc = 0
+            for b, c in zip(m["buckets"], v):
+                acc += c
+                lines.append(f"{name}_bucket{_labels(m['labels'], values, {'le': _fmt(float(b))})} {acc}")
+            lines.append(f"{name}_bucket{_labels(m['labels'], values, {'le': '+Inf'})} {v[-1]}")
+            lines.append(f"{name}_sum{_labels(m['labels'], values)} {_fmt(round(v[-2], 6))}")
+            lines.append(f"{name}_count{_labels(m['labels'], values)} {v[-1]}")
+    return "\n".join(lines) + "\n"
@@ -1,15 +1,50 @@
 from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import inspect, text
 
 db = SQLAlchemy()
 
 class Proposal(db.Model):
     __tablename__ = "proposals"
+    __table_args__ = (
+        # listagem /recentes: ORDER BY created_at DESC, id DESC (paginação por cursor)
+        db.Index("ix_proposals_created_at_id", "created_at", "id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     client_name = db.Column(db.String(255), nullable=False)
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
-    expires_at = db.Column(db.DateTime, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
 
+    # PDFs antigos: caminho do arquivo. Novos: blob (storage.py) + nome do download
     pdf_path = db.Column(db.String(500), nullable=True)
-    payload_json = db.Column(db.Text, nullable=False, default="{}")
\ No newline at end of file
+    blob_sha256 = db.Column(db.String(64), nullable=True, index=True)
+    download_name = db.Column(db.String(255), nullable=True)
+    payload_json = db.Column(db.Text, nullable=False, default="{}")
+
+
+class PdfBlob(db.Model):
+    """Um PDF em STORAGE_DIR/_blobs e quantas propostas apontam para ele."""
+    __tablename__ = "pdf_blobs"
+
+    sha256 = db.Column(db.String(64), primary_key=True)
+    size = db.Column(db.Integer, nullable=False)
+    refs = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+def ensure_schema() -> None:
+    """
+    create_all() não altera tabelas que já existem: cria aqui as colunas e
+    os índices adicionados depois (bancos antigos, local.db / Postgres do
+    Railway).
+    """
+    existentes = {c["name"] for c in inspect(db.engine).get_columns(Proposal.__tablename__)}
+    for col in Proposal.__table__.columns:
+        if col.name not in existentes and col.nullable:
+            tipo = col.type.compile(dialect=db.engine.dialect)
+            db.session.execute(text(f"ALTER TABLE {Proposal.__tablename__} ADD COLUMN {col.name} {tipo}"))
+    db.session.commit()
+
+    for index in Proposal.__table__.indexes:
+        index.create(bind=db.engine, checkfirst=True)
\ No newline at end of file
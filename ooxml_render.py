@@ -0,0 +1,241 @@
+"""
+Render direto no OOXML para templates que só têm {{ VARIAVEL }}.
+
+O docxtpl passa o word/document.xml inteiro pelo Jinja a cada documento,
+refaz o parse do XML resultante e regrava todas as partes do .docx. Para um
+template sem controle de fluxo ({% if %}, {% for %}, filtros...) nada disso
+é necessário:
+
+  - compilar(): uma vez por template, aplica no document.xml o mesmo
+    patch_xml do docxtpl (junta os {{ }} quebrados em vários runs pelo
+    Word) e guarda o XML como lista de trechos literais e nomes das
+    variáveis entre eles. As demais partes do .docx vão para um .zip base,
+    já compactado;
+  - render(): junta os trechos com os valores escapados para XML e acrescenta
+    ao .zip base só o document.xml (e, com imagem, a mídia e o .rels). As
+    outras partes são copiadas byte a byte, sem descompactar.
+
+Template com Jinja de verdade (ou {{ }} fora do document.xml) não compila:
+compilar() devolve None e o template_registry usa o docxtpl. O mesmo vale,
+por documento, para valores que o docxtpl trata de forma especial (\t, \a,
+\f, RichText...): render() devolve None.
+
+Diferença do docxtpl: aqui os valores são escapados (& < > "), e um "&" no
+nome do cliente não quebra o XML.
+"""
+import io
+import logging
+import re
+import time
+import zipfile
+from xml.sax.saxutils import escape
+
+from storage import zip_stored
+
+log = logging.getLogger("ooxml_render")
+
+DOCUMENT = "word/document.xml"
+DOCUMENT_RELS = "word/_rels/document.xml.rels"
+CONTENT_TYPES = "[Content_Types].xml"
+
+RT_IMAGE = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/image"
+
+# Tipos de imagem que o render aceita (Default no [Content_Types].xml)
+IMAGE_TYPES = {
+    "jpg": "image/jpeg",
+    "jpeg": "image/jpeg",
+    "png": "image/png",
+    "gif": "image/gif",
+    "bmp": "image/bmp",
+    "tiff": "image/tiff",
+}
+
+_VARIAVEL = re.compile(r"[^\W\d]\w*")
+_PLACEHOLDER = re.compile(r"{{(.*?)}}", re.DOTALL)
+# texto do template que o resolve_listing do docxtpl mexeria
+_TEXTO_ESPECIAL = re.compile(r"<w:t(?: [^>]*)?>[^<]*[\t\n\a\f]")
+_ESCAPE = {'"': "&quot;"}
+# o que o InlineImage do docxtpl põe no lugar do {{ IMAGEM }}
+_DRAWING = '</w:t></w:r><w:r><w:drawing>%s</w:drawing></w:r><w:r><w:t xml:space="preserve">'
+_QUEBRA = '</w:t><w:br/><w:t xml:space="preserve">'
+
+
+class Compilado:
+    """Template pronto para render(): imutável, usado por várias threads."""
+
+    def __init__(self, path: str, trechos: list, variaveis: list, base_zip: bytes, rels: str,
+                 proximo_rid: int, proxima_midia: int, proximo_docpr: int):
+        self.path = path
+        self.trechos = trechos
+        self.variaveis = variaveis
+        self.base_zip = base_zip
+        self.rels = rels
+        self.proximo_rid = proximo_rid
+        self.proxima_midia = proxima_midia
+        self.proximo_docpr = proximo_docpr
+
+
+def _maior(padrao: str, texto: str) -> int:
+    return max((int(n) for n in re.findall(padrao, texto)), default=0)
+
+
+def _com_tipos_de_imagem(content_types: bytes) -> bytes:
+    xml = content_types.decode("utf-8")
+    existentes = {e.lower() for e in re.findall(r'<Default Extension="([^"]+)"', xml)}
+    novos = "".join(
+        f'<Default Extension="{ext}" ContentType="{ct}"/>'
+        for ext, ct in IMAGE_TYPES.items() if ext not in existentes
+    )
+    return xml.replace("</Types>", novos + "</Types>").encode("utf-8")
+
+
+def compilar(path: str):
+    """Compilado do template, ou None se ele precisa do docxtpl."""
+    from docxtpl import DocxTemplate
+
+    with zipfile.ZipFile(path) as z:
+        itens = z.infolist()
+        partes = {i.filename: z.read(i.filename) for i in itens}
+
+    if DOCUMENT not in partes or DOCUMENT_RELS not in partes or CONTENT_TYPES not in partes:
+        return None
+
+    # cabeçalho, rodapé, notas e propriedades também passam pelo Jinja no docxtpl
+    for nome, dados in partes.items():
+        if nome != DOCUMENT and nome.endswith(".xml") and (b"{{" in dados or b"{%" in dados or b"{#" in dados):
+            log.info("%s: Jinja em %s, usa o docxtpl", path, nome)
+            return None
+
+    xml = DocxTemplate(path).patch_xml(partes[DOCUMENT].decode("utf-8"))
+    if "{%" in xml or "{#" in xml or _TEXTO_ESPECIAL.search(xml):
+        log.info("%s: controle de fluxo ou texto especial, usa o docxtpl", path)
+        return None
+
+    pedacos = _PLACEHOLDER.split(xml)
+    trechos = pedacos[0::2]
+    variaveis = [p.strip() for p in pedacos[1::2]]
+    if any(not _VARIAVEL.fullmatch(v) for v in variaveis):
+        log.info("%s: expressão além de {{ VARIAVEL }}, usa o docxtpl", path)
+        return None
+    # escapes do docxtpl para {{ literal no documento
+    trechos = [
+        t.replace("{_{", "{{").replace("}_}", "}}").replace("{_%", "{%").replace("%_}", "%}")
+        for t in trechos
+    ]
+
+    rels = partes[DOCUMENT_RELS].decode("utf-8")
+    midias = "\n".join(n for n in partes if n.startswith("word/media/"))
+
+    base = io.BytesIO()
+    with zipfile.ZipFile(base, "w", zipfile.ZIP_DEFLATED) as z:
+        for item in itens:
+            if item.filename in (DOCUMENT, DOCUMENT_RELS):
+                continue
+            dados = partes[item.filename]
+            if item.filename == CONTENT_TYPES:
+                dados = _com_tipos_de_imagem(dados)
+            z.writestr(item, dados)
+
+    return Compilado(
+        path,
+        trechos,
+        variaveis,
+        base.getvalue(),
+        rels,
+        proximo_rid=_maior(r'Id="rId(\d+)"', rels) + 1,
+        proxima_midia=_maior(r"word/media/\D*(\d+)\.", midias) + 1,
+        proximo_docpr=_maior(r'<wp:docPr [^>]*?id="(\d+)"', xml) + 1,
+    )
+
+
+def _texto(valor):
+    """Valor como o Jinja do docxtpl escreveria, já escapado; None se precisa do docxtpl."""
+    if valor is None:
+        return "None"
+    if not isinstance(valor, (str, int, float)):
+        return None
+    s = str(valor)
+    if "\t" in s or "\a" in s or "\f" in s:
+        return None
+    return escape(s, _ESCAPE).replace("\n", _QUEBRA)
+
+
+def _imagem(image, largura_mm: float, rid: str, docpr_id: int):
+    """(bytes, extensão, XML do <w:drawing>) como o InlineImage do docxtpl."""
+    from docx.image.image import Image
+    from docx.oxml.shape import CT_Inline
+    from docx.shared import Mm
+
+    if isinstance(image, str):
+        with open(image, "rb") as f:
+            blob = f.read()
+    else:
+        image.seek(0)
+        blob = image.read()
+
+    img = Image.from_blob(blob)
+    ext = img.ext.lower()
+    if ext not in IMAGE_TYPES:
+        return None
+    cx, cy = img.scaled_dimensions(Mm(largura_mm), None)
+    inline = CT_Inline.new_pic_inline(docpr_id, rid, img.filename, cx, cy)
+    return blob, ext, _DRAWING % inline.xml
+
+
+def render(compilado: Compilado, context: dict, images: dict = None, timings: dict = None):
+    """
+    .docx preenchido em memória (BytesIO), ou None se algum valor precisa
+    do docxtpl. images e timings como no template_registry.render_to_bytes.
+    """
+    t0 = time.perf_counter()
+    images = images or {}
+    rid = compilado.proximo_rid
+    docpr = compilado.proximo_docpr
+    midia = compilado.proxima_midia
+    inseridas = {}  # variável -> (caminho no zip, bytes, rId, drawing)
+    partes = [compilado.trechos[0]]
+
+    for nome, trecho in zip(compilado.variaveis, compilado.trechos[1:]):
+        if nome in images:
+            if nome not in inseridas:
+                image, largura_mm = images[nome]
+                r = _imagem(image, largura_mm, f"rId{rid}", docpr)
+                if r is None:
+                    return None
+                blob, ext, drawing = r
+                inseridas[nome] = (f"media/image{midia}.{ext}", blob, f"rId{rid}", drawing)
+                rid += 1
+                docpr += 1
+                midia += 1
+            partes.append(inseridas[nome][3])
+        elif nome in context:
+            texto = _texto(context[nome])
+            if texto is None:
+                return None
+            partes.append(texto)
+        # variável ausente: vazio, como o Undefined do Jinja
+        partes.append(trecho)
+
+    document = "".join(partes).encode("utf-8")
+    rels = compilado.rels
+    if inseridas:
+        novos = "".join(
+            f'<Relationship Id="{r_id}" Type="{RT_IMAGE}" Target="{alvo}"/>'
+            for alvo, _, r_id, _ in inseridas.values()
+        )
+        rels = rels.replace("</Relationships>", novos + "</Relationships>")
+    t1 = time.perf_counter()
+
+    buf = io.BytesIO(compilado.base_zip)
+    buf.seek(0, io.SEEK_END)
+    with zipfile.ZipFile(buf, "a", zipfile.ZIP_DEFLATED) as z:
+        z.writestr(DOCUMENT, document)
+        z.writestr(DOCUMENT_RELS, rels.encode("utf-8"))
+        for alvo, blob, _, _ in inseridas.values():
+            zip_stored(z, f"word/{alvo}", blob)
+    buf.seek(0)
+
+    if timings is not None:
+        timings["render"] = t1 - t0
+        timings["save"] = time.perf_counter() - t1
+    return buf
@@ -0,0 +1,157 @@
+"""
+Pacote de fechamento: vários documentos do mesmo cliente (proposta,
+contrato, promissória, termo) a partir de um formulário só.
+
+Todos os .docx são renderizados em paralelo e convertidos numa única
+passada do LibreOffice (convert_group); depois os PDFs viram um PDF só
+(pypdf, sem reconverter) ou um ZIP. Documentos que já estão no cache de
+PDFs (mesmo contexto de um formulário avulso) nem são convertidos.
+
+Juntar os .docx antes de converter perderia cabeçalhos e margens de cada
+template, por isso a junção é feita nos PDFs.
+"""
+import os
+import tempfile
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from converter import SCRATCH_DIR
+from engine import engine
+import profiling
+from storage import _safe_name, zip_stored
+
+# registram os documentos no engine
+import contract_service  # noqa: F401
+import promissoria_service  # noqa: F401
+import proposal_service  # noqa: F401
+import termo_service  # noqa: F401
+
+# Documentos do pacote, na ordem em que entram no PDF.
+# Valor: campo do formulário original -> campo do formulário do pacote.
+DOCUMENTOS = {
+    "proposta": {"cliente": "nome"},
+    "contrato": {"denominacao": "nome", "cpf_cnpj": "cpf", "equipamento": "modelo", "valor_mensal": "valor"},
+    "promissoria": {},
+    "termo": {},
+}
+
+
+class _Campos:
+    """O formulário do pacote visto com os nomes de campo de cada documento."""
+
+    def __init__(self, form, aliases: dict):
+        self.form = form
+        self.aliases = aliases
+
+    def get(self, key, default=None):
+        return self.form.get(self.aliases.get(key, key), default)
+
+    def getlist(self, key) -> list:
+        return self.form.getlist(self.aliases.get(key, key))
+
+
+def dados_do_formulario(form, documentos: list) -> dict:
+    """
+    {documento: dados} de cada documento pedido, na ordem de DOCUMENTOS,
+    lidos pelo dados_do_formulario de cada serviço (levanta no campo
+    inválido, como o formulário avulso).
+    form: request.form (ou qualquer coisa com get/getlist)
+    """
+    pedidos = set(documentos)
+    return {
+        doc: engine.documento(doc).dados(_Campos(form, aliases))
+        for doc, aliases in DOCUMENTOS.items() if doc in pedidos
+    }
+
+
+def gerar_pacote(output_path: str, dados: dict, nome: str = "", imagens: dict = None,
+                 formato: str = "pdf") -> dict:
+    """
+    Gera os documentos pedidos num PDF único (formato="pdf") ou num ZIP.
+
+    dados: o que dados_do_formulario devolveu
+    nome: cliente, para os nomes dentro do ZIP
+    imagens: {"proposta": BytesIO, "promissoria": BytesIO} (já preparadas)
+    """
+    imagens = imagens or {}
+    documentos = [d for d in DOCUMENTOS if d in dados]
+    if not documentos:
+        raise RuntimeError("Escolha pelo menos um documento para o pacote.")
+    if formato not in ("pdf", "zip"):
+        raise RuntimeError("Formato do pacote inválido.")
+
+    itens = [engine.preparar(doc, dados[doc], imagem=imagens.get(doc)) for doc in documentos]
+
+    out_dir = Path(output_path).parent
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    with tempfile.TemporaryDirectory(dir=SCRATCH_DIR) as scratch, \
+            tempfile.TemporaryDirectory(dir=out_dir, prefix=".conv-") as staging:
+
+        pdfs = [os.path.join(staging, f"{n}-{t.documento.nome}.pdf") for n, t in enumerate(itens)]
+        pendentes = [(t, pdf) for t, pdf in zip(itens, pdfs) if not engine.do_cache(t, pdf)]
+
+        if pendentes:
+            _converter_juntos(pendentes, scratch, staging)
+
+        with profiling.medir("juntar"):
+            if formato == "pdf":
+                _juntar_pdfs(pdfs, output_path)
+            else:
+                nome = _safe_name(nome) or "Cliente"
+                _zipar([(f"{t.documento.titulo} - {nome}.pdf", pdf) for t, pdf in zip(itens, pdfs)], output_path)
+
+    return {"documentos": documentos, "convertidos": len(pendentes), "do_cache": len(itens) - len(pendentes)}
+
+
+def _converter_juntos(pendentes: list, scratch: str, staging: str) -> None:
+    """Renderiza em paralelo e converte tudo numa chamada só ao LibreOffice."""
+
+    def _render(item):
+        trabalho, pdf = item
+        docx_path = os.path.join(scratch, Path(pdf).with_suffix(".docx").name)
+        with open(docx_path, "wb") as f:
+            f.write(engine.render(trabalho).getbuffer())
+        return docx_path
+
+    trabalhos = [t for t, _pdf in pendentes]
+    try:
+        with ThreadPoolExecutor(max_workers=len(pendentes)) as ex:
+            # render nas threads soma no Server-Timing do job
+            docx_paths = list(ex.map(profiling.no_contexto(_render), pendentes))
+
+        engine.converter_grupo(trabalhos, docx_paths, staging)
+
+        for trabalho, pdf in pendentes:
+            if not os.path.exists(pdf):
+                raise RuntimeError(f"PDF da {trabalho.documento.nome} não foi gerado.")
+    except Exception:
+        for t in trabalhos:
+            engine.erro(t.documento.nome)
+        raise
+
+    for trabalho, pdf in pendentes:
+        engine.guardar(trabalho, pdf)
+
+
+def _juntar_pdfs(pdf_paths: list, output_path: str) -> None:
+    # pypdf só no primeiro pacote (import pesado, fora da subida do worker)
+    from pypdf import PdfWriter
+
+    writer = PdfWriter()
+    for p in pdf_paths:
+        writer.append(p)
+
+    tmp = f"{output_path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        writer.write(f)
+    os.replace(tmp, output_path)
+
+
+def _zipar(entradas: list, output_path: str) -> None:
+    tmp = f"{output_path}.{os.getpid()}.tmp"
+    with zipfile.ZipFile(tmp, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for arcname, path in entradas:
+            zip_stored(zf, arcname, path)
+    os.replace(tmp, output_path)
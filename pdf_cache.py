@@ -0,0 +1,158 @@
+"""
+Cache de PDFs prontos, endereçado pelo conteúdo da entrada.
+
+A chave é o hash de (template .docx, contexto já formatado, imagem enviada).
+Campos de data do dia (DATA, DATA_ASSINATURA, DATA_SISTEMA) entram na chave
+como estão no contexto: o mesmo documento no mesmo dia é reaproveitado, no
+dia seguinte é gerado de novo com a data nova.
+
+Os PDFs ficam em STORAGE_DIR/_cache/<ab>/<hash>.pdf. Quando o total passa do
+limite, os menos usados recentemente (mtime, atualizado a cada acerto) saem.
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+
+# muda quando o formato da chave/contexto mudar
+_KEY_VERSION = "1"
+
+CACHE_DIR = None
+MAX_BYTES = 0
+
+_lock = threading.Lock()
+_hits = 0
+_misses = 0
+_file_hashes = {}
+
+
+def configure(cache_dir: str, max_bytes: int) -> None:
+    """Sem configure (ou max_bytes <= 0) o cache fica desligado."""
+    global CACHE_DIR, MAX_BYTES
+    CACHE_DIR = cache_dir if max_bytes > 0 else None
+    MAX_BYTES = max_bytes
+    if CACHE_DIR:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+
+
+def file_sha256(path: str) -> str:
+    """Hash do arquivo, memorizado enquanto mtime/tamanho não mudarem."""
+    st = os.stat(path)
+    stamp = (st.st_mtime_ns, st.st_size)
+
+    cached = _file_hashes.get(path)
+    if cached and cached[0] == stamp:
+        return cached[1]
+
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    digest = h.hexdigest()
+
+    _file_hashes[path] = (stamp, digest)
+    return digest
+
+
+def _normalize(context: dict) -> str:
+    clean = {k: (v.strip() if isinstance(v, str) else v) for k, v in context.items()}
+    return json.dumps(clean, ensure_ascii=False, sort_keys=True, default=str)
+
+
+def _image_sha256(image) -> str:
+    """image: caminho, bytes ou BytesIO."""
+    if isinstance(image, (str, os.PathLike)):
+        return file_sha256(image)
+    if hasattr(image, "getbuffer"):
+        image = image.getbuffer()
+    return hashlib.sha256(image).hexdigest()
+
+
+def make_key(template_path: str, context: dict, image=None) -> str:
+    h = hashlib.sha256()
+    h.update(_KEY_VERSION.encode())
+    h.update(file_sha256(template_path).encode())
+    h.update(_normalize(context).encode("utf-8"))
+    if image is not None:
+        h.update(_image_sha256(image).encode())
+    return h.hexdigest()
+
+
+def _entry_path(key: str) -> str:
+    return os.path.join(CACHE_DIR, key[:2], f"{key}.pdf")
+
+
+def fetch(key: str, output_pdf_path: str) -> bool:
+    """
+    Se a chave estiver no cache, copia o PDF para output_pdf_path e retorna True.
+    """
+    global _hits, _misses
+
+    if not CACHE_DIR:
+        return False
+
+    entry = _entry_path(key)
+    try:
+        Path(output_pdf_path).parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(entry, output_pdf_path)
+        os.utime(entry)  # marca como usado recentemente (LRU)
+    except FileNotFoundError:
+        with _lock:
+            _misses += 1
+        return False
+
+    with _lock:
+        _hits += 1
+    return True
+
+
+def store(key: str, pdf_path: str) -> None:
+    """Guarda uma cópia do PDF gerado e aplica o limite de tamanho."""
+    if not CACHE_DIR:
+        return
+
+    entry = _entry_path(key)
+    os.makedirs(os.path.dirname(entry), exist_ok=True)
+
+    tmp = f"{entry}.{os.getpid()}.{threading.get_ident()}.tmp"
+    shutil.copyfile(pdf_path, tmp)
+    os.replace(tmp, entry)
+
+    evict()
+
+
+def evict() -> int:
+    """Remove as entradas menos usadas até caber em MAX_BYTES. Retorna quantas saíram."""
+    if not CACHE_DIR:
+        return 0
+
+    entries = []
+    total = 0
+    for f in Path(CACHE_DIR).glob("*/*.pdf"):
+        try:
+            st = f.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((st.st_mtime, st.st_size, f))
+        total += st.st_size
+
+    removed = 0
+    entries.sort()
+    for _mtime, size, f in entries:
+        if total <= MAX_BYTES:
+            break
+        try:
+            f.unlink()
+            removed += 1
+        except FileNotFoundError:
+            pass
+        total -= size
+
+    return removed
+
+
+def stats() -> dict:
+    with _lock:
+        return {"hits": _hits, "misses": _misses, "enabled": bool(CACHE_DIR)}
@@ -0,0 +1,218 @@
+"""
+Tempo por etapa (Server-Timing) e perfil opcional de uma requisição.
+
+Etapas: engine, images e jobs chamam etapa("render", segundos) etc. O tempo
+vai para o coletor do contexto atual (coletar()), se houver: a requisição
+tem um, cada job tem o seu. Sem coletor, etapa() não faz nada. Etapas que
+rodam em threads paralelas (render do pacote) são somadas e podem passar
+do total.
+
+Perfil: com PROFILING=1, um usuário logado pede o perfil com o cabeçalho
+"X-Profile: 1" ou "?profile=1". O handler roda dentro do profiler e, se
+ele enfileirar um job, o job também (é lá que o PDF é gerado). Cada perfil
+fica em STORAGE_DIR/_profiles e é baixado em /profiles/<arquivo>:
+  - cprofile: <id>.prof (pstats; abra com snakeviz ou pstats) e <id>.txt
+  - pyinstrument (se instalado): <id>.html
+A limpeza periódica (cleanup.py) apaga os perfis com mais de 24 h.
+"""
+import contextvars
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+try:
+    from pyinstrument import Profiler as _Pyinstrument
+except ImportError:  # dependência opcional
+    _Pyinstrument = None
+
+ENABLED = False
+PROFILER = "cprofile"
+PROFILE_DIR = None
+
+# Um perfil por vez no processo (no Python 3.12 o cProfile é global)
+_lock = threading.Lock()
+# Quanto um perfil espera o anterior terminar antes de desistir (s)
+LOCK_WAIT = 10
+
+# Linhas do resumo em texto do cProfile
+TXT_LINHAS = 60
+
+_etapas = contextvars.ContextVar("etapas", default=None)
+_pedido = contextvars.ContextVar("perfil_pedido", default=False)
+_soma_lock = threading.Lock()
+
+# Nomes das etapas no Server-Timing (desc)
+DESCRICOES = {
+    "fila": "Espera na fila",
+    "contexto": "Contexto do template",
+    "cache": "Cache de PDFs",
+    "imagem": "Redução da imagem",
+    "render": "Preenchimento do .docx",
+    "docx": "Gravação do .docx",
+    "conversao": "Conversão no LibreOffice",
+    "juntar": "Junção dos PDFs",
+    "app": "Handler",
+    "total": "Total",
+}
+
+
+def configure(enabled: bool, profile_dir: str, profiler: str = "cprofile") -> None:
+    global ENABLED, PROFILER, PROFILE_DIR
+    if profiler not in ("cprofile", "pyinstrument"):
+        raise RuntimeError(f"PROFILER inválido: {profiler} (use cprofile ou pyinstrument)")
+    if enabled and profiler == "pyinstrument" and _Pyinstrument is None:
+        raise RuntimeError("PROFILER=pyinstrument, mas o pyinstrument não está instalado.")
+    ENABLED = enabled
+    PROFILER = profiler
+    PROFILE_DIR = profile_dir
+    if ENABLED:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+
+
+# ---------------- Etapas ----------------
+
+@contextmanager
+def coletar():
+    """Abre um coletor de etapas para o contexto atual; devolve o dict."""
+    etapas = {}
+    token = _etapas.set(etapas)
+    try:
+        yield etapas
+    finally:
+        _etapas.reset(token)
+
+
+def etapa(nome: str, segundos: float) -> None:
+    etapas = _etapas.get()
+    if etapas is not None:
+        # threads do pacote somam no mesmo coletor
+        with _soma_lock:
+            etapas[nome] = etapas.get(nome, 0.0) + segundos
+
+
+@contextmanager
+def medir(nome: str):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        etapa(nome, time.perf_counter() - t0)
+
+
+def no_contexto(fn):
+    """fn para rodar em outra thread (ThreadPoolExecutor) somando no coletor atual."""
+    ctx = contextvars.copy_context()
+    return lambda *a, **kw: ctx.copy().run(fn, *a, **kw)
+
+
+def em_ms(etapas: dict) -> dict:
+    return {k: round(v * 1000, 1) for k, v in etapas.items()}
+
+
+def server_timing(etapas_ms: dict) -> str:
+    """{"render": 12.3} -> 'render;dur=12.3;desc="Preenchimento do .docx"'."""
+    partes = []
+    for nome, ms in etapas_ms.items():
+        desc = DESCRICOES.get(nome)
+        partes.append(f"{nome};dur={ms}" + (f';desc="{desc}"' if desc else ""))
+    return ", ".join(partes)
+
+
+# ---------------- Perfil ----------------
+
+def pedido(req) -> bool:
+    """A requisição pediu perfil? (só vale com PROFILING=1)"""
+    if not ENABLED:
+        return False
+    return req.headers.get("X-Profile") == "1" or req.args.get("profile") == "1"
+
+
+def iniciar_requisicao(perfil: bool) -> dict:
+    """
+    Começo de cada requisição (a thread do servidor é reaproveitada, então
+    os dois valores são sempre trocados): coletor novo e se jobs
+    enfileirados por ela também terão perfil. Devolve o coletor.
+    """
+    etapas = {}
+    _etapas.set(etapas)
+    _pedido.set(perfil)
+    return etapas
+
+
+def foi_pedido() -> bool:
+    return _pedido.get()
+
+
+class Perfil:
+    """Um perfil (cProfile ou pyinstrument) da thread atual."""
+
+    def __init__(self, perfil_id: str = None):
+        self.id = perfil_id or uuid.uuid4().hex
+        self.arquivo = None
+        self._prof = None
+        self._travado = False
+
+    def start(self) -> bool:
+        """False se outro perfil não terminou a tempo (segue sem perfil)."""
+        if not _lock.acquire(timeout=LOCK_WAIT):
+            return False
+        self._travado = True
+        try:
+            if PROFILER == "pyinstrument":
+                self._prof = _Pyinstrument()
+                self._prof.start()
+            else:
+                self._prof = cProfile.Profile()
+                self._prof.enable()
+        except Exception:
+            self._liberar()
+            raise
+        return True
+
+    @property
+    def nome_arquivo(self) -> str:
+        return f"{self.id}.html" if PROFILER == "pyinstrument" else f"{self.id}.prof"
+
+    def stop(self) -> str:
+        """Para, grava em PROFILE_DIR e devolve o nome do arquivo principal."""
+        if self._prof is None:
+            return None
+        try:
+            if PROFILER == "pyinstrument":
+                self._prof.stop()
+                self.arquivo = self.nome_arquivo
+                with open(os.path.join(PROFILE_DIR, self.arquivo), "w", encoding="utf-8") as f:
+                    f.write(self._prof.output_html())
+            else:
+                self._prof.disable()
+                self.arquivo = self.nome_arquivo
+                self._prof.dump_stats(os.path.join(PROFILE_DIR, self.arquivo))
+                txt = io.StringIO()
+                pstats.Stats(self._prof, stream=txt).sort_stats("cumulative").print_stats(TXT_LINHAS)
+                with open(os.path.join(PROFILE_DIR, f"{self.id}.txt"), "w", encoding="utf-8") as f:
+                    f.write(txt.getvalue())
+        finally:
+            self._prof = None
+            self._liberar()
+        return self.arquivo
+
+    def _liberar(self) -> None:
+        if self._travado:
+            self._travado = False
+            _lock.release()
+
+
+def caminho(arquivo: str):
+    """Caminho de um perfil pelo nome vindo da URL (ou None)."""
+    if not PROFILE_DIR or not arquivo:
+        return None
+    base, _, ext = arquivo.partition(".")
+    if ext not in ("prof", "txt", "html") or not base or not all(c in "0123456789abcdef" for c in base):
+        return None
+    path = os.path.join(PROFILE_DIR, arquivo)
+    return path if os.path.exists(path) else None
@@ -1,51 +1,39 @@
-import os
-import subprocess
-import tempfile
 from datetime import datetime
-from pathlib import Path
 
-from docxtpl import DocxTemplate, InlineImage
-from docx.shared import Mm
+from engine import engine
+from utils import data_pt_br, data_curta_para_extenso
 
-from utils import data_pt_br
 
-import os
-LIBREOFFICE_PATH = os.getenv("LIBREOFFICE_PATH", r"C:\Program Files\LibreOffice\program\soffice.exe")
+# Largura da foto do RG/CNH no documento (ajuste aqui se quiser maior/menor)
+IMAGEM_RG_LARGURA_MM = 185
 
 
-def _convert_docx_to_pdf(docx_path: str, out_dir: str) -> str:
-    Path(out_dir).mkdir(parents=True, exist_ok=True)
-
-    cmd = [
-        LIBREOFFICE_PATH,
-        "--headless",
-        "--convert-to", "pdf",
-        "--outdir", out_dir,
-        docx_path,
-    ]
-
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    if result.returncode != 0:
-        raise RuntimeError(
-            "Falha ao converter para PDF.\n"
-            f"stdout: {result.stdout}\n"
-            f"stderr: {result.stderr}\n"
-        )
-
-    pdf_name = Path(docx_path).with_suffix(".pdf").name
-    pdf_path = str(Path(out_dir) / pdf_name)
+def dados_do_formulario(form) -> dict:
+    """form: request.form ou um registro de lote. Vencimento dd/mm/aa sai por extenso."""
+    return {
+        "DATA": data_curta_para_extenso(form.get("data_venc", "").strip()),
+        "NOME": form.get("nome", "").strip(),
+        "CPF": form.get("cpf", "").strip(),
+        "ENDERECO": form.get("endereco", "").strip(),
+    }
 
-    if not os.path.exists(pdf_path):
-        raise RuntimeError("PDF não foi encontrado após conversão.")
 
-    return pdf_path
+def contexto_promissoria(dados: dict) -> dict:
+    """Variáveis do template (menos a imagem)."""
+    return {
+        "DATA": dados["DATA"],  # já vem por extenso
+        "NOME": dados["NOME"],
+        "CPF": dados["CPF"],
+        "ENDERECO": dados["ENDERECO"],
+        "DATA_SISTEMA": data_pt_br(datetime.now()),
+    }
 
 
 def gerar_promissoria_pdf(
     template_docx_path: str,
     output_pdf_path: str,
     dados: dict,
-    imagem_rg_path: str,
+    imagem_rg_path,
 ) -> None:
     """
     Preenche template_promissoria.docx e gera PDF final.
@@ -56,26 +44,16 @@ def gerar_promissoria_pdf(
       {{ ENDERECO }}
       {{ DATA_SISTEMA }}  -> hoje (por extenso)
       {{ IMAGEM_RG }}     -> imagem do documento
+    imagem_rg_path: caminho da imagem ou a imagem em memória (BytesIO).
     """
-    tpl = DocxTemplate(template_docx_path)
-
-    context = {
-        "DATA": dados["DATA"],  # já vem por extenso
-        "NOME": dados["NOME"],
-        "CPF": dados["CPF"],
-        "ENDERECO": dados["ENDERECO"],
-        "DATA_SISTEMA": data_pt_br(datetime.now()),
-        "IMAGEM_RG": InlineImage(tpl, imagem_rg_path, width=Mm(185)),  # ajuste aqui se quiser maior/menor
-    }
-
-    tpl.render(context)
-
-    with tempfile.TemporaryDirectory() as tmp:
-        docx_out = str(Path(tmp) / "promissoria_preenchida.docx")
-        tpl.save(docx_out)
+    engine.gerar("promissoria", output_pdf_path, dados, imagem=imagem_rg_path, template=template_docx_path)
 
-        pdf_tmp = _convert_docx_to_pdf(docx_out, tmp)
 
-        Path(output_pdf_path).parent.mkdir(parents=True, exist_ok=True)
-        with open(pdf_tmp, "rb") as src, open(output_pdf_path, "wb") as dst:
-            dst.write(src.read())
\ No newline at end of file
+engine.register(
+    "promissoria",
+    template="template_promissoria.docx",
+    dados=dados_do_formulario,
+    contexto=contexto_promissoria,
+    imagem=("IMAGEM_RG", IMAGEM_RG_LARGURA_MM),
+    campo_nome="NOME",
+)
\ No newline at end of file
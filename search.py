@@ -0,0 +1,184 @@
+"""
+Busca de propostas por cliente, CPF e modelo.
+
+- SQLite: tabela virtual FTS5 (tokenizer trigram) proposals_fts, rowid = id
+  da proposta.
+- Postgres: tabela proposal_search com índice GIN pg_trgm; ILIKE '%termo%'
+  usa o índice em vez de varrer o payload_json.
+
+O texto é normalizado (minúsculas, sem acento, CPF só com dígitos) tanto
+na indexação quanto na busca. O índice é mantido pelo app: index_proposal()
+no cadastro e unindex() na exclusão/expiração.
+"""
+import json
+import re
+import unicodedata
+
+from sqlalchemy import text
+
+from models import db, Proposal
+
+# trigram: termos com menos de 3 caracteres não acham nada
+MIN_QUERY_LEN = 3
+
+
+def _dialect() -> str:
+    return db.engine.dialect.name
+
+
+def normalize(s: str) -> str:
+    s = unicodedata.normalize("NFKD", s or "")
+    s = "".join(c for c in s if not unicodedata.combining(c))
+    return re.sub(r"\s+", " ", s).strip().lower()
+
+
+def _digits(s: str) -> str:
+    return re.sub(r"\D", "", s or "")
+
+
+def _fields(client_name: str, payload: dict) -> tuple:
+    return normalize(client_name), _digits(payload.get("CPF", "")), normalize(payload.get("MODELO", ""))
+
+
+def _normalize_query(q: str) -> str:
+    q = (q or "").strip()
+    # "123.456.789-00" / "123456" -> busca no CPF só pelos dígitos
+    if q and re.fullmatch(r"[\d.\-/\s]+", q):
+        return _digits(q)
+    return normalize(q)
+
+
+def init_search() -> None:
+    """Cria a estrutura de busca (se faltar) e indexa as propostas existentes."""
+    dialect = _dialect()
+
+    if dialect == "sqlite":
+        exists = db.session.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type='table' AND name='proposals_fts'")
+        ).first()
+        if exists:
+            return
+        db.session.execute(text(
+            "CREATE VIRTUAL TABLE proposals_fts USING fts5(client_name, cpf, modelo, tokenize='trigram')"
+        ))
+        db.session.commit()
+
+    elif dialect == "postgresql":
+        exists = db.session.execute(text("SELECT to_regclass('proposal_search')")).scalar()
+        if exists:
+            return
+        db.session.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        db.session.execute(text(
+            "CREATE TABLE proposal_search ("
+            " proposal_id INTEGER PRIMARY KEY REFERENCES proposals(id) ON DELETE CASCADE,"
+            " doc TEXT NOT NULL)"
+        ))
+        db.session.execute(text(
+            "CREATE INDEX ix_proposal_search_doc ON proposal_search USING gin (doc gin_trgm_ops)"
+        ))
+        db.session.commit()
+
+    else:
+        return
+
+    rebuild()
+
+
+def rebuild(batch_size: int = 1000) -> int:
+    """Reindexa todas as propostas (em lotes). Retorna quantas indexou."""
+    total = 0
+    last_id = 0
+    while True:
+        rows = (
+            db.session.query(Proposal.id, Proposal.client_name, Proposal.payload_json)
+            .filter(Proposal.id > last_id)
+            .order_by(Proposal.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not rows:
+            break
+        _insert_many([(r.id, r.client_name, json.loads(r.payload_json or "{}")) for r in rows])
+        db.session.commit()
+        total += len(rows)
+        last_id = rows[-1].id
+    return total
+
+
+def _insert_many(items) -> None:
+    """items: [(proposal_id, client_name, payload), ...]"""
+    params = []
+    for proposal_id, client_name, payload in items:
+        name, cpf, modelo = _fields(client_name, payload)
+        params.append({"id": proposal_id, "n": name, "c": cpf, "m": modelo, "doc": f"{name} | {cpf} | {modelo}"})
+    if not params:
+        return
+
+    dialect = _dialect()
+
+    if dialect == "sqlite":
+        db.session.execute(
+            text("INSERT INTO proposals_fts(rowid, client_name, cpf, modelo) VALUES (:id, :n, :c, :m)"),
+            params,
+        )
+    elif dialect == "postgresql":
+        db.session.execute(
+            text(
+                "INSERT INTO proposal_search(proposal_id, doc) VALUES (:id, :doc) "
+                "ON CONFLICT (proposal_id) DO UPDATE SET doc = EXCLUDED.doc"
+            ),
+            params,
+        )
+
+
+def index_proposal(proposal_id: int, client_name: str, payload: dict) -> None:
+    """Indexa (ou reindexa) uma proposta. Faz commit."""
+    unindex([proposal_id])
+    _insert_many([(proposal_id, client_name, payload)])
+    db.session.commit()
+
+
+def unindex(ids) -> None:
+    """Tira propostas do índice. Não faz commit (vai junto com o DELETE delas)."""
+    ids = list(ids)
+    if not ids:
+        return
+
+    dialect = _dialect()
+    params = {f"i{n}": v for n, v in enumerate(ids)}
+    placeholders = ", ".join(f":{k}" for k in params)
+
+    if dialect == "sqlite":
+        db.session.execute(text(f"DELETE FROM proposals_fts WHERE rowid IN ({placeholders})"), params)
+    elif dialect == "postgresql":
+        db.session.execute(text(f"DELETE FROM proposal_search WHERE proposal_id IN ({placeholders})"), params)
+
+
+def search_ids(q: str, limit: int = 30) -> list:
+    """Ids das propostas que batem com q, mais novas primeiro."""
+    q = _normalize_query(q)
+    if len(q) < MIN_QUERY_LEN:
+        return []
+
+    dialect = _dialect()
+
+    if dialect == "sqlite":
+        # frase entre aspas: o trigram acha o termo em qualquer parte do texto
+        phrase = '"' + q.replace('"', '""') + '"'
+        rows = db.session.execute(
+            text("SELECT rowid FROM proposals_fts WHERE proposals_fts MATCH :q ORDER BY rowid DESC LIMIT :lim"),
+            {"q": phrase, "lim": limit},
+        )
+    elif dialect == "postgresql":
+        pattern = "%" + q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        rows = db.session.execute(
+            text(
+                "SELECT proposal_id FROM proposal_search WHERE doc ILIKE :p "
+                "ORDER BY proposal_id DESC LIMIT :lim"
+            ),
+            {"p": pattern, "lim": limit},
+        )
+    else:
+        return []
+
+    return [r[0] for r in rows]
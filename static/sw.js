@@ -34,8 +34,8 @@ self.addEventListener("fetch", (event) => {
   const req = event.request;
   const url = new URL(req.url);
 
-  // não cachear downloads/geração de PDF (sempre ao vivo)
-  if (url.pathname.includes("/baixar") || url.pathname.includes("/contrato") || url.pathname.includes("/promissoria")) {
+  // não cachear downloads/geração de PDF nem status de jobs (sempre ao vivo)
+  if (url.pathname.includes("/baixar") || url.pathname.includes("/contrato") || url.pathname.includes("/promissoria") || url.pathname.startsWith("/jobs/")) {
     return; // deixa ir direto para rede
   }
 
@@ -1,5 +1,40 @@
+"""
+Onde ficam os PDFs gerados.
+
+Propostas: blob endereçado pelo conteúdo, STORAGE_DIR/_blobs/<ab>/<cd>/<sha256>.pdf.
+O nome que o usuário vê ("PROPOSTA - Fulano.pdf") fica só no banco
+(Proposal.download_name): dois clientes com o mesmo nome não se
+sobrescrevem, e o mesmo PDF (proposta gerada de novo, cache) fica uma vez
+no disco. A tabela pdf_blobs conta quantas propostas apontam para cada blob
+(refs); quando chega a zero, collect_blobs() apaga o arquivo.
+
+put_blob() e collect_blobs() do mesmo blob são serializados por uma trava
+de arquivo por pasta (<ab>/.lock), entre workers do gunicorn: um PDF novo
+igual a um que está sendo apagado não fica sem arquivo.
+
+Saídas dos jobs (contrato, promissória, termo, pacote): output_path() dá um
+nome único na pasta temporária; o nome legível vai como download_name do job.
+"""
+import hashlib
 import os
 import re
+import uuid
+import zipfile
+from collections import Counter
+
+from sqlalchemy import delete, select, update
+
+from locks import FileLock
+from models import db, PdfBlob
+
+BLOB_DIR = None
+
+
+def configure(storage_dir: str) -> None:
+    global BLOB_DIR
+    BLOB_DIR = os.path.join(storage_dir, "_blobs")
+    os.makedirs(BLOB_DIR, exist_ok=True)
+
 
 def _safe_name(name: str) -> str:
     name = (name or "").strip()
@@ -7,6 +42,96 @@ def _safe_name(name: str) -> str:
     name = re.sub(r'[\\/*?:"<>|]', "", name)  # tira caracteres inválidos
     return name
 
-def proposal_pdf_path(storage_dir: str, cliente: str, created_at, proposal_id: int) -> str:
-    cliente = _safe_name(cliente)
-    return os.path.join(storage_dir, f"PROPOSTA - {cliente}.pdf")
\ No newline at end of file
+
+def download_name(titulo: str, nome: str, ext: str = "pdf") -> str:
+    """'PROPOSTA', 'Fulano' -> 'PROPOSTA - Fulano.pdf'."""
+    return f"{titulo} - {_safe_name(nome) or 'Cliente'}.{ext}"
+
+
+def output_path(directory: str, ext: str = "pdf") -> str:
+    """Caminho único para a saída de um job (nada de colisão entre requisições)."""
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f"{uuid.uuid4().hex}.{ext}")
+
+
+def zip_stored(zf: zipfile.ZipFile, arcname: str, src) -> None:
+    """
+    Põe no ZIP sem compressão src (caminho ou bytes): PDF e imagem já vêm
+    comprimidos, deflate de novo só gasta CPU.
+    """
+    if isinstance(src, (bytes, bytearray)):
+        zf.writestr(arcname, src, compress_type=zipfile.ZIP_STORED)
+    else:
+        zf.write(src, arcname=arcname, compress_type=zipfile.ZIP_STORED)
+
+
+# ---------------- Blobs das propostas ----------------
+
+def blob_path(sha256: str) -> str:
+    return os.path.join(BLOB_DIR, sha256[:2], sha256[2:4], f"{sha256}.pdf")
+
+
+def _lock(sha256: str) -> FileLock:
+    return FileLock(os.path.join(BLOB_DIR, sha256[:2], ".lock"))
+
+
+def _hash(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def put_blob(src_path: str) -> str:
+    """
+    Guarda o PDF em src_path (que é movido ou, se o blob já existe, apagado)
+    e soma uma referência. Faz commit. Retorna o sha256.
+    src_path precisa estar no mesmo disco do STORAGE_DIR (rename).
+    """
+    sha = _hash(src_path)
+    size = os.path.getsize(src_path)
+    dest = blob_path(sha)
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+
+    with _lock(sha):
+        if os.path.exists(dest):
+            os.remove(src_path)
+        else:
+            os.replace(src_path, dest)
+
+        n = db.session.execute(
+            update(PdfBlob).where(PdfBlob.sha256 == sha).values(refs=PdfBlob.refs + 1)
+        ).rowcount
+        if not n:
+            db.session.add(PdfBlob(sha256=sha, size=size, refs=1))
+        db.session.commit()
+    return sha
+
+
+def unref_blobs(shas) -> None:
+    """
+    Tira uma referência de cada sha (repetidos contam várias vezes), na
+    transação atual: vai junto com o DELETE das propostas. Depois do commit,
+    chame collect_blobs().
+    """
+    for sha, n in Counter(s for s in shas if s).items():
+        db.session.execute(update(PdfBlob).where(PdfBlob.sha256 == sha).values(refs=PdfBlob.refs - n))
+
+
+def collect_blobs(shas) -> int:
+    """Apaga os blobs (linha e arquivo) que ficaram sem referência. Retorna quantos."""
+    removed = 0
+    for sha in {s for s in shas if s}:
+        with _lock(sha):
+            refs = db.session.execute(select(PdfBlob.refs).where(PdfBlob.sha256 == sha)).scalar()
+            if refs is None or refs > 0:
+                continue
+            db.session.execute(delete(PdfBlob).where(PdfBlob.sha256 == sha))
+            db.session.commit()
+            try:
+                os.remove(blob_path(sha))
+            except FileNotFoundError:
+                pass
+            removed += 1
+    return removed
@@ -0,0 +1,140 @@
+"""
+Templates .docx carregados uma vez por processo.
+
+DocxTemplate(caminho) descompacta e faz o parse do .docx inteiro a cada
+chamada. Aqui o parse acontece uma vez; cada renderização recebe uma cópia
+(deepcopy) do documento original, que continua intacto para a próxima.
+
+O mtime/tamanho do arquivo é conferido a cada uso: editar um template em
+assets/ passa a valer sem reiniciar o servidor.
+
+Templates só com {{ VARIAVEL }} (termo, promissória...) são renderizados
+pelo ooxml_render, sem docxtpl; o parse do docxtpl só acontece se algum
+documento precisar dele. FAST_RENDER=0 desliga o caminho rápido.
+"""
+import copy
+import io
+import os
+import threading
+import time
+
+import ooxml_render
+
+# docxtpl/python-docx são importados no primeiro uso: o worker sobe (e
+# responde /, /login, /health) sem pagar por eles; o warmup.py já os carrega.
+
+
+FAST_RENDER = True
+
+
+class _Entry:
+    def __init__(self, path: str, stamp: tuple, rapido):
+        self.path = path
+        self.stamp = stamp
+        self.rapido = rapido
+        self.docx = None
+        self.lock = threading.Lock()
+
+
+_entries = {}
+_lock = threading.Lock()
+
+
+def configure(fast_render: bool) -> None:
+    global FAST_RENDER
+    FAST_RENDER = fast_render
+
+
+def _stamp(path: str) -> tuple:
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _load(path: str, stamp: tuple) -> _Entry:
+    rapido = ooxml_render.compilar(path) if FAST_RENDER else None
+    return _Entry(path, stamp, rapido)
+
+
+def _docx(entry: _Entry):
+    """Documento do docxtpl já com parse (chamar com entry.lock)."""
+    from docxtpl import DocxTemplate
+
+    if entry.docx is None:
+        tpl = DocxTemplate(entry.path)
+        tpl.init_docx()
+        entry.docx = tpl.docx
+    return entry.docx
+
+
+def _entry(path: str) -> _Entry:
+    path = os.path.abspath(path)
+    stamp = _stamp(path)
+
+    entry = _entries.get(path)
+    if entry is not None and entry.stamp == stamp:
+        return entry
+
+    with _lock:
+        entry = _entries.get(path)
+        if entry is None or entry.stamp != stamp:
+            entry = _load(path, stamp)
+            _entries[path] = entry
+        return entry
+
+
+def get_template(path: str):
+    """
+    DocxTemplate pronto para render(), sem reler o arquivo.
+    Cada chamada devolve um objeto novo (pode renderizar em paralelo).
+    """
+    from docxtpl import DocxTemplate
+
+    entry = _entry(path)
+
+    tpl = DocxTemplate(entry.path)
+    with entry.lock:
+        tpl.docx = copy.deepcopy(_docx(entry))
+    return tpl
+
+
+def preload(paths) -> None:
+    for p in paths:
+        entry = _entry(p)
+        if entry.rapido is None:
+            with entry.lock:
+                _docx(entry)
+
+
+def render_to_bytes(path: str, context: dict, images: dict = None, timings: dict = None) -> io.BytesIO:
+    """
+    Renderiza o template e devolve o .docx pronto em memória.
+    images: {"VARIAVEL": (caminho ou BytesIO, largura_mm)}
+    timings: se vier um dict, recebe "render" e "save" (segundos)
+    """
+    entry = _entry(path)
+    if entry.rapido is not None and FAST_RENDER:
+        buf = ooxml_render.render(entry.rapido, context, images, timings)
+        if buf is not None:
+            return buf
+
+    from docx.shared import Mm
+    from docxtpl import InlineImage
+
+    t0 = time.perf_counter()
+    tpl = get_template(path)
+
+    context = dict(context)
+    for name, (image, width_mm) in (images or {}).items():
+        context[name] = InlineImage(tpl, image, width=Mm(width_mm))
+
+    tpl.render(context)
+    t1 = time.perf_counter()
+
+    buf = io.BytesIO()
+    tpl.save(buf)
+    buf.seek(0)
+
+    if timings is not None:
+        timings["render"] = t1 - t0
+        timings["save"] = time.perf_counter() - t1
+    return buf
@@ -1,54 +1,50 @@
-import os
-import subprocess
-import tempfile
-from pathlib import Path
+from engine import engine
 
-from docxtpl import DocxTemplate
+CK = "☑"
+UN = "☐"
 
 
-LIBREOFFICE_PATH = os.getenv("LIBREOFFICE_PATH", r"C:\Program Files\LibreOffice\program\soffice.exe")
+def dados_do_formulario(form) -> dict:
+    """form: request.form ou um registro de lote (precisa de .get e .getlist)."""
+    eq = set(form.getlist("eq"))
 
+    return {
+        "DATA_RET": form.get("data_ret", "").strip(),
+        "HORA_RET": form.get("hora_ret", "").strip(),
+        "DATA_DEV": form.get("data_dev", "").strip(),
+        "HORA_DEV": form.get("hora_dev", "").strip(),
 
-def _convert_docx_to_pdf(docx_path: str, out_dir: str) -> str:
-    Path(out_dir).mkdir(parents=True, exist_ok=True)
+        "NOME": form.get("nome", "").strip(),
+        "TELEFONE": form.get("telefone", "").strip(),
+        "ENDEREÇO": form.get("endereco", "").strip(),
 
-    cmd = [
-        LIBREOFFICE_PATH,
-        "--headless",
-        "--norestore",
-        "--invisible",
-        "--convert-to", "pdf",
-        "--outdir", out_dir,
-        docx_path,
-    ]
+        "CK_CPU": CK if "CPU" in eq else UN,
+        "CK_NOT": CK if "NOT" in eq else UN,
+        "CK_MON": CK if "MON" in eq else UN,
+        "CK_IMP": CK if "IMP" in eq else UN,
 
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    if result.returncode != 0:
-        raise RuntimeError(
-            "Falha ao converter para PDF.\n"
-            f"stdout:\n{result.stdout}\n"
-            f"stderr:\n{result.stderr}\n"
-        )
+        "MARCA": form.get("marca", "").strip(),
+        "MODELO": form.get("modelo", "").strip(),
+        "SERIE": form.get("serie", "").strip(),
+        "ACESSORIO": form.get("acessorio", "").strip(),
+        "OBSERVAÇÃO": form.get("observacao", "").strip(),
+    }
 
-    pdf_name = Path(docx_path).with_suffix(".pdf").name
-    pdf_path = str(Path(out_dir) / pdf_name)
 
-    if not os.path.exists(pdf_path):
-        raise RuntimeError("PDF não foi encontrado após conversão.")
-
-    return pdf_path
+def contexto_termo(dados: dict) -> dict:
+    # o termo usa os dados como vieram (só substituição simples)
+    return dict(dados)
 
 
 def gerar_termo_pdf(template_docx_path: str, output_pdf_path: str, dados: dict) -> None:
-    tpl = DocxTemplate(template_docx_path)
-    tpl.render(dados)
-
-    with tempfile.TemporaryDirectory() as tmp:
-        docx_out = str(Path(tmp) / "termo_preenchido.docx")
-        tpl.save(docx_out)
+    engine.gerar("termo", output_pdf_path, dados, template=template_docx_path)
 
-        pdf_tmp = _convert_docx_to_pdf(docx_out, tmp)
 
-        Path(output_pdf_path).parent.mkdir(parents=True, exist_ok=True)
-        with open(pdf_tmp, "rb") as src, open(output_pdf_path, "wb") as dst:
-            dst.write(src.read())
\ No newline at end of file
+engine.register(
+    "termo",
+    template="template_termo_retirada.docx",
+    dados=dados_do_formulario,
+    contexto=contexto_termo,
+    titulo="TERMO RETIRADA",
+    campo_nome="NOME",
+)
\ No newline at end of file
@@ -0,0 +1,80 @@
+"""
+Cliente mínimo para um LibreOffice escutando via UNO (pipe).
+
+Pode ser usado dentro do processo (quando o módulo "uno" existe no Python
+da aplicação) ou como script, rodando com o Python que vem com o LibreOffice:
+
+    python3 uno_client.py <nome_do_pipe> <entrada.docx> <saida.pdf>
+"""
+import sys
+import time
+
+
+def connect(pipe_name: str, timeout: float = 0):
+    """
+    Conecta no soffice do pipe informado e devolve o Desktop.
+    Com timeout > 0, fica tentando até o soffice aceitar conexões.
+    """
+    import uno
+    from com.sun.star.connection import NoConnectException
+
+    local = uno.getComponentContext()
+    resolver = local.ServiceManager.createInstanceWithContext(
+        "com.sun.star.bridge.UnoUrlResolver", local
+    )
+    url = f"uno:pipe,name={pipe_name};urp;StarOffice.ComponentContext"
+
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            ctx = resolver.resolve(url)
+            break
+        except NoConnectException:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(0.2)
+
+    return ctx.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", ctx)
+
+
+def _props(**kwargs):
+    from com.sun.star.beans import PropertyValue
+
+    props = []
+    for name, value in kwargs.items():
+        p = PropertyValue()
+        p.Name = name
+        p.Value = value
+        props.append(p)
+    return tuple(props)
+
+
+def convert(desktop, src_url: str, dst_url: str) -> None:
+    """
+    Abre o documento (oculto) e exporta como PDF.
+    src_url/dst_url são URLs file:///...
+    """
+    doc = desktop.loadComponentFromURL(src_url, "_blank", 0, _props(Hidden=True, ReadOnly=True))
+    if doc is None:
+        raise RuntimeError(f"LibreOffice não abriu o documento: {src_url}")
+    try:
+        doc.storeToURL(dst_url, _props(FilterName="writer_pdf_Export"))
+    finally:
+        doc.close(True)
+
+
+def main(argv) -> int:
+    if len(argv) != 4:
+        print("uso: uno_client.py <pipe> <entrada.docx> <saida.pdf>", file=sys.stderr)
+        return 2
+
+    from pathlib import Path
+
+    pipe_name, src, dst = argv[1], argv[2], argv[3]
+    desktop = connect(pipe_name, timeout=30)
+    convert(desktop, Path(src).resolve().as_uri(), Path(dst).resolve().as_uri())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
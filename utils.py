@@ -1,40 +1,79 @@
 from datetime import datetime
-from num2words import num2words
+from functools import lru_cache
 
-_MESES = [
-    "Janeiro","Fevereiro","Março","Abril","Maio","Junho",
-    "Julho","Agosto","Setembro","Outubro","Novembro","Dezembro"
-]
+# num2words e babel são importados no primeiro uso (sobe o worker mais rápido).
+# As funções abaixo rodam a cada contrato/proposta e a cada linha de lote com
+# quase sempre os mesmos valores: resultados memoizados (LRU) e conversor e
+# locale pt_BR resolvidos uma vez só.
 
-def data_pt_br(dt: datetime) -> str:
-    return f"{dt.day} de {_MESES[dt.month-1]} de {dt.year}"
+# Tamanho dos caches (valores distintos guardados por função)
+CACHE_MAX = 2048
 
-def moeda_pt_br(valor_str: str) -> tuple[str, str]:
+# "1,234.56" (formato do Python) -> "1.234,56"
+_PONTO_VIRGULA = str.maketrans(",.", ".,")
+
+
+@lru_cache(maxsize=None)
+def _conversor_pt_br():
+    from num2words import CONVERTER_CLASSES
+    return CONVERTER_CLASSES["pt_BR"]
+
+
+@lru_cache(maxsize=None)
+def _locale_pt_br():
+    from babel import Locale
+    return Locale.parse("pt_BR")
+
+
+def preload() -> None:
+    """Carrega o conversor do num2words e o locale pt_BR do babel (aquecimento do worker)."""
+    _conversor_pt_br()
+    _locale_pt_br()
+
+
+@lru_cache(maxsize=CACHE_MAX)
+def _extenso(n: int) -> str:
+    return _conversor_pt_br().to_cardinal(n)
+
+
+@lru_cache(maxsize=CACHE_MAX)
+def _normalizar_moeda(valor_str: str) -> tuple[str, int]:
     """
-    Recebe '200' ou '200,50' ou '200.50' e retorna:
-    ('R$ 200,00', 'duzentos')
+    Lê o valor uma vez só: '200', '200,50', '200.50', '1.234,56' ou
+    'R$ 200' -> ('200,00', 200) / ('1.234,56', 1234).
     """
-    s = valor_str.strip().replace("R$", "").strip()
+    s = valor_str.replace("R$", "").strip()
 
-    # Se veio "200,50" vira "200.50"
-    if s.count(",") == 1 and s.count(".") == 0:
+    # Se veio "200,50" vira "200.50"; se veio "1.234,56" remove milhar e troca decimal
+    if s.count(",") == 1:
+        if "." in s:
+            s = s.replace(".", "")
         s = s.replace(",", ".")
-    # Se veio "1.234,56" remove milhar e troca decimal
-    if s.count(".") >= 1 and s.count(",") == 1:
-        s = s.replace(".", "").replace(",", ".")
 
     v = float(s)
 
-    # R$ 1.234,56
-    moeda = f"R$ {v:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+    # 1.234,56
+    return f"{v:,.2f}".translate(_PONTO_VIRGULA), int(v)
 
-    inteiro = int(v)  # por extenso só do inteiro (200)
-    ext = num2words(inteiro, lang="pt_BR") + " reais"
 
-    return moeda, ext
+_MESES = [
+    "Janeiro","Fevereiro","Março","Abril","Maio","Junho",
+    "Julho","Agosto","Setembro","Outubro","Novembro","Dezembro"
+]
 
-from babel.numbers import format_decimal
+def data_pt_br(dt: datetime) -> str:
+    return f"{dt.day} de {_MESES[dt.month-1]} de {dt.year}"
 
+def moeda_pt_br(valor_str: str) -> tuple[str, str]:
+    """
+    Recebe '200' ou '200,50' ou '200.50' e retorna:
+    ('R$ 200,00', 'duzentos reais')
+    """
+    moeda, inteiro = _normalizar_moeda(valor_str)
+    # por extenso só do inteiro (200)
+    return f"R$ {moeda}", _extenso(inteiro) + " reais"
+
+@lru_cache(maxsize=CACHE_MAX)
 def inteiro_formatado_pt_br(valor_str: str) -> int:
     s = valor_str.strip().replace("R$", "").strip()
     # 1.000 ou 1000
@@ -45,12 +84,14 @@ def inteiro_formatado_pt_br(valor_str: str) -> int:
     s = s.replace(",", ".")
     return int(float(s))
 
+@lru_cache(maxsize=CACHE_MAX)
 def numero_milhar_pt_br(n: int) -> str:
     # 1000 -> 1.000
-    return format_decimal(n, locale="pt_BR")
+    from babel.numbers import format_decimal
+    return format_decimal(n, locale=_locale_pt_br())
 
 def extenso_pt_br(n: int) -> str:
-    return num2words(n, lang="pt_BR")
+    return _extenso(n)
 
 def moeda_formatada_pt_br(valor_str: str) -> tuple[str, str]:
     """
@@ -58,19 +99,10 @@ def moeda_formatada_pt_br(valor_str: str) -> tuple[str, str]:
     - "220,00"
     - "duzentos e vinte reais"
     """
-    s = valor_str.strip().replace("R$", "").strip()
-
-    if s.count(",") == 1 and s.count(".") == 0:
-        s = s.replace(",", ".")
-    if s.count(".") >= 1 and s.count(",") == 1:
-        s = s.replace(".", "").replace(",", ".")
-
-    v = float(s)
-    moeda = f"{v:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
-    inteiro = int(v)
-    ext = num2words(inteiro, lang="pt_BR") + " reais"
-    return moeda, ext
+    moeda, inteiro = _normalizar_moeda(valor_str)
+    return moeda, _extenso(inteiro) + " reais"
 
+@lru_cache(maxsize=CACHE_MAX)
 def data_curta_para_extenso(data_curta: str) -> str:
     """
     Entrada: '20/02/26' ou '20/02/2026'
@@ -0,0 +1,109 @@
+"""
+Aquecimento de cada worker depois de subir.
+
+O worker abre a porta sem carregar docxtpl, num2words, babel, pypdf e
+Pillow (imports adiados nos módulos que os usam) e, numa thread, faz o que
+o primeiro pedido de verdade pagaria:
+  - imports: carrega as bibliotecas pesadas;
+  - templates: parse de todos os .docx registrados no engine;
+  - conversao: renderiza um template e converte uma vez em cada LibreOffice
+    (cria o perfil do soffice, que na primeira vez leva segundos).
+
+/ready responde 503 até isso terminar (e 200 depois); /health continua
+dizendo só se o processo está de pé. Se o aquecimento falhar (LibreOffice
+quebrado), /ready fica em 503 e tenta de novo a cada RETRY_AFTER segundos.
+"""
+import importlib
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+log = logging.getLogger("warmup")
+
+# Bibliotecas que os serviços importam no primeiro uso
+HEAVY_IMPORTS = ("docxtpl", "docx", "num2words", "babel.numbers", "pypdf", "PIL.Image")
+
+# Segundos até tentar de novo depois de uma falha
+RETRY_AFTER = 30
+
+state = {"pid": None, "pronto": False, "etapa": None, "etapas_ms": {}, "erro": None, "falhou_em": None}
+_lock = threading.Lock()
+
+
+def _etapa(nome: str, fn) -> None:
+    state["etapa"] = nome
+    t0 = time.perf_counter()
+    fn()
+    state["etapas_ms"][nome] = round((time.perf_counter() - t0) * 1000, 1)
+
+
+def _imports() -> None:
+    import utils
+
+    for mod in HEAVY_IMPORTS:
+        importlib.import_module(mod)
+    # conversor do num2words e locale pt_BR do babel
+    utils.preload()
+
+
+def _templates() -> None:
+    import template_registry
+    from engine import engine
+
+    template_registry.preload(doc.template_path for doc in engine.documentos.values())
+
+
+def _conversao() -> None:
+    import converter
+    import template_registry
+    from engine import engine
+
+    doc = next(iter(engine.documentos.values()), None)
+    if doc is None:
+        return
+
+    work = tempfile.mkdtemp(dir=converter.SCRATCH_DIR, prefix="warmup-")
+    try:
+        docx_path = os.path.join(work, "warmup.docx")
+        with open(docx_path, "wb") as f:
+            f.write(template_registry.render_to_bytes(doc.template_path, {}).getbuffer())
+        converter.get_backend().warm(docx_path, work)
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+def _run() -> None:
+    try:
+        _etapa("imports", _imports)
+        _etapa("templates", _templates)
+        _etapa("conversao", _conversao)
+        state["pronto"] = True
+        log.info("worker %s pronto: %s", os.getpid(), state["etapas_ms"])
+    except Exception as e:
+        # continua fora do balanceador (/ready 503); nova tentativa em RETRY_AFTER
+        state["erro"] = f"{state['etapa']}: {e}"
+        state["falhou_em"] = time.monotonic()
+        log.exception("falha no aquecimento (%s)", state["etapa"])
+    state["etapa"] = None
+
+
+def start(enabled: bool = True) -> None:
+    """
+    Uma vez por processo (depois do fork do gunicorn a thread não existe).
+    Chamado de novo (pelo /ready) depois de uma falha, tenta outra vez.
+    """
+    with _lock:
+        if state["pid"] == os.getpid():
+            falhou = state["falhou_em"]
+            if falhou is None or time.monotonic() - falhou < RETRY_AFTER:
+                return
+        state.update(pid=os.getpid(), pronto=not enabled, etapa=None, etapas_ms={}, erro=None, falhou_em=None)
+        if enabled:
+            threading.Thread(target=_run, name="warmup", daemon=True).start()
+
+
+def status() -> dict:
+    return {k: v for k, v in state.items() if k not in ("pid", "falhou_em")}